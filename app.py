@@ -1,53 +1,198 @@
 import os
+import sys
+import glob
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 # Import our custom modules
-from extractor import extract_text_from_ppt_advanced
-from context_generator import generate_context_briefing
-from translator import translate_text_elements_in_batch
-from reconstructor import reconstruct_presentation  # <-- Import the final piece
+from workflow import translate_deck, open_telemetry
+from terminology import glossary_path_for
+from translator import create_default_scheduler, MAX_CONCURRENT_REQUESTS
+from translation_cache import TranslationMemory
+import llm_provider
 
 
-def main():
+class ConsoleStatusQueue:
     """
-    The main function to run the entire translation workflow.
+    Stands in for the GUI's status_queue: prints log lines tagged with the deck
+    they belong to and hands metric events, labelled with the deck, to the run's telemetry.
     """
-    print("--- Starting PowerPoint Translation Application ---")
 
-    # Define file paths and language
-    ppt_file = 'sample_deck.pptx'
-    target_language = "Japanese"
+    def __init__(self, deck_name, telemetry=None):
+        self.deck_name = deck_name
+        self.telemetry = telemetry
 
-    # Create a smart output file name
-    base_name = os.path.splitext(ppt_file)[0]
-    output_file = f"{base_name}_{target_language}.pptx"
+    def put(self, message):
+        message_type, payload = message
+        if message_type == 'log':
+            print(f"[{self.deck_name}] {payload}", flush=True)
+        elif message_type == 'metric' and self.telemetry is not None:
+            self.telemetry.put(('metric', dict(payload, labels=dict(payload['labels'], deck=self.deck_name))))
 
-    # --- PHASE 1: EXTRACTION ---
-    extracted_data = extract_text_from_ppt_advanced(ppt_file)
-    if not extracted_data:
-        print("\nCould not complete Phase 1. Halting execution.")
-        return
-    print(f"\n--- Phase 1 Complete: {len(extracted_data)} text elements extracted. ---")
 
-    # --- PHASE 2: CONTEXT GENERATION ---
-    context_summary = generate_context_briefing(extracted_data)
-    if not context_summary:
-        print("\nCould not complete Phase 2. Halting execution.")
-        return
-    print("\n--- Phase 2 Complete: Context briefing generated successfully. ---")
+def collect_decks(inputs, recursive=False):
+    """
+    Expands files, directories and glob patterns into a sorted list of .pptx paths.
+
+    PowerPoint lock files ('~$deck.pptx') are skipped.
+    """
+    found = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            pattern = os.path.join(entry, "**", "*.pptx") if recursive else os.path.join(entry, "*.pptx")
+            matches = glob.glob(pattern, recursive=recursive)
+        elif glob.has_magic(entry):
+            matches = glob.glob(entry, recursive=True)
+        else:
+            matches = [entry]
+        for path in matches:
+            if path.lower().endswith(".pptx") and not os.path.basename(path).startswith("~$"):
+                found.add(os.path.abspath(path))
+    return sorted(found)
+
+
+def deck_output_folders(deck_paths, output_dir):
+    """
+    Mirrors each deck's folder, relative to the folder all the decks share, under 'output_dir', so
+    decks with the same name in different subfolders never write over each other's outputs,
+    manifests and journals. Decks from a single folder all go straight into 'output_dir'.
+
+    Returns:
+        dict: Maps each deck path to its output folder.
+    """
+    if not deck_paths:
+        return {}
+    common = os.path.commonpath([os.path.dirname(path) for path in deck_paths])
+    return {path: os.path.normpath(os.path.join(output_dir, os.path.relpath(os.path.dirname(path), common)))
+            for path in deck_paths}
+
+
+async def translate_decks(deck_paths, output_dir, target_languages, user_instructions, concurrency,
+                          workers, max_open_decks, requests_per_minute=None, tokens_per_minute=None, resume=False):
+    """
+    Translates many decks at once.
+
+    Extraction and reconstruction run in a process pool, while every LLM
+    request from every deck goes through one shared scheduler (and one
+    translation memory), so the machine and the API quota are both kept busy
+    without exceeding the configured limits. Every deck of the run shares the
+    glossary in 'output_dir'; see deck_output_folders for where outputs go.
+
+    Returns:
+        dict: Maps each deck path to the list of output files written for it.
+    """
+    output_folders = deck_output_folders(deck_paths, output_dir)
+    for folder in set(output_folders.values()) | {output_dir}:
+        os.makedirs(folder, exist_ok=True)
+    translation_memory = TranslationMemory()
+    # One set of metrics files for the whole run; every series is labelled with its deck.
+    telemetry = open_telemetry(None, output_dir, "translation")
+    scheduler = create_default_scheduler(ConsoleStatusQueue("pool", telemetry), max_in_flight=concurrency,
+                                         requests_per_minute=requests_per_minute,
+                                         tokens_per_minute=tokens_per_minute)
+    # Caps how many decks hold their text maps in memory at the same time.
+    open_decks = asyncio.Semaphore(max_open_decks)
+
+    async def run_one(deck_path):
+        output_folder = output_folders[deck_path]
+        # Labelled with its path under the output folder, so same-named decks stay apart in logs and metrics.
+        deck_name = os.path.relpath(os.path.join(output_folder, os.path.basename(deck_path)), output_dir)
+        deck_queue = ConsoleStatusQueue(deck_name, telemetry)
+        async with open_decks:
+            try:
+                return await translate_deck(deck_path, output_folder, user_instructions, deck_queue,
+                                            target_languages, scheduler, translation_memory, executor,
+                                            resume=resume, glossary_path=glossary_path_for(output_dir))
+            except Exception as e:
+                deck_queue.put(('log', f"An unexpected error occurred: {e}"))
+                return []
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = await asyncio.gather(*(run_one(path) for path in deck_paths))
+    finally:
+        await llm_provider.aclose_clients()
+        translation_memory.close()
+        if telemetry is not None:
+            telemetry.close()
+    return dict(zip(deck_paths, results))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Translate PowerPoint decks without the GUI. "
+                    "Requires the GOOGLE_API_KEY environment variable unless another --provider is used.")
+    parser.add_argument("inputs", nargs="+",
+                        help="Deck files, directories or glob patterns (e.g. 'decks/**/*.pptx').")
+    parser.add_argument("-l", "--language", dest="languages", action="append", required=True,
+                        help="Target language. Repeat or comma-separate for several (e.g. -l Japanese,Korean).")
+    parser.add_argument("-o", "--output-dir", required=True,
+                        help="Folder the translated decks are written to. Decks from several folders keep "
+                             "their subfolders (relative to the folder they share) under it.")
+    parser.add_argument("-c", "--concurrency", type=int, default=MAX_CONCURRENT_REQUESTS,
+                        help=f"Maximum in-flight LLM requests across all decks (default {MAX_CONCURRENT_REQUESTS}).")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes used for extraction and reconstruction (default: CPU count).")
+    parser.add_argument("--max-open-decks", type=int, default=None,
+                        help="Decks processed at the same time (default: twice the worker count).")
+    parser.add_argument("--rpm", type=int, default=None, help="Override the requests-per-minute limit.")
+    parser.add_argument("--tpm", type=int, default=None, help="Override the tokens-per-minute limit.")
+    parser.add_argument("-i", "--instructions", default="",
+                        help="Additional instructions for the translator (e.g. brand names not to translate).")
+    parser.add_argument("--instructions-file", help="Read the additional instructions from a text file.")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Search directories recursively.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run from the checkpoint journals in the output folder.")
+    parser.add_argument("--provider", choices=sorted(llm_provider.BACKENDS), default=llm_provider.PROVIDER,
+                        help=f"LLM backend (default {llm_provider.PROVIDER}). 'openai' talks to any "
+                             f"OpenAI-compatible server, e.g. local_llm_server.py for offline runs.")
+    parser.add_argument("--base-url", default=None,
+                        help=f"Server URL for --provider openai (default {llm_provider.OPENAI_BASE_URL}).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    The headless entry point: translates every matching deck into every requested language.
+    """
+    args = parse_args(argv)
+    llm_provider.use_provider(args.provider, base_url=args.base_url)
+    # Checked once here rather than failing every deck in turn once the process pool is up.
+    missing = llm_provider.missing_credentials()
+    if missing:
+        print(f"FATAL ERROR: {missing}")
+        return 1
+    target_languages = [lang.strip() for value in args.languages for lang in value.split(",") if lang.strip()]
+    user_instructions = args.instructions
+    if args.instructions_file:
+        with open(args.instructions_file, encoding="utf-8") as f:
+            user_instructions = f.read()
 
-    # --- PHASE 3: TRANSLATION ---
-    translated_data = translate_text_elements_in_batch(extracted_data, context_summary, target_language)
-    if not translated_data:
-        print("\nCould not complete Phase 3. Halting execution.")
-        return
-    print("\n--- Phase 3 Complete: All text elements have been translated. ---")
+    deck_paths = collect_decks(args.inputs, recursive=args.recursive)
+    if not deck_paths:
+        print("No .pptx files matched the given inputs.")
+        return 1
 
-    # --- PHASE 4: RECONSTRUCTION ---
-    reconstruct_presentation(translated_data, ppt_file, output_file)
+    print(f"--- Translating {len(deck_paths)} deck(s) into {', '.join(target_languages)} ---")
+    try:
+        results = asyncio.run(translate_decks(deck_paths, args.output_dir, target_languages, user_instructions,
+                                              concurrency=args.concurrency, workers=args.workers,
+                                              max_open_decks=args.max_open_decks or 2 * args.workers,
+                                              requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+                                              resume=args.resume))
+    except KeyboardInterrupt:
+        # asyncio.run has already cancelled the run, and every language in progress saved a partial deck.
+        print("\n--- Cancelled. Run again with --resume to finish without re-translating what was done. ---")
+        return 130
 
-    print(f"\n🎉 Success! Your translated presentation is ready: {output_file}")
+    failed = [path for path, written in results.items() if len(written) < len(target_languages)]
+    print(f"\n--- Done: {len(deck_paths) - len(failed)}/{len(deck_paths)} decks fully translated. ---")
+    for path in failed:
+        print(f"  - Incomplete: {path}")
+    return 1 if failed else 0
 
 
 # This ensures the main() function is called only when we run app.py
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -1,4 +1,137 @@
 from itertools import groupby
+from tokenizer import estimate_tokens
+
+# Every element also costs its JSON key, quotes and separators, in the prompt and in the reply.
+ELEMENT_OVERHEAD_TOKENS = 4
+# Translations are usually longer than the English source (especially for CJK targets).
+OUTPUT_EXPANSION = 2.0
+
+
+class SmartBatchPacker:
+    """
+    The incremental form of create_smart_batches: slides are fed in one at a
+    time (e.g. while the extractor is still parsing) and sealed batches come
+    out as soon as they are full.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.current_batch = []
+
+    def add_slide(self, slide_group):
+        """
+        Adds one slide's elements.
+
+        Returns:
+            list: The batches that were sealed by adding this slide (often empty).
+        """
+        sealed = []
+
+        # If a single slide is much larger than our batch size, split it.
+        if len(slide_group) > self.batch_size * 1.5:
+            # First, if the current_batch has items, seal it off.
+            if self.current_batch:
+                sealed.append(self.current_batch)
+                self.current_batch = []
+
+            # Split the large slide into chunks and add each as a separate batch.
+            for i in range(0, len(slide_group), self.batch_size):
+                sealed.append(slide_group[i:i + self.batch_size])
+            return sealed
+
+        # If adding the next slide would overflow the current batch, seal the current one.
+        if len(self.current_batch) + len(slide_group) > self.batch_size:
+            if self.current_batch:
+                sealed.append(self.current_batch)
+            self.current_batch = list(slide_group)
+        else:
+            # Otherwise, add the slide's elements to the current batch.
+            self.current_batch.extend(slide_group)
+        return sealed
+
+    def finish(self):
+        """Seals and returns whatever is left in the current batch."""
+        sealed = [self.current_batch] if self.current_batch else []
+        self.current_batch = []
+        return sealed
+
+
+class TokenBudgetBatchPacker:
+    """
+    The incremental form of create_token_budget_batches. Batches are filled
+    toward an input and output token budget; slides are kept together where
+    possible and very large slides are split on token boundaries.
+    """
+
+    def __init__(self, input_token_budget, output_token_budget, tokenizer=estimate_tokens,
+                 output_expansion=OUTPUT_EXPANSION):
+        self.input_token_budget = input_token_budget
+        self.output_token_budget = output_token_budget
+        self.tokenizer = tokenizer
+        self.output_expansion = output_expansion
+        self.current_batch, self.current_in, self.current_out = [], 0, 0
+
+    def _fits(self, input_tokens, output_tokens, scale=1.0):
+        return (input_tokens <= self.input_token_budget * scale and
+                output_tokens <= self.output_token_budget * scale)
+
+    def _seal_current(self, sealed):
+        if self.current_batch:
+            sealed.append(self.current_batch)
+        self.current_batch, self.current_in, self.current_out = [], 0, 0
+
+    def add_slide(self, slide_group):
+        """
+        Adds one slide's elements.
+
+        Returns:
+            list: The batches that were sealed by adding this slide (often empty).
+        """
+        sealed = []
+        costs = [estimate_element_tokens(item, self.tokenizer, self.output_expansion) for item in slide_group]
+        slide_in = sum(c[0] for c in costs)
+        slide_out = sum(c[1] for c in costs)
+
+        # Same 1.5x tolerance as the count-based batcher, measured in tokens.
+        if not self._fits(slide_in, slide_out, scale=1.5):
+            self._seal_current(sealed)
+
+            # Split the slide wherever the next element would overflow the budget.
+            chunk, chunk_in, chunk_out = [], 0, 0
+            for item, (item_in, item_out) in zip(slide_group, costs):
+                if chunk and not self._fits(chunk_in + item_in, chunk_out + item_out):
+                    sealed.append(chunk)
+                    chunk, chunk_in, chunk_out = [], 0, 0
+                chunk.append(item)
+                chunk_in += item_in
+                chunk_out += item_out
+            if chunk:
+                sealed.append(chunk)
+            return sealed
+
+        if self.current_batch and not self._fits(self.current_in + slide_in, self.current_out + slide_out):
+            self._seal_current(sealed)
+
+        self.current_batch.extend(slide_group)
+        self.current_in += slide_in
+        self.current_out += slide_out
+        return sealed
+
+    def finish(self):
+        """Seals and returns whatever is left in the current batch."""
+        sealed = []
+        self._seal_current(sealed)
+        return sealed
+
+
+def _pack_by_slide(text_map, packer):
+    # Group all text elements by their slide index and feed the packer one slide at a time.
+    final_batches = []
+    for _, slide_group in groupby(text_map, lambda x: x.slide_index):
+        final_batches.extend(packer.add_slide(list(slide_group)))
+    # Don't forget the last batch!
+    final_batches.extend(packer.finish())
+    return final_batches
 
 
 def create_smart_batches(text_map, batch_size):
@@ -15,38 +148,44 @@ def create_smart_batches(text_map, batch_size):
     """
     if not text_map:
         return []
+    return _pack_by_slide(text_map, SmartBatchPacker(batch_size))
 
-    final_batches = []
 
-    # Step 1: Group all text elements by their slide index.
-    # This gives us a list of lists, where each inner list is a full slide.
-    slides_as_groups = [list(g) for _, g in groupby(text_map, lambda x: x['slide_index'])]
+def estimate_element_tokens(item, tokenizer=estimate_tokens, output_expansion=OUTPUT_EXPANSION):
+    """
+    Estimates what one text element costs in a batch request.
 
-    current_batch = []
-    for slide_group in slides_as_groups:
-        # If a single slide is much larger than our batch size, split it.
-        if len(slide_group) > batch_size * 1.5:
-            # First, if the current_batch has items, seal it off.
-            if current_batch:
-                final_batches.append(current_batch)
-                current_batch = []
+    Args:
+        item (TextElement): A text element from the extractor.
+        tokenizer (callable): Maps a string to its token count. Any real tokenizer can be plugged in.
+        output_expansion (float): Expected ratio of translated tokens to source tokens.
 
-            # Split the large slide into chunks and add each as a separate batch.
-            for i in range(0, len(slide_group), batch_size):
-                final_batches.append(slide_group[i:i + batch_size])
-            continue  # Move to the next slide group
+    Returns:
+        tuple: (input_tokens, output_tokens) for this element.
+    """
+    text_tokens = tokenizer(item.original_text)
+    return (text_tokens + ELEMENT_OVERHEAD_TOKENS,
+            int(text_tokens * output_expansion) + ELEMENT_OVERHEAD_TOKENS)
 
-        # If adding the next slide would overflow the current batch, seal the current one.
-        if len(current_batch) + len(slide_group) > batch_size:
-            if current_batch:
-                final_batches.append(current_batch)
-            current_batch = slide_group
-        else:
-            # Otherwise, add the slide's elements to the current batch.
-            current_batch.extend(slide_group)
 
-    # Don't forget the last batch!
-    if current_batch:
-        final_batches.append(current_batch)
+def create_token_budget_batches(text_map, input_token_budget, output_token_budget,
+                                tokenizer=estimate_tokens, output_expansion=OUTPUT_EXPANSION):
+    """
+    Packs batches by estimated tokens instead of by element count. Slides are
+    kept together where possible and very large slides are split on token
+    boundaries, so every request carries a similar, predictable amount of work.
+
+    Args:
+        text_map (list): The flat list of text elements from the extractor.
+        input_token_budget (int): Target payload tokens per request.
+        output_token_budget (int): Target completion tokens per request.
+        tokenizer (callable): Maps a string to its token count. Defaults to a heuristic.
+        output_expansion (float): Expected ratio of translated tokens to source tokens.
 
-    return final_batches
\ No newline at end of file
+    Returns:
+        list: A list of lists, where each inner list is a batch of text elements.
+    """
+    if not text_map:
+        return []
+    packer = TokenBudgetBatchPacker(input_token_budget, output_token_budget, tokenizer, output_expansion)
+    return _pack_by_slide(text_map, packer)
@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from synthetic_deck import build_synthetic_deck
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_engine(engine, deck_path, workers):
+    """Runs one extractor in a fresh process so its peak RSS is not polluted by the other."""
+    started = time.perf_counter()
+    if engine == "python-pptx":
+        from extractor import extract_text_from_ppt_advanced
+        text_map = extract_text_from_ppt_advanced(deck_path)
+    else:
+        from fast_extractor import extract_text_fast
+        text_map = extract_text_fast(deck_path, max_workers=workers)
+    elapsed = time.perf_counter() - started
+    return elapsed, peak_rss_mb(), text_map
+
+
+def benchmark(deck_path, workers):
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    runs = [("python-pptx", 1), ("lxml", 1)]
+    if workers > 1:
+        runs.append(("lxml", workers))
+    for engine, engine_workers in runs:
+        # A fresh (non-daemonic) worker per run, so the lxml engine can start its own pool.
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[(engine, engine_workers)] = pool.submit(_run_engine, engine, deck_path, engine_workers).result()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the python-pptx and lxml extractors on a synthetic deck.")
+    parser.add_argument("--slides", type=int, default=300)
+    parser.add_argument("--image-kb", type=int, default=300, help="Size of the unique picture on every slide.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--deck", help="Benchmark this deck instead of generating one.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        deck_path = args.deck
+        if not deck_path:
+            deck_path = os.path.join(tmp, "synthetic.pptx")
+            print(f"Generating {args.slides} slides with {args.image_kb} KB images...")
+            build_synthetic_deck(deck_path, num_slides=args.slides, image_kb=args.image_kb)
+        print(f"Deck: {deck_path} ({os.path.getsize(deck_path) / 1e6:.1f} MB)\n")
+
+        results = benchmark(deck_path, args.workers)
+        baseline_time, _, baseline_map = results[("python-pptx", 1)]
+        print(f"{'engine':<12}{'workers':>8}{'seconds':>10}{'speedup':>9}{'peak RSS MB':>13}{'elements':>10}  same output")
+        for (engine, workers), (elapsed, peak_mb, text_map) in results.items():
+            print(f"{engine:<12}{workers:>8}{elapsed:>10.2f}{baseline_time / elapsed:>8.1f}x{peak_mb:>13.0f}"
+                  f"{len(text_map):>10}  {text_map == baseline_map}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from synthetic_deck import build_synthetic_deck
+
+
+def build_corpus(directory, total_slides, slides_per_deck):
+    """Writes enough synthetic decks (each with its own seed, so texts differ) to reach 'total_slides'."""
+    paths = []
+    for deck_number in range((total_slides + slides_per_deck - 1) // slides_per_deck):
+        path = os.path.join(directory, f"deck_{deck_number:03d}.pptx")
+        if not os.path.exists(path):
+            build_synthetic_deck(path, num_slides=min(slides_per_deck, total_slides - deck_number * slides_per_deck),
+                                 seed=deck_number)
+        paths.append(path)
+    return paths
+
+
+def _as_old_dict(element):
+    element = element.to_dict()
+    # The old extractor produced a fresh string for every element; undo the interning.
+    element['original_text'] = element['original_text'].encode("utf-8").decode("utf-8")
+    return element
+
+
+def _measure(representation, deck_paths):
+    """Extracts the whole corpus and keeps every text map alive, as a long-running process would."""
+    from fast_extractor import iter_slide_text_elements_fast
+    tracemalloc.start()
+    started = time.perf_counter()
+    text_maps = []
+    for path in deck_paths:
+        text_map = []
+        for slide_elements in iter_slide_text_elements_fast(path):
+            if representation == "dicts":
+                slide_elements = [_as_old_dict(element) for element in slide_elements]
+            text_map.extend(slide_elements)
+        text_maps.append(text_map)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return sum(len(text_map) for text_map in text_maps), current, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory held by the text maps of a synthetic corpus: "
+                                                 "TextElement objects versus the old per-element dicts.")
+    parser.add_argument("--slides", type=int, default=10000, help="Total slides in the corpus.")
+    parser.add_argument("--slides-per-deck", type=int, default=500)
+    parser.add_argument("--corpus-dir", help="Keep the generated decks here (reused on the next run).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_dir = args.corpus_dir or tmp
+        os.makedirs(corpus_dir, exist_ok=True)
+        print(f"Building a corpus of {args.slides} slides in {corpus_dir}...")
+        deck_paths = build_corpus(corpus_dir, args.slides, args.slides_per_deck)
+
+        # Each representation is measured in a fresh process, so neither sees the other's interned strings.
+        context = multiprocessing.get_context("spawn")
+        print(f"\n{'representation':<16}{'elements':>10}{'retained MB':>13}{'peak MB':>9}{'bytes/element':>15}"
+              f"{'seconds':>9}")
+        for representation in ("dicts", "TextElement"):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                count, current, peak, elapsed = pool.submit(_measure, representation, deck_paths).result()
+            print(f"{representation:<16}{count:>10}{current / 1e6:>13.1f}{peak / 1e6:>9.1f}"
+                  f"{current / max(count, 1):>15.0f}{elapsed:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+# Cold-start budget of each entry point: milliseconds of import time, as reported by
+# 'python -X importtime', and whether the heavy dependencies below must stay out of it
+# (they are imported on first use instead). Entry points without a budget are only reported.
+ENTRY_POINTS = {
+    "gui": (150, True),
+    "app": (200, True),
+    "service": (200, True),
+    "local_llm_server": (None, False),
+    "benchmark": (None, False),
+}
+HEAVY_PACKAGES = ("langchain_core", "langchain_google_genai", "google", "grpc", "pydantic", "pptx", "httpx")
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+_REPO = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_profile(module):
+    """
+    Imports 'module' in a fresh interpreter under -X importtime.
+
+    Returns:
+        tuple: (milliseconds to import the module, {top-level package: milliseconds of
+               its own import time within the module's imports}).
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=_REPO,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+
+    # Children are listed before their parent; a module imported at the top level has depth 0.
+    subtree = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        depth = len(indent) - 1
+        if depth == 0 and name != module:
+            subtree = []
+            continue
+        subtree.append((int(self_us), name))
+        if depth == 0:
+            packages = {}
+            for us, imported in subtree:
+                package = imported.split(".")[0]
+                packages[package] = packages.get(package, 0) + us / 1000
+            return int(cumulative_us) / 1000, packages
+    raise RuntimeError(f"no import time reported for {module}")
+
+
+def process_seconds(module):
+    """Wall time of a fresh interpreter importing 'module', interpreter start-up included."""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=_REPO, check=True)
+    return time.perf_counter() - started
+
+
+def benchmark(modules, runs):
+    results = {}
+    for module in modules:
+        profiles = [import_profile(module) for _ in range(runs)]
+        import_ms = statistics.median(total for total, _ in profiles)
+        # The packages of the median run; which packages are imported does not vary between runs.
+        packages = sorted(profiles, key=lambda profile: profile[0])[len(profiles) // 2][1]
+        results[module] = {
+            'import_ms': import_ms,
+            'process_ms': statistics.median(process_seconds(module) for _ in range(runs)) * 1000,
+            'packages': packages,
+            'heavy_imports': sorted(package for package in packages if package in HEAVY_PACKAGES),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the cold-start import time of the GUI and the CLI entry points against their budgets.")
+    parser.add_argument("modules", nargs="*", default=list(ENTRY_POINTS),
+                        help=f"Entry points to measure (default: {', '.join(ENTRY_POINTS)}).")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per entry point; the median is kept.")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest packages listed per entry point.")
+    parser.add_argument("--json", help="Also write the results to this file, e.g. to compare runs.")
+    args = parser.parse_args()
+
+    results = benchmark(args.modules, args.runs)
+    failures = []
+    print(f"{'entry point':<18}{'import ms':>10}{'process ms':>12}{'budget ms':>11}  heavy imports")
+    for module, result in results.items():
+        budget, must_stay_light = ENTRY_POINTS.get(module, (None, False))
+        heavy = ", ".join(result['heavy_imports']) or "-"
+        print(f"{module:<18}{result['import_ms']:>10.0f}{result['process_ms']:>12.0f}"
+              f"{budget if budget else '-':>11}  {heavy}")
+        if budget and result['import_ms'] > budget:
+            failures.append(f"{module} takes {result['import_ms']:.0f} ms to import (budget {budget} ms)")
+        if must_stay_light and result['heavy_imports']:
+            failures.append(f"{module} imports {heavy} at start-up")
+
+    for module, result in results.items():
+        heaviest = sorted(result['packages'].items(), key=lambda item: item[1], reverse=True)[:args.top]
+        print(f"\n{module}: " + ", ".join(f"{package} {ms:.0f} ms" for package, ms in heaviest))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'results': results, 'failures': failures}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    if failures:
+        print("\nOver budget:\n" + "\n".join(f"  - {failure}" for failure in failures))
+        return 1
+    print("\nAll entry points are within their start-up budgets.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
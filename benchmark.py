@@ -0,0 +1,308 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import translator
+import llm_provider
+from fake_llm import FakeChatModel
+from local_llm_server import start_in_thread
+from tokenizer import estimate_tokens
+from segmentation import SEGMENT_RUNS, SEGMENT_PARAGRAPHS, RUN_TAG
+from synthetic_deck import build_synthetic_deck
+from bench_extraction import peak_rss_mb
+from extractor import extract_text_from_ppt_advanced
+from fast_extractor import extract_text_fast
+from dedup import deduplicate_text_elements, fan_out_translations
+from batcher import create_smart_batches, create_token_budget_batches
+from context_generator import agenerate_context_briefing
+from reconstructor import reconstruct_presentation
+from fast_reconstructor import reconstruct_presentation_fast
+
+# The benchmark measures the pipeline, not the API quota, so the rate limits default to "effectively none".
+UNLIMITED_PER_MINUTE = 10 ** 9
+
+
+class QuietStatusQueue:
+    """Collects the workflow's status messages; printed only with --verbose."""
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.logs = []
+
+    def put(self, message):
+        message_type, payload = message
+        if message_type == 'log':
+            self.logs.append(payload)
+            if self.verbose:
+                print(f"    {payload}")
+
+
+def use_fake_model(model):
+    """Registers 'model' as the "fake" LLM provider and makes every phase use it."""
+    llm_provider.BACKENDS["fake"] = lambda model_name: model
+    # Gemini cache names mean nothing to the fake; it understands the local stand-in's.
+    llm_provider.CONTEXT_CACHES["fake"] = "local"
+    llm_provider.use_provider("fake")
+    if translator.PROMPT_CACHE == "gemini":
+        translator.PROMPT_CACHE = "local"
+
+
+def legacy_translation_prompt(batch_dict_to_translate, context_briefing, target_language):
+    """
+    The translation prompt as it was before the prefix/payload split: the directives and briefing
+    repeated in every request, followed by the batch as indent=2 JSON. Kept only as the token baseline.
+    """
+    json_input_string = json.dumps(batch_dict_to_translate, indent=2, ensure_ascii=False)
+    tag_directive = ""
+    if any(RUN_TAG.search(text) for text in batch_dict_to_translate.values()):
+        tag_directive = (f"5.  Keep Inline Tags: Some values contain tags such as <r2>...</r2> and <br/>. They mark "
+                         f"formatting (bold words, links, line breaks). Keep every tag exactly as written, wrap the "
+                         f"translation of the same words in it (moving it where {target_language} word order needs "
+                         f"it), and never add, drop or rename tags.\n        ")
+
+    return f"""
+        You are a native-speaking marketing and business localization expert for {target_language}. 
+        Your task is to translate a JSON object of English text snippets into {target_language}.
+        Your Core Directives:
+        1.  Prioritize Natural Phrasing: The translation must sound like it was written by a native-speaking business professional. Avoid stiff, overly literal, or robotic language. Use natural, idiomatic expressions where appropriate.
+        2.  Understand the Context: Use the provided context briefing to understand the document's goal, audience, and tone. The translation's tone must match.
+        3.  Handle Jargon Intelligently: If a term is a globally recognized acronym (e.g., "KPI", "ROI", "B2B") or a specific brand/project name mentioned in the user's instructions, preserve it in its original English form unless a common, accepted {target_language} equivalent exists.
+        4.  Strict JSON I/O: You will be given a JSON object. You MUST return ONLY a single, valid JSON object with the exact same keys as the input, where the values are the translated text. Do not add any extra text, explanations, or markdown like ```json.
+        {tag_directive}{context_briefing}
+        Translate the values in the following JSON object into {target_language}:
+        ---
+        {json_input_string}
+        ---
+        """
+
+
+def prompt_tokens_by_format(batches, context_briefing, target_language):
+    """
+    Prompt tokens for one request per batch (no retries or follow-ups), in each prompt format:
+    'before' (legacy_translation_prompt), 'inline' (the prefix sent with every compact payload)
+    and 'cached' (the compact payloads alone, with 'prefix' tokens read from the context cache).
+    """
+    prefix = estimate_tokens(translator.build_translation_prefix(context_briefing, target_language))
+    tokens = {'before': 0, 'inline': 0, 'cached': 0, 'prefix': prefix}
+    for batch in batches:
+        batch_dict = {str(i): unit.original_text for i, unit in enumerate(batch)}
+        payload = estimate_tokens(translator.build_translation_payload(batch_dict))
+        tokens['before'] += estimate_tokens(legacy_translation_prompt(batch_dict, context_briefing, target_language))
+        tokens['inline'] += prefix + payload
+        tokens['cached'] += payload
+    return tokens
+
+
+def run_on_new_loop(coro):
+    """asyncio.run for one phase, closing the model clients' connections built on its loop afterwards."""
+    async def run():
+        try:
+            return await coro
+        finally:
+            await llm_provider.aclose_clients()
+    return asyncio.run(run())
+
+
+class PhaseTimer:
+    """Records wall time, throughput and the peak RSS reached by the end of each phase."""
+
+    def __init__(self):
+        self.phases = []
+
+    def run(self, name, elements, fn, *args, **kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.record(name, elements, time.perf_counter() - started)
+        return result
+
+    def record(self, name, elements, elapsed):
+        self.phases.append({
+            'phase': name,
+            'seconds': elapsed,
+            'elements': elements,
+            'elements_per_second': elements / elapsed if elapsed > 0 else float("inf"),
+            'peak_rss_mb': peak_rss_mb(),
+        })
+
+    def report(self):
+        print(f"\n{'phase':<16}{'seconds':>9}{'elements':>10}{'elements/s':>13}{'peak RSS MB':>13}")
+        for phase in self.phases:
+            print(f"{phase['phase']:<16}{phase['seconds']:>9.2f}{phase['elements']:>10}"
+                  f"{phase['elements_per_second']:>13.0f}{phase['peak_rss_mb']:>13.0f}")
+        total = sum(phase['seconds'] for phase in self.phases)
+        print(f"{'total':<16}{total:>9.2f}")
+
+
+def run_benchmark(deck_path, output_path, args):
+    """
+    Runs every phase of the translation pipeline on one deck against the fake model.
+
+    The phases run one after another (not streamed as in the workflow) so that
+    each one's time and memory can be attributed to it.
+
+    Returns:
+        dict: The per-phase measurements and the model and scheduler counters.
+    """
+    model = FakeChatModel(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          rate_limit_rate=args.rate_limit_rate, malformed_rate=args.malformed_rate,
+                          stall_rate=args.stall_rate, stall_seconds=args.stall_seconds, seed=args.seed)
+    use_fake_model(model)
+    server = stop_server = None
+    if args.transport == "http":
+        # Same fake model, but every call goes through the pooled HTTP client and a local server.
+        server, stop_server = start_in_thread(model)
+        llm_provider.use_provider("openai", base_url=server.base_url)
+    translator.PROMPT_CACHE = args.prompt_cache
+    translator.REQUEST_TIMEOUT = args.request_timeout
+    translator.HEDGE_PERCENTILE = args.hedge_percentile or None
+    translator.HEDGE_BUDGET = args.hedge_budget
+    status_queue = QuietStatusQueue(args.verbose)
+    timer = PhaseTimer()
+
+    extract = extract_text_fast if args.engine == "lxml" else extract_text_from_ppt_advanced
+    started = time.perf_counter()
+    text_map = extract(deck_path, segmentation=args.segmentation)
+    timer.record("extraction", len(text_map), time.perf_counter() - started)
+
+    def batch(text_map):
+        units, occurrences = deduplicate_text_elements(text_map)
+        if args.batching == "tokens":
+            return units, occurrences, create_token_budget_batches(units, args.input_budget, args.output_budget)
+        return units, occurrences, create_smart_batches(units, args.batch_size)
+
+    units, occurrences, batches = timer.run("batching", len(text_map), batch, text_map)
+
+    scheduler = translator.create_default_scheduler(status_queue, max_in_flight=args.concurrency,
+                                                    requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    started = time.perf_counter()
+    briefing = run_on_new_loop(agenerate_context_briefing(text_map, "", scheduler=scheduler, status_queue=status_queue))
+    timer.record("briefing", len(text_map), time.perf_counter() - started)
+
+    prompt_tokens_before, cached_tokens_before = model.prompt_tokens, model.cached_prompt_tokens
+    started = time.perf_counter()
+    translated = run_on_new_loop(translator.translate_text_elements_in_batch(batches, briefing, "Japanese",
+                                                                             status_queue, scheduler=scheduler))
+    timer.record("translation", len(units), time.perf_counter() - started)
+    fan_out_translations(translated or [], occurrences)
+
+    reconstruct = reconstruct_presentation_fast if args.engine == "lxml" else reconstruct_presentation
+    timer.run("reconstruction", len(text_map), reconstruct, text_map, deck_path, output_path)
+    if stop_server is not None:
+        stop_server()
+
+    failed = sum(1 for item in text_map if (item.translated_text or "").startswith("ERROR:"))
+    return {
+        'deck': deck_path,
+        'phases': timer.phases,
+        'timer': timer,
+        'elements': len(text_map),
+        'units': len(units),
+        'source_tokens': sum(estimate_tokens(unit.original_text) for unit in units),
+        # Translation requests only; the briefing request reads the whole deck once.
+        'translation_prompt_tokens': model.prompt_tokens - prompt_tokens_before,
+        'translation_cached_prompt_tokens': model.cached_prompt_tokens - cached_tokens_before,
+        'prompt_tokens_by_format': prompt_tokens_by_format(batches, briefing, "Japanese"),
+        'batches': len(batches),
+        'failed_elements': failed,
+        'model': {'calls': model.calls, 'prompt_tokens': model.prompt_tokens,
+                  'cached_prompt_tokens': model.cached_prompt_tokens,
+                  'peak_concurrency': model.peak_concurrency, 'malformed_replies': model.malformed_replies},
+        'scheduler': dict(scheduler.stats),
+        'http': {'connections': server.connections, 'requests': server.requests} if server else None,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Offline benchmark of every pipeline phase on a synthetic deck, against a fake LLM.")
+    deck = parser.add_argument_group("deck")
+    deck.add_argument("--deck", help="Benchmark this deck instead of generating one.")
+    deck.add_argument("--slides", type=int, default=200)
+    deck.add_argument("--paragraphs", type=int, default=4, help="Paragraphs per body text box.")
+    deck.add_argument("--runs", type=int, default=3, help="Runs per paragraph.")
+    deck.add_argument("--table-every", type=int, default=5, help="Add a table to every n-th slide (0 for none).")
+    deck.add_argument("--table-rows", type=int, default=5)
+    deck.add_argument("--table-cols", type=int, default=4)
+    deck.add_argument("--image-kb", type=int, default=0)
+    model = parser.add_argument_group("fake model")
+    model.add_argument("--latency", type=float, default=0.2, help="Median seconds per call.")
+    model.add_argument("--jitter", type=float, default=0.3, help="Log-normal spread of the latency (0 = fixed).")
+    model.add_argument("--error-rate", type=float, default=0.0, help="Share of calls failing with a 500.")
+    model.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of calls failing with a 429.")
+    model.add_argument("--stall-rate", type=float, default=0.0, help="Share of calls that hang before answering.")
+    model.add_argument("--stall-seconds", type=float, default=120.0, help="How long a stalled call hangs.")
+    model.add_argument("--malformed-rate", type=float, default=0.0, help="Share of replies with broken JSON.")
+    pipeline = parser.add_argument_group("pipeline")
+    pipeline.add_argument("--engine", choices=("lxml", "python-pptx"), default="lxml",
+                          help="Extraction and reconstruction engine.")
+    pipeline.add_argument("--segmentation", choices=(SEGMENT_PARAGRAPHS, SEGMENT_RUNS), default=SEGMENT_PARAGRAPHS,
+                          help="One element per paragraph (with inline run tags) or per run.")
+    pipeline.add_argument("--transport", choices=("inprocess", "http"), default="inprocess",
+                          help="Call the fake model directly, or through the OpenAI-compatible provider and "
+                               "local_llm_server.py (exercises the pooled HTTP client; no context cache).")
+    pipeline.add_argument("--prompt-cache", choices=("local", "off"), default="local",
+                          help="Serve the prompt prefix from the local context-cache stand-in, or resend it each time.")
+    pipeline.add_argument("--batching", choices=("tokens", "count"), default=translator.BATCHING_MODE)
+    pipeline.add_argument("--batch-size", type=int, default=translator.BATCH_SIZE)
+    pipeline.add_argument("--input-budget", type=int, default=translator.INPUT_TOKEN_BUDGET)
+    pipeline.add_argument("--output-budget", type=int, default=translator.OUTPUT_TOKEN_BUDGET)
+    pipeline.add_argument("--concurrency", type=int, default=translator.MAX_CONCURRENT_REQUESTS)
+    pipeline.add_argument("--request-timeout", type=float, default=translator.REQUEST_TIMEOUT,
+                          help="Seconds before a request is abandoned and retried.")
+    pipeline.add_argument("--hedge-percentile", type=float, default=translator.HEDGE_PERCENTILE,
+                          help="Latency percentile after which a duplicate request is sent (0 disables hedging).")
+    pipeline.add_argument("--hedge-budget", type=float, default=translator.HEDGE_BUDGET,
+                          help="Maximum hedged duplicates per request sent.")
+    pipeline.add_argument("--rpm", type=int, default=UNLIMITED_PER_MINUTE)
+    pipeline.add_argument("--tpm", type=int, default=UNLIMITED_PER_MINUTE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this file, e.g. to compare runs.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print the pipeline's log messages.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        deck_path = args.deck
+        if not deck_path:
+            deck_path = os.path.join(tmp, "synthetic.pptx")
+            print(f"Generating {args.slides} slides...")
+            build_synthetic_deck(deck_path, num_slides=args.slides, paragraphs_per_shape=args.paragraphs,
+                                 runs_per_paragraph=args.runs, table_every=args.table_every,
+                                 table_rows=args.table_rows, table_cols=args.table_cols, image_kb=args.image_kb,
+                                 seed=args.seed)
+        print(f"Deck: {deck_path} ({os.path.getsize(deck_path) / 1e6:.1f} MB)")
+
+        results = run_benchmark(deck_path, os.path.join(tmp, "translated.pptx"), args)
+
+    results.pop('timer').report()
+    print(f"\n{results['elements']} elements -> {results['units']} unique units ({results['source_tokens']} source "
+          f"tokens) in {results['batches']} batches; {results['failed_elements']} elements failed.")
+    per_element = max(results['elements'], 1)
+    print(f"Translation prompts: {results['translation_prompt_tokens']} tokens sent "
+          f"({results['translation_prompt_tokens'] / per_element:.1f} per element) + "
+          f"{results['translation_cached_prompt_tokens']} read from the context cache "
+          f"({results['translation_cached_prompt_tokens'] / per_element:.1f} per element).")
+    formats = results['prompt_tokens_by_format']
+    print(f"Prompt tokens per element, one request per batch: {formats['before'] / per_element:.1f} before "
+          f"(whole prompt with indent=2 JSON), {formats['inline'] / per_element:.1f} with the prefix sent inline, "
+          f"{formats['cached'] / per_element:.1f} sent + "
+          f"{formats['prefix'] * results['batches'] / per_element:.1f} read from the context cache.")
+    print(f"Model: {results['model']['calls']} calls, {results['model']['prompt_tokens']} prompt tokens, peak concurrency {results['model']['peak_concurrency']}, "
+          f"{results['model']['malformed_replies']} malformed replies.")
+    if results['http']:
+        print(f"HTTP: {results['http']['requests']} requests over {results['http']['connections']} connections.")
+    print("Scheduler: " + ", ".join(f"{key} {value}" for key, value in results['scheduler'].items()))
+
+    if args.json:
+        results['settings'] = vars(args)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
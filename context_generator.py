@@ -1,52 +1,197 @@
-import os
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage
+import asyncio
+import hashlib
+from itertools import groupby
+from tokenizer import estimate_tokens
+import llm_provider
 
+# Decks whose text fits in one prompt are summarized in a single call (the original behaviour).
+BRIEFING_SINGLE_PASS_TOKENS = 30000
+# Larger decks are split into chunks of whole slides of about this size and summarized concurrently.
+BRIEFING_CHUNK_TOKENS = 8000
 
-def generate_context_briefing(text_map, user_additional_context):  # <-- Modified
+
+def _format_briefing(ai_summary, user_additional_context):
+    # NO MORE input() call here. We use the argument directly.
+    return f"""--- CONTEXT BRIEFING FOR TRANSLATOR ---
+**Part 1: AI-Generated Analysis**
+{ai_summary}
+**Part 2: Specific Instructions from User**
+{user_additional_context if user_additional_context.strip() else "None."}
+--- END OF BRIEFING ---"""
+
+
+def _summarizer_prompt(all_text):
+    return f"""
+        You are a brilliant marketing strategist. Read the following presentation text dump and generate a concise summary (in English) to brief a translator.
+        Focus on: Core Business Goal, Target Audience, Overall Tone, and Key Jargon.
+        Here is the text:
+        ---
+        {all_text}
+        ---
+        """
+
+
+def _chunk_summary_prompt(chunk_text, first_slide, last_slide):
+    return f"""
+        You are a brilliant marketing strategist. The following text comes from slides {first_slide} to {last_slide} of a longer presentation.
+        Write a short analysis (in English) of this part only, covering: its Business Goal, Target Audience, Tone, and every piece of Key Jargon, brand or product name it uses.
+        Here is the text:
+        ---
+        {chunk_text}
+        ---
+        """
+
+
+def _reduce_prompt(partial_summaries):
+    joined = "\n\n".join(f"Part {i + 1}:\n{summary}" for i, summary in enumerate(partial_summaries))
+    return f"""
+        You are a brilliant marketing strategist. Below are analyses of consecutive parts of one presentation.
+        Merge them into a single concise summary (in English) to brief a translator.
+        Focus on: Core Business Goal, Target Audience, Overall Tone, and Key Jargon (keep every distinct term, without duplicates).
+        ---
+        {joined}
+        ---
+        """
+
+
+def hash_deck_text(text_map):
+    """Fingerprints the deck's text, so an unchanged deck reuses its cached analysis."""
+    digest = hashlib.sha256()
+    for item in text_map:
+        digest.update(item.original_text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def chunk_slides_by_tokens(text_map, chunk_tokens):
+    """
+    Splits the text map into chunks of whole slides of roughly 'chunk_tokens' each.
+
+    Returns:
+        list: (first_slide_number, last_slide_number, chunk_text) tuples.
     """
-    Generates a context briefing using AI summary and user-provided instructions.
+    chunks = []
+    current_texts, current_tokens, first_slide, last_slide = [], 0, None, None
+    for slide_index, slide_group in groupby(text_map, lambda x: x.slide_index):
+        slide_text = " ".join(item.original_text for item in slide_group)
+        slide_tokens = estimate_tokens(slide_text)
+        if current_texts and current_tokens + slide_tokens > chunk_tokens:
+            chunks.append((first_slide, last_slide, " ".join(current_texts)))
+            current_texts, current_tokens, first_slide = [], 0, None
+        if first_slide is None:
+            first_slide = slide_index + 1
+        last_slide = slide_index + 1
+        current_texts.append(slide_text)
+        current_tokens += slide_tokens
+    if current_texts:
+        chunks.append((first_slide, last_slide, " ".join(current_texts)))
+    return chunks
+
+
+async def agenerate_context_briefing(text_map, user_additional_context, scheduler=None, translation_memory=None,
+                                     status_queue=None):
+    """
+    Generates the context briefing for the translator: an AI analysis of the
+    deck (goal, audience, tone and jargon) followed by the user's instructions.
+
+    Small decks are summarized in one call. Larger decks are cut into chunks of
+    whole slides that are summarized concurrently, and the partial summaries
+    are then reduced into one analysis (repeatedly, if they are still too long).
+    The analysis is cached by a hash of the deck text, so re-running a deck,
+    or translating it into another language, skips the AI calls entirely.
 
     Args:
         text_map (list): The list of extracted text elements from Phase 1.
         user_additional_context (str): Specific instructions from the user via the GUI.
+        scheduler (RequestScheduler, optional): Paces and retries the calls alongside the translation batches.
+        translation_memory (TranslationMemory, optional): Where analyses are cached.
+        status_queue (queue.Queue, optional): Receives ('log', ...) messages.
     """
-    print("\n--- Starting Phase 2: Context Generation ---")
+    def log(message):
+        if status_queue is not None:
+            status_queue.put(('log', message))
+        else:
+            print(message)
 
-    if 'GOOGLE_API_KEY' not in os.environ:
-        print("\nFATAL ERROR: GOOGLE_API_KEY environment variable not found.")
+    missing = llm_provider.missing_credentials()
+    if missing:
+        log(f"FATAL ERROR: {missing}")
         return None
 
-    all_text = " ".join([item['original_text'] for item in text_map])
-    if not all_text.strip():
-        print("No text found to generate a summary.")
+    if not any(item.original_text.strip() for item in text_map):
+        log("No text found to generate a summary.")
         return "No text content found."
 
-    print("Connecting to Google GenAI to generate a summary...")
+    loop = asyncio.get_running_loop()
+    # Hashing and chunking a large deck, and the SQLite lookups, are kept off the event loop.
+    deck_hash = await loop.run_in_executor(None, hash_deck_text, text_map)
+    if translation_memory is not None:
+        cached_summary = await loop.run_in_executor(None, translation_memory.get_briefing, deck_hash)
+        if cached_summary:
+            log("Reusing the cached AI analysis for this deck.")
+            return _format_briefing(cached_summary, user_additional_context)
+
     try:
-        llm = ChatGoogleGenerativeAI(model="gemini-2.5-pro-preview-06-05")
-        summarizer_prompt = f"""
-        You are a brilliant marketing strategist. Read the following presentation text dump and generate a concise summary (in English) to brief a translator.
-        Focus on: Core Business Goal, Target Audience, Overall Tone, and Key Jargon.
-        Here is the text:
-        ---
-        {all_text}
-        ---
-        """
-        ai_response = llm.invoke([HumanMessage(content=summarizer_prompt)])
-        ai_summary = ai_response.content
-        print("\n--- AI-Generated Context Summary ---")
-        print(ai_summary)
+        llm = llm_provider.get_chat_model("briefing")
     except Exception as e:
-        print(f"\nAn error occurred while communicating with the AI: {e}")
+        log(f"An error occurred while communicating with the AI: {e}")
         return None
 
-    # NO MORE input() call here. We use the argument directly.
-    final_briefing = f"""--- CONTEXT BRIEFING FOR TRANSLATOR ---
-**Part 1: AI-Generated Analysis**
-{ai_summary}
-**Part 2: Specific Instructions from User**
-{user_additional_context if user_additional_context.strip() else "None."}
---- END OF BRIEFING ---"""
+    from langchain_core.messages import HumanMessage
 
-    return final_briefing
\ No newline at end of file
+    async def summarize(prompt, label):
+        async def attempt():
+            ai_response = await llm.ainvoke([HumanMessage(content=prompt)])
+            return ai_response.content
+        if scheduler is None:
+            return await attempt()
+        # The scheduler returns None once its retries are exhausted.
+        return await scheduler.run(attempt, estimated_tokens=estimate_tokens(prompt) + 1000, label=label)
+
+    try:
+        chunks = await loop.run_in_executor(None, chunk_slides_by_tokens, text_map, BRIEFING_CHUNK_TOKENS)
+        total_tokens = sum(estimate_tokens(chunk_text) for _, _, chunk_text in chunks)
+        if total_tokens <= BRIEFING_SINGLE_PASS_TOKENS:
+            log(f"Connecting to {llm_provider.PROVIDER} to generate a summary...")
+            all_text = " ".join(chunk_text for _, _, chunk_text in chunks)
+            ai_summary = await summarize(_summarizer_prompt(all_text), "Context briefing")
+        else:
+            # Map: every chunk of slides is summarized concurrently.
+            log(f"Summarizing {len(chunks)} chunks of slides concurrently...")
+            summaries = await asyncio.gather(*(
+                summarize(_chunk_summary_prompt(chunk_text, first, last), f"Briefing chunk {first}-{last}")
+                for first, last, chunk_text in chunks))
+            if any(summary is None for summary in summaries):
+                log("ERROR: Some parts of the deck could not be summarized.")
+                return None
+
+            # Reduce: merge groups of partial summaries until a single one is left.
+            while len(summaries) > 1:
+                groups, group, group_tokens = [], [], 0
+                for summary in summaries:
+                    tokens = estimate_tokens(summary)
+                    if group and group_tokens + tokens > BRIEFING_SINGLE_PASS_TOKENS:
+                        groups.append(group)
+                        group, group_tokens = [], 0
+                    group.append(summary)
+                    group_tokens += tokens
+                groups.append(group)
+                # Always make progress, even if every summary is huge.
+                if len(groups) == len(summaries):
+                    groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+                log(f"Merging {len(summaries)} partial summaries...")
+                summaries = await asyncio.gather(*(
+                    summarize(_reduce_prompt(group), "Briefing merge") for group in groups))
+                if any(summary is None for summary in summaries):
+                    log("ERROR: The partial summaries could not be merged.")
+                    return None
+            ai_summary = summaries[0]
+    except Exception as e:
+        log(f"An error occurred while communicating with the AI: {e}")
+        return None
+
+    if not ai_summary:
+        return None
+    if translation_memory is not None:
+        await loop.run_in_executor(None, translation_memory.store_briefing, deck_hash, ai_summary)
+    return _format_briefing(ai_summary, user_additional_context)
@@ -0,0 +1,60 @@
+class Deduplicator:
+    """
+    Incremental deduplication: elements can be added slide by slide while the
+    extractor is still running.
+
+    The first occurrence of each string becomes its translation unit, so when the
+    units are batched the string still travels with the slide where it first appears.
+    """
+
+    def __init__(self):
+        # Maps each original text to every element (including the unit itself) that carries it.
+        self.occurrences = {}
+
+    def add(self, items):
+        """
+        Registers a group of elements (typically one slide).
+
+        Returns:
+            list: The elements that introduced a string not seen before, i.e. the new translation units.
+        """
+        new_units = []
+        for item in items:
+            text = item.original_text
+            if text not in self.occurrences:
+                self.occurrences[text] = []
+                new_units.append(item)
+            self.occurrences[text].append(item)
+        return new_units
+
+
+def deduplicate_text_elements(text_map):
+    """
+    Collapses elements with identical 'original_text' into single translation units.
+
+    Args:
+        text_map (list): The flat list of text elements from the extractor.
+
+    Returns:
+        tuple: (units, occurrences) where 'units' is the list of unique elements in
+               deck order and 'occurrences' maps each original text to every element
+               (including the unit itself) that carries it.
+    """
+    deduplicator = Deduplicator()
+    units = deduplicator.add(text_map)
+    return units, deduplicator.occurrences
+
+
+def fan_out_translations(units, occurrences):
+    """
+    Copies each unit's translation onto every other element with the same source text.
+
+    Args:
+        units (list): The translated units returned by the translator.
+        occurrences (dict): The occurrence map built by deduplicate_text_elements.
+    """
+    for unit in units:
+        if unit.translated_text is None:
+            continue
+        for item in occurrences.get(unit.original_text, []):
+            item.translated_text = unit.translated_text
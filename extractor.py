@@ -1,51 +1,72 @@
 import os
 from pptx import Presentation
 from pptx.enum.shapes import MSO_SHAPE_TYPE
+from text_element import TextElement, TABLE_CELL, TEXT_RUN, PARAGRAPH
+from segmentation import SEGMENT_RUNS, SEGMENT_PARAGRAPHS, segment_paragraph
 
-def extract_text_from_ppt_advanced(file_path):
+def iter_slide_text_elements(file_path, segmentation=SEGMENT_RUNS):
     """
-    Extracts text from a PowerPoint, preserving structure like titles,
-    table cells, and bold formatting.
+    Extracts text from a PowerPoint one slide at a time, preserving structure
+    like titles, table cells, and bold formatting.
+
+    Args:
+        file_path (str): The .pptx to read.
+        segmentation (str): SEGMENT_RUNS for one element per run, SEGMENT_PARAGRAPHS for one
+                            element per paragraph with inline run tags (see segmentation.py).
+
+    Yields:
+        list: The TextElements of each slide that has any text, in slide order.
     """
     if not os.path.exists(file_path):
         print(f"Error: The file '{file_path}' was not found.")
-        return []
+        return
 
     print(f"Opening presentation for deep extraction: {file_path}")
     prs = Presentation(file_path)
-    text_map = []
 
     for slide_index, slide in enumerate(prs.slides):
+        slide_elements = []
         for shape_index, shape in enumerate(slide.shapes):
             if shape.has_table:
                 table = shape.table
                 for r_idx, row in enumerate(table.rows):
                     for c_idx, cell in enumerate(row.cells):
                         if cell.text.strip():
-                            text_map.append({
-                                'type': 'table_cell',
-                                'slide_index': slide_index,
-                                'shape_index': shape_index,
-                                'location': {'row': r_idx, 'col': c_idx},
-                                'original_text': cell.text.strip(),
-                                'is_bold': False
-                            })
+                            slide_elements.append(TextElement(
+                                TABLE_CELL, slide_index, shape_index, r_idx, c_idx, cell.text.strip(),
+                                slide_id=slide.slide_id, shape_id=shape.shape_id))
             elif shape.has_text_frame:
                 is_title = (shape.is_placeholder and
                             hasattr(shape.placeholder_format, 'type') and
                             'TITLE' in str(shape.placeholder_format.type))
                 for p_idx, paragraph in enumerate(shape.text_frame.paragraphs):
+                    segmented = segment_paragraph(paragraph._p) if segmentation == SEGMENT_PARAGRAPHS else None
+                    if segmented is not None:
+                        text, is_bold = segmented
+                        if text.strip():
+                            slide_elements.append(TextElement(
+                                PARAGRAPH, slide_index, shape_index, p_idx, 0, text.strip(),
+                                is_bold=is_bold, is_title=is_title,
+                                slide_id=slide.slide_id, shape_id=shape.shape_id))
+                        continue
                     for r_idx, run in enumerate(paragraph.runs):
                         if run.text.strip():
-                            text_map.append({
-                                'type': 'text_run',
-                                'is_title': is_title,
-                                'slide_index': slide_index,
-                                'shape_index': shape_index,
-                                'location': {'paragraph': p_idx, 'run': r_idx},
-                                'original_text': run.text.strip(),
-                                'is_bold': run.font.bold or False
-                            })
+                            slide_elements.append(TextElement(
+                                TEXT_RUN, slide_index, shape_index, p_idx, r_idx, run.text.strip(),
+                                is_bold=run.font.bold or False, is_title=is_title,
+                                slide_id=slide.slide_id, shape_id=shape.shape_id))
+        if slide_elements:
+            yield slide_elements
+
+
+def extract_text_from_ppt_advanced(file_path, segmentation=SEGMENT_RUNS):
+    """
+    Extracts text from a PowerPoint, preserving structure like titles,
+    table cells, and bold formatting.
+    """
+    text_map = []
+    for slide_elements in iter_slide_text_elements(file_path, segmentation):
+        text_map.extend(slide_elements)
     return text_map
 
 # This block allows us to test this file directly
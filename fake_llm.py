@@ -0,0 +1,124 @@
+import re
+import json
+import time
+import random
+import asyncio
+from tokenizer import estimate_tokens
+from prompt_cache import resolve_local_cache
+
+_JSON_OBJECT_PATTERN = re.compile(r'\{.*\}', re.DOTALL)
+
+
+class FakeRateLimitError(Exception):
+    """Raised by the fake model to mimic a provider's HTTP 429 response."""
+
+
+class FakeModelError(Exception):
+    """Raised by the fake model to mimic a generic, non-quota failure."""
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeChatModel:
+    """
+    A local stand-in for ChatGoogleGenerativeAI exposing the same 'invoke'/'ainvoke' calls.
+
+    It never touches the network. Translation prompts (anything containing a JSON
+    object) get every value echoed back with a prefix; all other prompts get a
+    canned summary. Latency and failure rates are configurable so throughput and
+    retry behaviour can be measured offline.
+
+    'jitter' spreads each call's latency log-normally around 'latency' (0 keeps
+    it fixed; 0.5 gives the long tail real APIs have). 'malformed_rate' is the
+    share of translation replies that come back broken in one of the ways real
+    models break JSON: cut off, wrapped in prose and a code fence, or missing a key.
+    'stall_rate' is the share of calls that hang for 'stall_seconds' before
+    answering, like a request stuck behind an overloaded backend.
+    """
+
+    def __init__(self, latency=0.5, error_rate=0.0, rate_limit_rate=0.0, prefix="[translated]", seed=None,
+                 jitter=0.0, malformed_rate=0.0, stall_rate=0.0, stall_seconds=120.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.prefix = prefix
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.concurrency = 0
+        self.peak_concurrency = 0
+        self.malformed_replies = 0
+        # Estimated tokens of every prompt received, to compare prompt formats offline. Tokens read
+        # from a prompt_cache.LocalContextCache are counted separately, as a provider would bill them.
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+
+    def _delay(self):
+        if self.stall_rate and self.random.random() < self.stall_rate:
+            return self.stall_seconds
+        if not self.jitter:
+            return self.latency
+        return self.latency * self.random.lognormvariate(0, self.jitter)
+
+    def _maybe_fail(self):
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            raise FakeRateLimitError("429 Resource exhausted (fake model)")
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise FakeModelError("500 Internal error (fake model)")
+
+    def _count_prompt(self, messages, cached_content=None):
+        self.calls += 1
+        self.prompt_tokens += sum(estimate_tokens(message.content) for message in messages)
+        if cached_content:
+            # Like the real API, an unknown or expired cache name fails the call.
+            self.cached_prompt_tokens += estimate_tokens(resolve_local_cache(cached_content))
+
+    def _respond(self, messages):
+        prompt = messages[-1].content
+        match = _JSON_OBJECT_PATTERN.findall(prompt)
+        if match:
+            try:
+                payload = json.loads(match[-1])
+                translated = {key: f"{self.prefix} {value}" for key, value in payload.items()}
+                reply = json.dumps(translated, ensure_ascii=False)
+                if self.random.random() < self.malformed_rate:
+                    reply = self._malform(reply, translated)
+                return FakeResponse(reply)
+            except json.JSONDecodeError:
+                pass
+        return FakeResponse("Core Business Goal: demo. Target Audience: testers. Overall Tone: neutral.")
+
+    def _malform(self, reply, translated):
+        self.malformed_replies += 1
+        kind = self.random.choice(("truncated", "chatty", "missing_key"))
+        if kind == "truncated":
+            return reply[:max(1, int(len(reply) * self.random.uniform(0.3, 0.9)))]
+        if kind == "chatty":
+            return f"Sure! Here are the translations:\n```json\n{reply}\n```\nLet me know if you need anything else."
+        translated = dict(translated)
+        translated.pop(self.random.choice(list(translated)), None)
+        return json.dumps(translated, ensure_ascii=False)
+
+    async def ainvoke(self, messages, cached_content=None, **kwargs):
+        self._count_prompt(messages, cached_content)
+        self.concurrency += 1
+        self.peak_concurrency = max(self.peak_concurrency, self.concurrency)
+        try:
+            await asyncio.sleep(self._delay())
+            self._maybe_fail()
+            return self._respond(messages)
+        finally:
+            self.concurrency -= 1
+
+    def invoke(self, messages, cached_content=None, **kwargs):
+        self._count_prompt(messages, cached_content)
+        time.sleep(self._delay())
+        self._maybe_fail()
+        return self._respond(messages)
@@ -0,0 +1,145 @@
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from lxml import etree
+from text_element import TextElement, TABLE_CELL, TEXT_RUN, PARAGRAPH
+from segmentation import SEGMENT_RUNS, SEGMENT_PARAGRAPHS, segment_paragraph
+from pptx_xml import (SHAPE_TAGS, A_P, A_R, A_TR, A_TC, A_TXBODY, P_SP, P_SPTREE, P_TXBODY, slide_parts,
+                      run_text, text_body_text, run_is_bold, placeholder_is_title, shape_table, shape_id)
+
+# Below this many slides a process pool costs more to start than it saves.
+MIN_SLIDES_FOR_POOL = 50
+
+
+def _shape_elements(shape, slide_index, shape_index, slide_id, segmentation):
+    """TextElements of one top-level shape, in the same order as extractor.py."""
+    elements = []
+    sp_id = shape_id(shape)
+    table = shape_table(shape)
+    if table is not None:
+        for r_idx, row in enumerate(table.iterchildren(A_TR)):
+            for c_idx, cell in enumerate(row.iterchildren(A_TC)):
+                cell_text = text_body_text(cell.find(A_TXBODY))
+                if cell_text.strip():
+                    elements.append(TextElement(TABLE_CELL, slide_index, shape_index, r_idx, c_idx,
+                                                cell_text.strip(), slide_id=slide_id, shape_id=sp_id))
+    elif shape.tag == P_SP:
+        tx_body = shape.find(P_TXBODY)
+        if tx_body is None:
+            return elements
+        is_title = placeholder_is_title(shape)
+        for p_idx, paragraph in enumerate(tx_body.iterchildren(A_P)):
+            segmented = segment_paragraph(paragraph) if segmentation == SEGMENT_PARAGRAPHS else None
+            if segmented is not None:
+                text, is_bold = segmented
+                if text.strip():
+                    elements.append(TextElement(PARAGRAPH, slide_index, shape_index, p_idx, 0, text.strip(),
+                                                is_bold=is_bold, is_title=is_title,
+                                                slide_id=slide_id, shape_id=sp_id))
+                continue
+            for r_idx, run in enumerate(paragraph.iterchildren(A_R)):
+                text = run_text(run)
+                if text.strip():
+                    elements.append(TextElement(TEXT_RUN, slide_index, shape_index, p_idx, r_idx, text.strip(),
+                                                is_bold=run_is_bold(run), is_title=is_title,
+                                                slide_id=slide_id, shape_id=sp_id))
+    return elements
+
+
+def parse_slide_xml(slide_index, slide_xml, slide_id=None, segmentation=SEGMENT_RUNS):
+    """
+    Extracts the text elements of one slide from its raw XML.
+
+    The slide is streamed with iterparse: each top-level shape is processed as
+    soon as it has been read and then discarded, so even very large slides
+    never sit in memory as a full tree.
+
+    Args:
+        slide_index (int): Position of the slide in the presentation.
+        slide_xml (bytes): The content of the slide part.
+        slide_id (int, optional): The slide's id in presentation.xml, copied onto every element.
+        segmentation (str): SEGMENT_RUNS or SEGMENT_PARAGRAPHS, as in extractor.iter_slide_text_elements.
+
+    Returns:
+        list: The slide's text elements.
+    """
+    elements = []
+    shape_index = 0
+    for _, element in etree.iterparse(io.BytesIO(slide_xml), events=("end",), tag=SHAPE_TAGS):
+        parent = element.getparent()
+        # Shapes nested in a group are not part of slide.shapes; only top-level ones count.
+        if parent is None or parent.tag != P_SPTREE:
+            continue
+        elements.extend(_shape_elements(element, slide_index, shape_index, slide_id, segmentation))
+        shape_index += 1
+        # Free what has been processed so far.
+        element.clear()
+        while element.getprevious() is not None:
+            del parent[0]
+    return elements
+
+
+def _parse_slide_job(job):
+    return parse_slide_xml(*job)
+
+
+def iter_slide_text_elements_fast(file_path, segmentation=SEGMENT_RUNS):
+    """
+    Drop-in replacement for extractor.iter_slide_text_elements that reads only
+    the slide XML parts from the .pptx zip; images and other media are never loaded.
+
+    Yields:
+        list: The text elements of each slide that has any text, in slide order.
+    """
+    if not os.path.exists(file_path):
+        print(f"Error: The file '{file_path}' was not found.")
+        return
+
+    print(f"Opening presentation for fast extraction: {file_path}")
+    with zipfile.ZipFile(file_path) as zf:
+        for slide_index, (slide_id, part_name) in enumerate(slide_parts(zf)):
+            slide_elements = parse_slide_xml(slide_index, zf.read(part_name), slide_id, segmentation)
+            if slide_elements:
+                yield slide_elements
+
+
+def extract_text_fast(file_path, max_workers=None, segmentation=SEGMENT_RUNS):
+    """
+    Drop-in replacement for extractor.extract_text_from_ppt_advanced, emitting the same text-map schema.
+
+    Args:
+        file_path (str): The .pptx to read.
+        max_workers (int, optional): Parse slides across this many processes. None or 1 parses in-process.
+        segmentation (str): SEGMENT_RUNS or SEGMENT_PARAGRAPHS.
+
+    Returns:
+        list: The flat text map.
+    """
+    if not max_workers or max_workers <= 1:
+        return [item for slide_elements in iter_slide_text_elements_fast(file_path, segmentation) for item in slide_elements]
+
+    if not os.path.exists(file_path):
+        print(f"Error: The file '{file_path}' was not found.")
+        return []
+
+    print(f"Opening presentation for fast extraction: {file_path}")
+    with zipfile.ZipFile(file_path) as zf:
+        jobs = [(slide_index, zf.read(part_name), slide_id, segmentation)
+                for slide_index, (slide_id, part_name) in enumerate(slide_parts(zf))]
+
+    if len(jobs) < MIN_SLIDES_FOR_POOL:
+        results = map(_parse_slide_job, jobs)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(_parse_slide_job, jobs, chunksize=max(1, len(jobs) // (max_workers * 4))))
+    return [item for slide_elements in results for item in slide_elements]
+
+
+# This block allows us to test this file directly
+if __name__ == '__main__':
+    print("Testing fast_extractor.py directly...")
+    test_data = extract_text_fast('sample_deck.pptx')
+    if test_data:
+        print(f"Successfully extracted {len(test_data)} elements.")
+        print("Sample item:", test_data[0])
@@ -0,0 +1,253 @@
+import re
+import copy
+import shutil
+import zipfile
+from itertools import groupby
+from lxml import etree
+from text_element import TABLE_CELL, TEXT_RUN, PARAGRAPH, text_map_from_dicts
+from segmentation import apply_paragraph_translation
+from pptx_xml import (A_P, A_R, A_T, A_BR, A_FLD, A_RPR, A_TR, A_TC, A_TXBODY, A_BODYPR, A_ENDPARARPR, P_TXBODY,
+                      escape_ctrl_chars, slide_part_names, shape_table, top_level_shapes)
+
+# Raw entries are copied in chunks of this size, so a huge video never sits in memory in one piece.
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def _set_run_text(r, text):
+    t = r.find(A_T)
+    if t is None:
+        t = etree.SubElement(r, A_T)
+    t.text = escape_ctrl_chars(text)
+
+
+def _new_run(text):
+    r = etree.Element(A_R)
+    _set_run_text(r, text)
+    return r
+
+
+def _set_paragraph_text(p, text):
+    """Same result as python-pptx's 'paragraph.text = text': keeps <a:pPr> and <a:endParaRPr>, replaces the content."""
+    for child in list(p):
+        if child.tag in (A_R, A_BR, A_FLD):
+            p.remove(child)
+    end_para = p.find(A_ENDPARARPR)
+    content = []
+    for idx, run_text in enumerate(re.split("\n|\v", text)):
+        # Line breaks only go between runs, and runs that would be empty are skipped.
+        if idx > 0:
+            content.append(etree.Element(A_BR))
+        if run_text:
+            content.append(_new_run(run_text))
+    for element in content:
+        if end_para is not None:
+            end_para.addprevious(element)
+        else:
+            p.append(element)
+
+
+def _cell_text_body(tc):
+    tx_body = tc.find(A_TXBODY)
+    if tx_body is None:
+        tx_body = etree.Element(A_TXBODY)
+        etree.SubElement(tx_body, A_BODYPR)
+        tc.insert(0, tx_body)
+    return tx_body
+
+
+def apply_translation_xml(shapes, item, translated_text):
+    """
+    XML counterpart of reconstructor.apply_translation: writes one translated
+    element into a parsed slide, with the same formatting rules.
+
+    Args:
+        shapes (list): The slide's top-level shapes, as returned by pptx_xml.top_level_shapes.
+        item (TextElement): A text-map element.
+        translated_text (str): Its translation.
+    """
+    shape = shapes[item.shape_index]
+
+    if item.type == TABLE_CELL:
+        row, col = item.location_major, item.location_minor
+        table = shape_table(shape)
+        if table is None:
+            raise KeyError("shape has no table")
+        cell = list(list(table.iterchildren(A_TR))[row].iterchildren(A_TC))[col]
+        tx_body = _cell_text_body(cell)
+
+        # Like the python-pptx engine: the first paragraph keeps its style and gets all the text,
+        # every other paragraph is removed.
+        paragraphs = list(tx_body.iterchildren(A_P))
+        if not paragraphs:
+            paragraphs = [etree.SubElement(tx_body, A_P)]
+        _set_paragraph_text(paragraphs[0], translated_text)
+        for p in paragraphs[1:]:
+            tx_body.remove(p)
+
+    elif item.type == TEXT_RUN:
+        p_idx, r_idx = item.location_major, item.location_minor
+        tx_body = shape.find(P_TXBODY)
+        if tx_body is None:
+            raise KeyError("shape has no text frame")
+        run = list(list(tx_body.iterchildren(A_P))[p_idx].iterchildren(A_R))[r_idx]
+        _set_run_text(run, translated_text)
+
+        r_pr = run.find(A_RPR)
+        if r_pr is None:
+            r_pr = etree.Element(A_RPR)
+            run.insert(0, r_pr)
+        r_pr.set("b", "1" if item.is_bold else "0")
+
+    elif item.type == PARAGRAPH:
+        tx_body = shape.find(P_TXBODY)
+        if tx_body is None:
+            raise KeyError("shape has no text frame")
+        apply_paragraph_translation(list(tx_body.iterchildren(A_P))[item.location_major], translated_text)
+
+
+def _copy_raw_entry(src, zout, info, end_offset):
+    """
+    Copies one entry's local header and (still compressed) data verbatim, then
+    registers it for the central directory. Nothing is decompressed or recompressed.
+    """
+    new_info = copy.copy(info)
+    new_info.header_offset = zout.fp.tell()
+    src.seek(info.header_offset)
+    remaining = end_offset - info.header_offset
+    while remaining > 0:
+        chunk = src.read(min(COPY_CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        zout.fp.write(chunk)
+        remaining -= len(chunk)
+    zout.filelist.append(new_info)
+    zout.NameToInfo[new_info.filename] = new_info
+    zout.start_dir = zout.fp.tell()
+    zout._didModify = True
+
+
+def write_patched_package(source_path, output_path, replaced_parts):
+    """
+    Writes a copy of a .pptx in which only 'replaced_parts' are re-encoded.
+
+    Every other entry (images, media, layouts, untouched slides) is copied
+    byte-for-byte, so the cost scales with the edited XML, not with the file size.
+
+    Args:
+        source_path (str): The original package.
+        output_path (str): Where to write the copy.
+        replaced_parts (dict): Maps part names to their new bytes.
+    """
+    if not replaced_parts:
+        shutil.copyfile(source_path, output_path)
+        return
+
+    with open(source_path, "rb") as src, zipfile.ZipFile(src) as zin, \
+            zipfile.ZipFile(output_path, "w") as zout:
+        # An entry's raw bytes run from its local header to the next header (or the central directory).
+        infos = sorted(zin.infolist(), key=lambda info: info.header_offset)
+        end_offsets = [info.header_offset for info in infos[1:]] + [zin.start_dir]
+        for info, end_offset in zip(infos, end_offsets):
+            if info.filename in replaced_parts:
+                new_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                new_info.compress_type = zipfile.ZIP_DEFLATED
+                new_info.external_attr = info.external_attr
+                zout.writestr(new_info, replaced_parts[info.filename])
+            else:
+                _copy_raw_entry(src, zout, info, end_offset)
+
+
+class PartPatchingWriter:
+    """
+    Drop-in replacement for reconstructor.PresentationWriter that edits slide
+    XML parts directly.
+
+    Edits are grouped by slide, each touched slide is parsed once and kept as
+    an lxml tree, and saving re-encodes only those slides while every other part
+    of the package is copied verbatim. Images and media are never loaded.
+    """
+
+    def __init__(self, original_ppt_path):
+        self.original_ppt_path = original_ppt_path
+        with zipfile.ZipFile(original_ppt_path) as zf:
+            self.slide_parts = slide_part_names(zf)
+        # part name -> (parsed slide root, its top-level shapes), only for slides that were edited.
+        self._slides = {}
+
+    def _slide(self, slide_index):
+        part_name = self.slide_parts[slide_index]
+        if part_name not in self._slides:
+            with zipfile.ZipFile(self.original_ppt_path) as zf:
+                root = etree.fromstring(zf.read(part_name))
+            self._slides[part_name] = (root, top_level_shapes(root))
+        return self._slides[part_name]
+
+    def apply(self, edits):
+        """
+        Applies a group of edits.
+
+        Args:
+            edits (iterable): (item, translated_text) pairs.
+        """
+        ordered = sorted(edits, key=lambda edit: edit[0].slide_index)
+        for slide_index, slide_edits in groupby(ordered, key=lambda edit: edit[0].slide_index):
+            try:
+                _, shapes = self._slide(slide_index)
+            except (IndexError, KeyError) as e:
+                print(f"  - Warning: Could not find slide {slide_index}. Error: {e}. Skipping.")
+                continue
+            for item, translated_text in slide_edits:
+                try:
+                    apply_translation_xml(shapes, item, translated_text)
+                except (IndexError, KeyError) as e:
+                    print(
+                        f"  - Warning: Could not find or process element at {item.location}. Error: {e}. Skipping.")
+                except Exception as e:
+                    print(f"  - Warning: An unexpected error occurred while updating an item: {e}. Skipping.")
+
+    def save(self, output_ppt_path):
+        """Writes the patched package. Returns True on success."""
+        try:
+            print(f"\nSaving translated presentation to: {output_ppt_path}")
+            replaced_parts = {
+                part_name: etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+                for part_name, (root, _) in self._slides.items()
+            }
+            write_patched_package(self.original_ppt_path, output_ppt_path, replaced_parts)
+            print("--- Reconstruction Complete ---")
+            return True
+        except Exception as e:
+            print(f"Error saving the final presentation: {e}")
+            return False
+
+
+def reconstruct_presentation_fast(text_map, original_ppt_path, output_ppt_path):
+    """
+    Drop-in replacement for reconstructor.reconstruct_presentation that patches
+    only the slide parts holding translated text.
+    """
+    print("\n--- Starting Phase 4: Reconstructing the Presentation ---")
+
+    try:
+        writer = PartPatchingWriter(original_ppt_path)
+    except Exception as e:
+        print(f"Error opening original presentation file: {e}")
+        return False
+
+    print(f"Updating {len(text_map)} text elements...")
+    # Dict-form text maps (the old extractor output) are still accepted.
+    text_map = text_map_from_dicts(text_map)
+    writer.apply((item, item.translated_text if item.translated_text is not None else item.original_text)
+                 for item in text_map)
+    return writer.save(output_ppt_path)
+
+
+# This block allows us to test this file directly
+if __name__ == '__main__':
+    from fast_extractor import extract_text_fast
+    print("Testing fast_reconstructor.py directly...")
+    test_map = extract_text_fast('sample_deck.pptx')
+    for element in test_map:
+        element.translated_text = element.original_text.upper()
+    if reconstruct_presentation_fast(test_map, 'sample_deck.pptx', 'sample_deck_patched.pptx'):
+        print("Wrote sample_deck_patched.pptx")
@@ -6,7 +6,7 @@ import os
 import asyncio
 import sys
 import subprocess
-from workflow import run_translation_workflow
+from telemetry import ThroughputTracker
 
 
 def open_file_in_explorer(path):
@@ -33,6 +33,22 @@ def open_file_in_explorer(path):
         print(f"Error opening file explorer: {e}")
 
 
+def prewarm_pipeline():
+    """
+    Imports the translation pipeline and the LLM SDK (LangChain, pydantic and
+    the provider's client). They are not needed to draw the window, so they
+    load in a background thread while the user picks a deck; if Translate is
+    clicked before that is done, the run simply waits for the import to finish.
+    """
+    try:
+        import workflow  # noqa: F401
+        import llm_provider
+        llm_provider.prewarm()
+    except Exception as e:
+        # Reported properly when a run imports the pipeline for real.
+        print(f"Background import failed: {e}")
+
+
 class TranslatorApp:
     def __init__(self, root):
         self.root = root
@@ -42,39 +58,60 @@ class TranslatorApp:
         self.input_path = ""
         self.output_folder = ""
         self.is_running = False
+        # The worker thread's event loop and the task running the workflow, so the run can be cancelled.
+        self.workflow_loop = None
+        self.workflow_task = None
 
         self.input_label = tk.Label(root, text="No PowerPoint file selected", wraplength=580)
         self.input_button = tk.Button(root, text="Select PowerPoint File", command=self.select_input_file)
-        self.lang_label = tk.Label(root, text="Select Target Language:")
+        self.lang_label = tk.Label(root, text="Select Target Language(s):")
         self.language_options = ["Japanese", "Vietnamese", "Korean", "English", "Simplified Chinese", "French",
                                  "German", "Spanish"]
-        self.language_var = tk.StringVar(value=self.language_options[0])
-        self.lang_dropdown = ttk.Combobox(root, textvariable=self.language_var, values=self.language_options,
-                                          state='readonly')
+        # Several languages can be picked; the deck is then extracted and briefed only once.
+        self.lang_listbox = tk.Listbox(root, selectmode=tk.MULTIPLE, exportselection=False,
+                                       height=len(self.language_options))
+        for language in self.language_options:
+            self.lang_listbox.insert(tk.END, language)
+        self.lang_listbox.selection_set(0)
         self.instructions_label = tk.Label(root,
                                            text="Enter Additional Instructions (e.g., brand names not to translate):")
         self.instructions_text = scrolledtext.ScrolledText(root, height=8, width=70)
         self.output_label = tk.Label(root, text="No output folder selected", wraplength=580)
         self.output_button = tk.Button(root, text="Select Output Location", command=self.select_output_folder)
+        # Picks up the checkpoint journal of a run that was interrupted (closed window, crash, network loss).
+        self.resume_var = tk.BooleanVar(value=False)
+        self.resume_check = tk.Checkbutton(root, text="Resume interrupted run", variable=self.resume_var)
         self.translate_button = tk.Button(root, text="Translate!", command=self.start_translation,
                                           font=("Arial", 12, "bold"))
+        # Stops every request and retry; translations that already came back are saved as a partial deck.
+        self.cancel_button = tk.Button(root, text="Cancel", command=self.cancel_translation, state=tk.DISABLED)
         self.progress_bar = ttk.Progressbar(root, orient='horizontal', length=100, mode='determinate')
+        self.language_progress = {}
+        self.language_progress_label = tk.Label(root, text="", wraplength=580)
+        self.throughput = ThroughputTracker()
+        self.throughput_label = tk.Label(root, text="", wraplength=580)
         self.status_label = tk.Label(root, text="Status Log:")
         self.status_log = scrolledtext.ScrolledText(root, height=15, width=70, state=tk.DISABLED)
 
         self.input_button.pack(pady=(10, 0))
         self.input_label.pack(pady=5)
         self.lang_label.pack(pady=(15, 5))
-        self.lang_dropdown.pack(pady=5)
+        self.lang_listbox.pack(pady=5)
         self.instructions_label.pack(pady=(15, 5))
         self.instructions_text.pack(pady=5)
         self.output_button.pack(pady=10)
         self.output_label.pack(pady=5)
-        self.translate_button.pack(pady=20)
+        self.resume_check.pack(pady=(10, 0))
+        self.translate_button.pack(pady=(10, 5))
+        self.cancel_button.pack(pady=(0, 20))
         self.progress_bar.pack(pady=5, fill=tk.X, padx=10)
+        self.language_progress_label.pack(pady=0)
+        self.throughput_label.pack(pady=0)
         self.status_label.pack(pady=5)
         self.status_log.pack(pady=5, padx=10, fill=tk.BOTH, expand=True)
 
+        threading.Thread(target=prewarm_pipeline, name="prewarm", daemon=True).start()
+
     def select_input_file(self):
         if self.is_running: return
         path = filedialog.askopenfilename(title="Select PowerPoint File", filetypes=(("PowerPoint files", "*.pptx"),))
@@ -103,9 +140,18 @@ class TranslatorApp:
                     self.log_status(payload)
                 elif message_type == 'progress':
                     self.progress_bar['value'] = payload
+                elif message_type == 'language_progress':
+                    language, percent = payload
+                    self.language_progress[language] = percent
+                    self.language_progress_label.config(text="  |  ".join(
+                        f"{lang}: {pct:.0f}%" for lang, pct in self.language_progress.items()))
+                elif message_type == 'metric':
+                    self.throughput.update(payload)
                 elif message_type == 'finished':
                     self.is_running = False
+                    self.workflow_loop = self.workflow_task = None
                     self.translate_button.config(state=tk.NORMAL)
+                    self.cancel_button.config(state=tk.DISABLED)
                     # If the payload (output_path) is valid, open the folder
                     if payload:
                         open_file_in_explorer(payload)
@@ -113,32 +159,73 @@ class TranslatorApp:
         except queue.Empty:
             pass
         finally:
+            self.update_throughput_label()
             if self.is_running:
                 self.root.after(100, self.check_queue)
 
+    def update_throughput_label(self):
+        rate = self.throughput.throughput()
+        if not rate:
+            return
+        eta = self.throughput.eta_seconds()
+        text = f"Throughput: {rate:.1f} elements/s"
+        if eta is not None:
+            minutes, seconds = divmod(int(eta), 60)
+            text += f"  |  ETA: {minutes}:{seconds:02d}"
+        self.throughput_label.config(text=text)
+
+    def cancel_translation(self):
+        if not self.is_running or self.workflow_task is None:
+            return
+        self.cancel_button.config(state=tk.DISABLED)
+        self.log_status("Cancelling...")
+        # Tasks belong to the worker thread's loop; only call_soon_threadsafe may touch them from here.
+        self.workflow_loop.call_soon_threadsafe(self.workflow_task.cancel)
+
     def start_translation(self):
         if not self.input_path or not self.output_folder:
             self.log_status("ERROR: Please select an input file and an output folder.")
             return
+        selected_languages = [self.language_options[i] for i in self.lang_listbox.curselection()]
+        if not selected_languages:
+            self.log_status("ERROR: Please select at least one target language.")
+            return
 
         self.is_running = True
         self.translate_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
         self.log_status("=" * 40)
         self.log_status("Starting ASYNC translation process...")
         self.progress_bar['value'] = 0
+        self.language_progress = {}
+        self.language_progress_label.config(text="")
+        self.throughput = ThroughputTracker()
+        self.throughput_label.config(text="")
 
         user_instructions = self.instructions_text.get("1.0", tk.END).strip()
-        selected_language = self.language_var.get()
+        resume = self.resume_var.get()
         self.status_queue = queue.Queue()
 
-        def thread_starter():
-            asyncio.run(run_translation_workflow(
+        async def run_workflow():
+            try:
+                from workflow import run_translation_workflow
+            except Exception as e:
+                self.status_queue.put(('log', f"ERROR: Could not load the translation pipeline: {e}"))
+                self.status_queue.put(('finished', ""))
+                return
+            self.workflow_loop = asyncio.get_running_loop()
+            self.workflow_task = asyncio.current_task()
+            await run_translation_workflow(
                 self.input_path,
                 self.output_folder,
                 user_instructions,
                 self.status_queue,
-                selected_language
-            ))
+                selected_languages,
+                resume=resume
+            )
+
+        def thread_starter():
+            asyncio.run(run_workflow())
 
         self.thread = threading.Thread(target=thread_starter)
         self.thread.start()
@@ -0,0 +1,122 @@
+import json
+from urllib.parse import urlsplit, parse_qs, quote
+
+# Just enough HTTP/1.1 for the small asyncio servers in this project (local_llm_server.py and
+# service.py): keep-alive, Content-Length bodies and chunked streaming responses.
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+BODY_CHUNK_BYTES = 1024 * 1024
+
+
+class HTTPError(Exception):
+    """Ends a request with an error status; the message is sent as {"error": {"message": ...}}."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+async def read_request_head(reader):
+    """
+    Reads a request line and headers.
+
+    Returns:
+        tuple: (method, path, query, headers) with the path still percent-encoded, header names
+               lower-cased and query values as lists; or None once the client has closed the connection.
+
+    Raises:
+        HTTPError: 400 for a malformed request line or header.
+    """
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if line in ("\r\n", "\n", ""):
+            break
+        name, separator, value = line.partition(":")
+        if not separator:
+            raise HTTPError(400, "malformed header line")
+        headers[name.strip().lower()] = value.strip()
+    url = urlsplit(target)
+    return method, url.path.rstrip("/") or "/", parse_qs(url.query), headers
+
+
+def content_length(headers, max_bytes):
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Content-Length must be a number")
+    if length < 0:
+        raise HTTPError(400, "Content-Length must not be negative")
+    if length > max_bytes:
+        raise HTTPError(413, f"body of {length} bytes exceeds the {max_bytes}-byte limit")
+    return length
+
+
+async def read_body(reader, headers, max_bytes):
+    length = content_length(headers, max_bytes)
+    return await reader.readexactly(length) if length else b""
+
+
+async def iter_body(reader, headers, max_bytes):
+    """Yields the body in chunks of at most BODY_CHUNK_BYTES, so uploads need not fit in memory."""
+    remaining = content_length(headers, max_bytes)
+    while remaining:
+        chunk = await reader.readexactly(min(remaining, BODY_CHUNK_BYTES))
+        remaining -= len(chunk)
+        yield chunk
+
+
+def keep_alive(headers):
+    return headers.get("connection", "").lower() != "close"
+
+
+def write_response(writer, status, body, content_type="application/json", keep_alive=True, headers=None):
+    head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    head.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+
+def content_disposition(filename):
+    """
+    An attachment header for any file name: headers are sent as latin-1, so the name goes in
+    'filename*' as UTF-8, with an ASCII 'filename' fallback for clients that ignore it.
+    """
+    fallback = "".join(c if " " <= c < "\x7f" and c not in '"\\' else "_" for c in filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def write_json(writer, status, reply, keep_alive=True):
+    write_response(writer, status, json.dumps(reply, ensure_ascii=False).encode("utf-8"), keep_alive=keep_alive)
+
+
+def error_reply(message, error_type="invalid_request_error"):
+    return {"error": {"message": message, "type": error_type}}
+
+
+def start_chunked(writer, status=200, content_type="application/x-ndjson"):
+    """Starts a response whose body follows in write_chunk calls, for as long as it takes."""
+    writer.write((f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                  f"Content-Type: {content_type}\r\n"
+                  f"Transfer-Encoding: chunked\r\n"
+                  f"Cache-Control: no-cache\r\n\r\n").encode("latin-1"))
+
+
+def write_chunk(writer, data):
+    if data:
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+
+
+def end_chunked(writer):
+    writer.write(b"0\r\n\r\n")
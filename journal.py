@@ -0,0 +1,87 @@
+import os
+import json
+import hashlib
+
+
+def batch_key(source_texts, target_language, context_hash):
+    """
+    Identifies a batch across runs by what it asks for: its source texts, the
+    target language and the context its translations depend on.
+    """
+    payload = json.dumps([target_language, context_hash, list(source_texts)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+def journal_path_for(output_path):
+    """The journal sits next to the output it is building: 'deck_French.pptx' -> 'deck_French.journal.jsonl'."""
+    return os.path.splitext(output_path)[0] + ".journal.jsonl"
+
+
+class CheckpointJournal:
+    """
+    An append-only JSONL file with one line per completed batch.
+
+    Every line is flushed and fsynced as soon as its batch comes back, so if the
+    GUI is closed, the process dies or the network drops, the paid-for results
+    are still on disk and a resumed run only sends the batches that are missing.
+    A line cut short by a crash is cut off the file when the journal is read back,
+    so the next entry starts on a line of its own.
+    """
+
+    def __init__(self, path, resume=False):
+        """
+        Args:
+            path (str): The journal file.
+            resume (bool): Keep and load the entries of an interrupted run. Otherwise any old journal is discarded.
+        """
+        self.path = path
+        # Maps batch keys to {source text: translation}.
+        self.completed = self._load() if resume else {}
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def _load(self):
+        completed = {}
+        if not os.path.exists(self.path):
+            return completed
+        complete_bytes = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # The last record was torn by a crash; appending after it would glue the next one on.
+                    break
+                complete_bytes += len(line)
+                try:
+                    entry = json.loads(line.decode("utf-8"))
+                    completed[entry['key']] = entry['translations']
+                except (ValueError, KeyError, TypeError):
+                    continue
+        if complete_bytes < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(complete_bytes)
+        return completed
+
+    def record(self, key, translations):
+        """
+        Appends one finished batch.
+
+        Args:
+            key (str): The batch's batch_key.
+            translations (dict): Maps each successfully translated source text to its translation.
+        """
+        if not translations:
+            return
+        self.completed[key] = translations
+        self._file.write(json.dumps({'key': key, 'translations': translations}, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        """Closes the journal but keeps it on disk, so the run can be resumed."""
+        if not self._file.closed:
+            self._file.close()
+
+    def discard(self):
+        """Closes and deletes the journal once its output has been written successfully."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,195 @@
+import os
+import asyncio
+import threading
+from tokenizer import estimate_tokens
+
+# Which backend serves every LLM call: "gemini" (Google's API) or "openai" (any server speaking the
+# OpenAI chat-completions API, e.g. local_llm_server.py for offline runs, or vLLM/Ollama).
+PROVIDER = os.environ.get("PPTX_TRANSLATOR_PROVIDER", "gemini")
+OPENAI_BASE_URL = os.environ.get("PPTX_TRANSLATOR_BASE_URL", "http://127.0.0.1:8765/v1")
+
+# The model each phase uses, per provider. "translation_short" serves batches of short texts
+# (table cells, labels, footers), which a faster, cheaper model handles just as well.
+PHASE_MODELS = {
+    "gemini": {
+        "briefing": "gemini-2.5-pro-preview-06-05",
+        "translation": "gemini-2.5-pro-preview-06-05",
+        "translation_short": "gemini-2.5-flash",
+    },
+    "openai": {
+        "briefing": os.environ.get("PPTX_TRANSLATOR_MODEL", "local"),
+        "translation": os.environ.get("PPTX_TRANSLATOR_MODEL", "local"),
+        "translation_short": os.environ.get("PPTX_TRANSLATOR_MODEL", "local"),
+    },
+}
+# A batch whose texts average at most this many tokens goes to the "translation_short" model.
+SHORT_TEXT_TOKENS = 6
+
+# HTTP connection pool of the OpenAI-compatible client.
+MAX_CONNECTIONS = 32
+REQUEST_TIMEOUT = 300.0
+
+_MESSAGE_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+class ProviderError(Exception):
+    """A non-2xx reply from an OpenAI-compatible server; the status code leads the message (e.g. '429 ...')."""
+
+
+class OpenAICompatibleChatModel:
+    """
+    Minimal chat client for the OpenAI chat-completions API, with the same
+    'invoke'/'ainvoke' interface as ChatGoogleGenerativeAI.
+
+    Connections are pooled and kept alive for as long as the instance lives,
+    up to 'max_connections' of them; get_chat_model shares one instance per model.
+    """
+
+    def __init__(self, model, base_url, api_key=None, max_connections=MAX_CONNECTIONS, timeout=REQUEST_TIMEOUT):
+        import httpx
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self._client_options = dict(
+            base_url=self.base_url, timeout=timeout,
+            headers={"Authorization": f"Bearer {api_key}"} if api_key else {},
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections))
+        self._async_client = None
+        self._sync_client = None
+
+    def _payload(self, messages):
+        return {
+            "model": self.model,
+            "messages": [{"role": _MESSAGE_ROLES.get(message.type, "user"), "content": message.content}
+                         for message in messages],
+        }
+
+    @staticmethod
+    def _parse(response):
+        from langchain_core.messages import AIMessage
+        if response.status_code >= 400:
+            raise ProviderError(f"{response.status_code} {response.text[:200]}")
+        return AIMessage(content=response.json()["choices"][0]["message"]["content"])
+
+    async def ainvoke(self, messages, **kwargs):
+        # Provider-specific options (e.g. Gemini's cached_content) do not apply here.
+        import httpx
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(**self._client_options)
+        return self._parse(await self._async_client.post("/chat/completions", json=self._payload(messages)))
+
+    def invoke(self, messages, **kwargs):
+        import httpx
+        if self._sync_client is None:
+            self._sync_client = httpx.Client(**self._client_options)
+        return self._parse(self._sync_client.post("/chat/completions", json=self._payload(messages)))
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+
+def _create_gemini(model):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model)
+
+
+def _create_openai(model):
+    return OpenAICompatibleChatModel(model, OPENAI_BASE_URL, api_key=os.environ.get("OPENAI_API_KEY"))
+
+
+# Provider name -> factory building a chat model for a model name. benchmark.py adds a "fake" one.
+BACKENDS = {"gemini": _create_gemini, "openai": _create_openai}
+# Provider name -> the context cache its models can read prompt prefixes from (see translator.PROMPT_CACHE).
+# OpenAI-compatible servers have none, so the prefix is sent with every request.
+CONTEXT_CACHES = {"gemini": "gemini"}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def prewarm():
+    """
+    Imports everything the current provider's calls need, so the first
+    request does not pay for it. The GUI runs this in a background thread
+    while the user is still picking files.
+    """
+    import langchain_core.messages  # noqa: F401
+    if PROVIDER == "gemini":
+        import langchain_google_genai  # noqa: F401
+    elif PROVIDER == "openai":
+        import httpx  # noqa: F401
+
+
+def model_for(phase):
+    return PHASE_MODELS.get(PROVIDER, PHASE_MODELS["gemini"])[phase]
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_chat_model(phase):
+    """
+    The long-lived client for a phase ("briefing", "translation" or "translation_short").
+
+    Clients are built once per provider and model and shared by every phase,
+    deck and language of a run, so connections are reused instead of being set
+    up again for each call site. Async connections cannot move between event
+    loops (the GUI starts a new loop for every run), so the pool is also keyed
+    by the running loop; aclose_clients() releases a loop's clients at the end of its run.
+    """
+    key = (_running_loop(), PROVIDER, model_for(phase))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = BACKENDS[PROVIDER](key[2])
+            _clients[key] = client
+    return client
+
+
+async def aclose_clients():
+    """Closes the connection pools of every client built on the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        keys = [key for key in _clients if key[0] is loop]
+        clients = [_clients.pop(key) for key in keys]
+    for client in clients:
+        aclose = getattr(client, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def translation_phase(texts):
+    """Picks "translation_short" for a batch of short texts, otherwise "translation"."""
+    if texts and sum(estimate_tokens(text) for text in texts) / len(texts) <= SHORT_TEXT_TOKENS:
+        return "translation_short"
+    return "translation"
+
+
+def context_cache_kind():
+    """The prompt_cache backend the current provider understands ("gemini", "local"), or None."""
+    return CONTEXT_CACHES.get(PROVIDER)
+
+
+def missing_credentials():
+    """A message naming what is missing for the current provider, or None when calls can be made."""
+    if PROVIDER == "gemini" and 'GOOGLE_API_KEY' not in os.environ:
+        return "GOOGLE_API_KEY environment variable not found."
+    return None
+
+
+def use_provider(name, base_url=None):
+    """Switches every phase to another backend; clients already built for the previous one are left to their runs."""
+    global PROVIDER, OPENAI_BASE_URL
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM provider '{name}'. Choose from: {', '.join(BACKENDS)}")
+    PROVIDER = name
+    if base_url:
+        OPENAI_BASE_URL = base_url
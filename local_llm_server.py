@@ -0,0 +1,176 @@
+import json
+import signal
+import asyncio
+import argparse
+import threading
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from fake_llm import FakeChatModel, FakeRateLimitError
+from http_protocol import HTTPError, read_request_head, read_body, keep_alive, write_json, error_reply
+
+# An OpenAI-compatible HTTP server answering with fake_llm.FakeChatModel, so the
+# whole application (pooled HTTP client included) can run and be load-tested
+# offline:
+#
+#     python local_llm_server.py --latency 0.5 --rate-limit-rate 0.05
+#     python app.py deck.pptx -l Japanese -o out --provider openai
+#
+# Only what the translator uses is implemented: POST /v1/chat/completions and
+# GET /v1/models, over HTTP/1.1 with keep-alive.
+
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+_MESSAGE_TYPES = {"system": SystemMessage, "user": HumanMessage, "assistant": AIMessage}
+
+
+class LocalLLMServer:
+    """
+    Serves a FakeChatModel over the OpenAI chat-completions API.
+
+    'connections' counts the TCP connections accepted and 'requests' the
+    requests served, so a run can check that its client reuses connections
+    (many requests per connection) instead of opening one per call.
+    """
+
+    def __init__(self, model, host="127.0.0.1", port=DEFAULT_PORT):
+        self.model = model
+        self.host = host
+        self.port = port
+        self.connections = 0
+        self.requests = 0
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        # With port 0 the OS picks a free port.
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _serve_connection(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    head = await read_request_head(reader)
+                    if head is None:
+                        break
+                    method, path, _, headers = head
+                    status, reply = await self._handle(method, path, await read_body(reader, headers, MAX_BODY_BYTES))
+                except HTTPError as e:
+                    write_json(writer, e.status, error_reply(str(e)), keep_alive=False)
+                    break
+                write_json(writer, status, reply, keep_alive(headers))
+                await writer.drain()
+                if not keep_alive(headers):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle(self, method, path, body):
+        if method == "GET" and path == "/v1/models":
+            return 200, {"object": "list", "data": [{"id": "local", "object": "model", "owned_by": "local"}]}
+        if method != "POST" or path != "/v1/chat/completions":
+            return 404, error_reply(f"{method} {path} is not supported")
+
+        self.requests += 1
+        try:
+            request = json.loads(body)
+            messages = [_MESSAGE_TYPES.get(message["role"], HumanMessage)(content=message["content"])
+                        for message in request["messages"]]
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, error_reply(f"invalid request: {e}")
+
+        try:
+            response = await self.model.ainvoke(messages)
+        except FakeRateLimitError as e:
+            return 429, error_reply(str(e), "rate_limit_error")
+        except Exception as e:
+            return 500, error_reply(str(e), "server_error")
+        return 200, {
+            "object": "chat.completion",
+            "model": request.get("model", "local"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": response.content}}],
+        }
+
+
+def start_in_thread(model, host="127.0.0.1", port=0):
+    """
+    Runs a LocalLLMServer on its own event loop in a daemon thread.
+
+    Returns:
+        tuple: (server, stop) where stop() shuts the server down and joins the thread.
+    """
+    server = LocalLLMServer(model, host, port)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        started.set()
+        loop.run_forever()
+        loop.run_until_complete(server.stop())
+        loop.close()
+
+    thread = threading.Thread(target=run, name="local-llm-server", daemon=True)
+    thread.start()
+    started.wait()
+
+    def stop():
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+    return server, stop
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Offline OpenAI-compatible LLM server backed by the fake model, for running "
+                    "and load-testing the translator without an API key (use it with --provider openai).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0.5, help="Median seconds per call.")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Log-normal spread of the latency (0 = fixed).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls failing with a 500.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of calls failing with a 429.")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of replies with broken JSON.")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    model = FakeChatModel(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          rate_limit_rate=args.rate_limit_rate, malformed_rate=args.malformed_rate, seed=args.seed)
+    server = LocalLLMServer(model, args.host, args.port)
+    print(f"Serving the fake model on {server.base_url} (Ctrl+C to stop)", flush=True)
+
+    def interrupt(signum, frame):
+        raise KeyboardInterrupt
+
+    # Stopped with 'kill' (e.g. as a background job of a load test) it reports as for Ctrl+C.
+    signal.signal(signal.SIGTERM, interrupt)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print(f"\nServed {server.requests} requests over {server.connections} connections "
+              f"(peak concurrency {model.peak_concurrency}).")
+
+
+if __name__ == '__main__':
+    main()
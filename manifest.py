@@ -0,0 +1,130 @@
+import os
+import json
+import hashlib
+from text_element import TABLE_CELL, PARAGRAPH
+
+# Bump when the layout of the manifest file changes; older manifests are then ignored.
+MANIFEST_VERSION = 1
+
+
+def element_id(item):
+    """
+    A stable ID for a text element: slide id, shape id and location within the shape.
+
+    Slide and shape ids are stored in the .pptx itself and do not change when
+    slides are inserted, deleted or reordered, unlike slide_index and shape_index.
+    """
+    if item.type == TABLE_CELL:
+        position = f"r{item.location_major}c{item.location_minor}"
+    elif item.type == PARAGRAPH:
+        position = f"p{item.location_major}"
+    else:
+        position = f"p{item.location_major}r{item.location_minor}"
+    return f"{item.slide_id}:{item.shape_id}:{position}"
+
+
+def hash_source_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def manifest_path_for(output_path):
+    """The manifest lives next to the translated deck: 'deck_French.pptx' -> 'deck_French.manifest.json'."""
+    return os.path.splitext(output_path)[0] + ".manifest.json"
+
+
+def load_manifest(path):
+    """Returns the manifest stored at 'path', or None if there is none (or it cannot be used)."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"  - Warning: Ignoring unreadable manifest {path}: {e}")
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def _no_glossary(text):
+    return ""
+
+
+def build_manifest(source_path, target_language, accepted, glossary_fingerprint=None):
+    """
+    Args:
+        source_path (str): The deck that was translated.
+        target_language (str): The language of the translations.
+        accepted (list): (item, translated_text) pairs for every element translated successfully.
+        glossary_fingerprint (callable, optional): Maps a source text to the fingerprint of the glossary
+            entries its translation was made with ("" for none); an element whose entries have changed
+            by the next run is not reused.
+
+    Returns:
+        dict: The manifest, ready to be saved with save_manifest.
+    """
+    glossary_fingerprint = glossary_fingerprint or _no_glossary
+    elements = {}
+    for item, translated_text in accepted:
+        entry = {'source_hash': hash_source_text(item.original_text), 'translation': translated_text}
+        glossary = glossary_fingerprint(item.original_text)
+        if glossary:
+            entry['glossary'] = glossary
+        elements[element_id(item)] = entry
+    return {
+        'version': MANIFEST_VERSION,
+        'source': os.path.basename(source_path),
+        'target_language': target_language,
+        'elements': elements,
+    }
+
+
+def save_manifest(manifest, path):
+    # Written to a temporary file first, so a crash never leaves a half-written manifest behind.
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, path)
+
+
+def reuse_from_manifest(text_map, manifest, glossary_fingerprint=None):
+    """
+    Splits a revised deck's elements into those whose translation can be reused and those that need translating.
+
+    An element is reused when its ID is in the manifest with the same source hash.
+    Failing that (the element moved, e.g. into a duplicated slide, or a paragraph
+    was inserted above it), any manifest entry with the same source hash is used.
+    Either way the entry's glossary fingerprint must match too, so only elements
+    containing a term whose glossary entry changed are translated again.
+
+    Args:
+        text_map (list): The elements of the new version of the deck.
+        manifest (dict): The manifest written for the previous version, or None.
+        glossary_fingerprint (callable, optional): As for build_manifest, from the current glossary.
+
+    Returns:
+        tuple: (reused, pending) where 'reused' maps the element ID of each reusable
+               element to its translation and 'pending' lists the new or changed elements.
+    """
+    if not manifest:
+        return {}, list(text_map)
+
+    glossary_fingerprint = glossary_fingerprint or _no_glossary
+    entries = manifest['elements']
+    by_key = {}
+    for entry in entries.values():
+        by_key.setdefault((entry['source_hash'], entry.get('glossary', "")), entry['translation'])
+
+    reused, pending = {}, []
+    for item in text_map:
+        item_id = element_id(item)
+        key = (hash_source_text(item.original_text), glossary_fingerprint(item.original_text))
+        entry = entries.get(item_id)
+        if entry is not None and (entry['source_hash'], entry.get('glossary', "")) == key:
+            reused[item_id] = entry['translation']
+        elif key in by_key:
+            reused[item_id] = by_key[key]
+        else:
+            pending.append(item)
+    return reused, pending
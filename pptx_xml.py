@@ -0,0 +1,156 @@
+import re
+import posixpath
+from lxml import etree
+
+# Low-level helpers for reading a .pptx package directly from its zip, without
+# loading the python-pptx object model (and every image and media part with it).
+
+NS = {
+    'a': "http://schemas.openxmlformats.org/drawingml/2006/main",
+    'p': "http://schemas.openxmlformats.org/presentationml/2006/main",
+    'r': "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    'rel': "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+
+
+def qn(tag):
+    """Turns 'a:t' into lxml's '{namespace}t' form."""
+    prefix, local = tag.split(":")
+    return f"{{{NS[prefix]}}}{local}"
+
+
+# Pre-resolved tags: lxml looks these up much faster than 'prefix:name' paths with a namespace map.
+A_P, A_R, A_T, A_BR, A_FLD, A_RPR = (qn(tag) for tag in ("a:p", "a:r", "a:t", "a:br", "a:fld", "a:rPr"))
+A_TBL, A_TR, A_TC, A_TXBODY = (qn(tag) for tag in ("a:tbl", "a:tr", "a:tc", "a:txBody"))
+A_BODYPR, A_ENDPARARPR = (qn(tag) for tag in ("a:bodyPr", "a:endParaRPr"))
+P_SP, P_SPTREE, P_TXBODY, P_GRAPHICFRAME = (qn(tag) for tag in ("p:sp", "p:spTree", "p:txBody", "p:graphicFrame"))
+P_CNVPR = qn("p:cNvPr")
+
+# The element types python-pptx's slide.shapes enumerates, in document order.
+# Keeping exactly this set is what makes 'shape_index' match between the two engines.
+SHAPE_TAGS = frozenset(qn(tag) for tag in ("p:sp", "p:grpSp", "p:graphicFrame", "p:cxnSp", "p:pic", "p:contentPart"))
+# Placeholder types python-pptx reports with 'TITLE' in their name.
+TITLE_PLACEHOLDER_TYPES = frozenset(("title", "ctrTitle", "subTitle", "vertTitle"))
+OFFICE_DOCUMENT_REL = "/officeDocument"
+
+
+def _rels_part_name(part_name):
+    directory, file_name = posixpath.split(part_name)
+    return posixpath.join(directory, "_rels", f"{file_name}.rels")
+
+
+def _read_relationships(zf, part_name):
+    """Maps rId to the absolute part name of its target for one part."""
+    rels_name = _rels_part_name(part_name)
+    if rels_name not in zf.NameToInfo:
+        return {}
+    base_dir = posixpath.dirname(part_name)
+    rels = {}
+    for rel in etree.fromstring(zf.read(rels_name)).iter(f"{{{NS['rel']}}}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target")
+        if target.startswith("/"):
+            rels[rel.get("Id")] = (target.lstrip("/"), rel.get("Type"))
+        else:
+            rels[rel.get("Id")] = (posixpath.normpath(posixpath.join(base_dir, target)), rel.get("Type"))
+    return rels
+
+
+def presentation_part_name(zf):
+    """Finds the main presentation part (usually 'ppt/presentation.xml') from the package relationships."""
+    for target, rel_type in _read_relationships(zf, "").values():
+        if rel_type.endswith(OFFICE_DOCUMENT_REL):
+            return target
+    return "ppt/presentation.xml"
+
+
+def slide_parts(zf):
+    """
+    Lists the slides in presentation order, i.e. the order of 'prs.slides'.
+
+    Args:
+        zf (zipfile.ZipFile): The open .pptx package.
+
+    Returns:
+        list: (slide_id, part_name) pairs such as (258, 'ppt/slides/slide3.xml'); index i is slide_index i.
+              The slide id is python-pptx's slide.slide_id, which survives reordering.
+    """
+    pres_name = presentation_part_name(zf)
+    rels = _read_relationships(zf, pres_name)
+    presentation = etree.fromstring(zf.read(pres_name))
+    parts = []
+    for sld_id in presentation.iter(qn("p:sldId")):
+        target, _ = rels[sld_id.get(qn("r:id"))]
+        parts.append((int(sld_id.get("id")), target))
+    return parts
+
+
+def slide_part_names(zf):
+    """The slide XML part names in presentation order; index i is slide_index i."""
+    return [part_name for _, part_name in slide_parts(zf)]
+
+
+def shape_id(shape):
+    """python-pptx's shape.shape_id: the id of the shape's <p:cNvPr>, unique within its slide."""
+    for non_visual in shape:
+        c_nv_pr = non_visual.find(P_CNVPR)
+        if c_nv_pr is not None:
+            return int(c_nv_pr.get("id"))
+        break
+    return None
+
+
+def top_level_shapes(slide_root):
+    """The shapes of a parsed slide in the order and numbering of python-pptx's slide.shapes."""
+    sp_tree = slide_root.find("p:cSld/p:spTree", NS)
+    if sp_tree is None:
+        return []
+    return [child for child in sp_tree if child.tag in SHAPE_TAGS]
+
+
+def run_text(r):
+    """The text of an <a:r> (or <a:fld>), '' when it has no <a:t>."""
+    t = r.find(A_T)
+    return (t.text or "") if t is not None else ""
+
+
+def paragraph_text(p):
+    """The text of an <a:p> exactly as python-pptx's paragraph.text reports it (line breaks become '\\v')."""
+    parts = []
+    for child in p:
+        if child.tag == A_R or child.tag == A_FLD:
+            parts.append(run_text(child))
+        elif child.tag == A_BR:
+            parts.append("\v")
+    return "".join(parts)
+
+
+def text_body_text(tx_body):
+    """The text of an <a:txBody> as python-pptx's text_frame.text reports it (paragraphs joined by '\\n')."""
+    if tx_body is None:
+        return ""
+    return "\n".join(paragraph_text(p) for p in tx_body.iterchildren(A_P))
+
+
+def escape_ctrl_chars(text):
+    """python-pptx escapes XML-illegal control characters (all but tab and newline) as '_xHHHH_'."""
+    return re.sub(r"([\x00-\x08\x0B-\x1F])", lambda match: "_x%04X_" % ord(match.group(1)), text)
+
+
+def run_is_bold(r):
+    r_pr = r.find(A_RPR)
+    return r_pr is not None and r_pr.get("b") in ("1", "true")
+
+
+def placeholder_is_title(sp):
+    ph = sp.find("p:nvSpPr/p:nvPr/p:ph", NS)
+    # A placeholder without an explicit type is an 'obj' placeholder.
+    return ph is not None and ph.get("type", "obj") in TITLE_PLACEHOLDER_TYPES
+
+
+def shape_table(shape):
+    """Returns the <a:tbl> of a graphic frame that holds a table, else None."""
+    if shape.tag != P_GRAPHICFRAME:
+        return None
+    return shape.find("a:graphic/a:graphicData/a:tbl", NS)
@@ -0,0 +1,115 @@
+import hashlib
+from tokenizer import estimate_tokens
+
+# Gemini refuses to cache contexts smaller than this (the exact minimum depends on the model).
+MIN_CACHED_PREFIX_TOKENS = 1024
+# How long the provider keeps a cached prefix; it is deleted explicitly once a language is done.
+CACHE_TTL_SECONDS = 3600
+
+# The stand-in's storage: cache name -> prefix text. FakeChatModel resolves names here.
+_LOCAL_CACHES = {}
+
+
+class GeminiContextCache:
+    """Stores prompt prefixes with Gemini's context caching (google-genai's client.caches)."""
+
+    def __init__(self):
+        self._client = None
+
+    def _caches(self):
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client()
+        return self._client.aio.caches
+
+    async def create(self, model, text):
+        """Caches 'text' as the system instruction for 'model'. Returns the cache's name."""
+        from google.genai import types
+        tokens = estimate_tokens(text)
+        if tokens < MIN_CACHED_PREFIX_TOKENS:
+            raise ValueError(f"the prefix (~{tokens} tokens) is below the {MIN_CACHED_PREFIX_TOKENS}-token "
+                             f"minimum for context caching")
+        cache = await self._caches().create(model=model, config=types.CreateCachedContentConfig(
+            display_name="pptx-translator prompt prefix", system_instruction=text, ttl=f"{CACHE_TTL_SECONDS}s"))
+        return cache.name
+
+    async def delete(self, name):
+        await self._caches().delete(name=name)
+
+
+class LocalContextCache:
+    """
+    In-process stand-in for GeminiContextCache, for offline runs and tests.
+
+    Names it hands out are only understood by fake_llm.FakeChatModel, which
+    puts the cached text back in front of the messages (as the provider would)
+    and counts it as cached rather than sent.
+    """
+
+    async def create(self, model, text):
+        name = "local-caches/" + hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()[:16]
+        _LOCAL_CACHES[name] = text
+        return name
+
+    async def delete(self, name):
+        _LOCAL_CACHES.pop(name, None)
+
+
+def resolve_local_cache(name):
+    """The text stored under a LocalContextCache name. Raises KeyError for unknown (or deleted) names."""
+    return _LOCAL_CACHES[name]
+
+
+class PromptPrefix:
+    """
+    The part of every translation prompt that stays the same for a whole
+    language: the directives and the context briefing.
+
+    With a context cache the prefix is stored once on the provider's side and
+    each request refers to it by name; otherwise (no cache configured, or the
+    cache refused it) it goes in front of every request as a system message.
+    Either way it is kept byte-identical, so providers that cache repeated
+    prefixes on their own can reuse it too.
+    """
+
+    def __init__(self, text, cache=None, model=None):
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        self.cache = cache
+        self.model = model
+        self.name = None
+
+    async def open(self, status_queue):
+        if self.cache is None:
+            return
+        try:
+            self.name = await self.cache.create(self.model, self.text)
+            status_queue.put(('log', f"Prompt prefix (~{self.tokens} tokens) cached as {self.name}."))
+        except Exception as e:
+            status_queue.put(('log', f"Prompt prefix not cached, sending it with every request: {e}"))
+
+    @property
+    def messages(self):
+        """Messages to put in front of each request's payload."""
+        from langchain_core.messages import SystemMessage
+        return [] if self.name else [SystemMessage(content=self.text)]
+
+    @property
+    def invoke_kwargs(self):
+        """Keyword arguments for the model's ainvoke."""
+        return {'cached_content': self.name} if self.name else {}
+
+    @property
+    def cached_tokens(self):
+        """Prefix tokens each request reads from the cache instead of sending."""
+        return self.tokens if self.name else 0
+
+    async def close(self):
+        if not self.name:
+            return
+        name, self.name = self.name, None
+        try:
+            await self.cache.delete(name)
+        except Exception:
+            # It expires on its own after CACHE_TTL_SECONDS.
+            pass
@@ -0,0 +1,76 @@
+import re
+import json
+
+_FENCED_BLOCK_PATTERN = re.compile(r'```(?:json)?\s*(.*?)```', re.DOTALL)
+# A complete "key": "value" pair. Values cannot contain unescaped quotes, so a pair
+# cut off by a truncated response simply does not match.
+_STRING_PAIR_PATTERN = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:\s*"((?:[^"\\]|\\.)*)"', re.DOTALL)
+
+
+def _strip_fences(text):
+    text = text.strip()
+    fenced = _FENCED_BLOCK_PATTERN.search(text)
+    if fenced:
+        return fenced.group(1).strip()
+    # A truncated reply may have an opening fence and no closing one.
+    if text.startswith("```"):
+        text = text[3:]
+        if text.startswith("json"):
+            text = text[4:]
+    return text.strip()
+
+
+def _load_json_object(text):
+    """Tries a strict parse of the outermost {...}; returns None if it is not valid JSON."""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        parsed = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def _salvage_pairs(text):
+    """Recovers every complete string pair from a malformed or truncated JSON object."""
+    salvaged = {}
+    for raw_key, raw_value in _STRING_PAIR_PATTERN.findall(text):
+        try:
+            salvaged[json.loads(f'"{raw_key}"')] = json.loads(f'"{raw_value}"')
+        except json.JSONDecodeError:
+            continue
+    return salvaged
+
+
+def parse_batch_response(response_text, expected_keys):
+    """
+    Tolerantly parses a model reply to a batch translation prompt.
+
+    Fenced or chatty replies are unwrapped, and if the JSON is broken or
+    truncated every complete key/value pair is still recovered. Only keys that
+    were asked for and carry a non-empty value are accepted.
+
+    Args:
+        response_text (str): The raw model output.
+        expected_keys (iterable): The keys that were sent in the prompt.
+
+    Returns:
+        tuple: (translations, missing_keys) where 'translations' maps each valid key to
+               its text and 'missing_keys' lists the keys that are absent or invalid.
+    """
+    text = _strip_fences(response_text or "")
+    parsed = _load_json_object(text)
+    if parsed is None:
+        parsed = _salvage_pairs(text)
+
+    translations = {}
+    for key in expected_keys:
+        value = parsed.get(key)
+        # Numbers ("2024") are legitimate translations; empty strings and nested objects are not.
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        if isinstance(value, str) and value.strip():
+            translations[key] = value
+    missing_keys = [key for key in expected_keys if key not in translations]
+    return translations, missing_keys
@@ -0,0 +1,414 @@
+import time
+import random
+import asyncio
+from collections import deque, OrderedDict
+from telemetry import count, gauge, observe
+
+# Substrings that identify a quota/overload failure rather than a bad response.
+THROTTLE_MARKERS = ("429", "resource exhausted", "resourceexhausted", "rate limit", "ratelimit",
+                    "quota", "timeout", "timed out", "deadline", "503", "unavailable")
+# How often a running request re-checks whether it has become a straggler worth hedging.
+HEDGE_RECHECK_SECONDS = 1.0
+
+
+def is_throttle_error(error):
+    """Returns True when an exception means 'slow down' (HTTP 429, quota, timeouts) rather than a bad reply."""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    description = f"{type(error).__name__} {error}".lower()
+    return any(marker in description for marker in THROTTLE_MARKERS)
+
+
+class TokenBucket:
+    """
+    A classic token bucket refilled continuously at 'rate_per_minute'.
+
+    Used twice by the scheduler: once counting requests (RPM) and once counting
+    LLM tokens (TPM). A rate of None disables the limit.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate_per_second = rate_per_minute / 60 if rate_per_minute else None
+        # By default allow a burst of ten seconds' worth of budget.
+        self.capacity = capacity or (rate_per_minute / 6 if rate_per_minute else 0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        # Created on the loop that uses it: one scheduler may serve several asyncio.run calls in turn.
+        self._lock = None
+        self._lock_loop = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    async def acquire(self, amount=1):
+        if self.rate_per_second is None:
+            return
+        # A single request larger than the whole bucket would otherwise wait forever.
+        amount = min(amount, self.capacity)
+        # The lock keeps waiters first-come, first-served.
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock, self._lock_loop = asyncio.Lock(), loop
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate_per_second)
+
+
+class LatencyTracker:
+    """Keeps the latencies of the most recent successful requests and answers percentile queries."""
+
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction):
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class RequestScheduler:
+    """
+    Bounded-concurrency scheduler for LLM calls.
+
+    - At most 'max_in_flight' requests run at once.
+    - Requests-per-minute and tokens-per-minute are enforced with token buckets.
+    - The concurrency limit is AIMD: it halves on a 429/timeout and creeps back
+      up by roughly one slot per window of successful requests.
+    - Failed attempts are retried with full-jitter exponential backoff, so
+      batches that fail together do not retry together.
+    - Each attempt may be given a deadline ('request_timeout'), after which it
+      counts as a timeout and is retried.
+    - Stragglers can be hedged: once an attempt has run longer than the
+      'hedge_percentile' latency of recent requests, an identical duplicate is
+      sent and whichever answers first wins; the other is cancelled. Hedges are
+      capped at 'hedge_budget' times the number of first requests, and none
+      are sent while the limit is reduced after throttling, when extra
+      requests would only make things worse.
+    - Free slots are handed out round-robin across owners (see share()), so
+      a deck that queued hundreds of batches cannot starve one that arrived
+      later; requests of the same owner go first-come, first-served.
+    """
+
+    def __init__(self, max_in_flight=8, requests_per_minute=None, tokens_per_minute=None,
+                 max_retries=5, initial_wait=2, max_wait=60, min_concurrency=1, status_queue=None,
+                 request_timeout=None, hedge_percentile=None, hedge_budget=0.0, hedge_min_samples=20):
+        self.max_in_flight = max_in_flight
+        self.min_concurrency = min_concurrency
+        self.concurrency_limit = float(max_in_flight)
+        self.max_retries = max_retries
+        self.initial_wait = initial_wait
+        self.max_wait = max_wait
+        self.status_queue = status_queue
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.request_timeout = request_timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies = LatencyTracker()
+
+        self.in_flight = 0
+        self.stats = {'requests': 0, 'successes': 0, 'retries': 0, 'throttled': 0, 'failures': 0,
+                      'timeouts': 0, 'hedges': 0, 'hedge_wins': 0}
+        self._last_decrease = 0.0
+        # Owner -> futures of its requests waiting for a slot, in the order the owners take turns.
+        self._waiters = OrderedDict()
+
+    def _log(self, message):
+        if self.status_queue is not None:
+            self.status_queue.put(('log', message))
+
+    def share(self, owner):
+        """A view of this scheduler whose requests take turns with other owners' (e.g. one per job)."""
+        return SchedulerShare(self, owner)
+
+    def _grant_slots(self):
+        # Round-robin: the owner served goes to the back of the line, whatever it has left waiting.
+        while self._waiters and self.in_flight < int(self.concurrency_limit):
+            owner, waiting = next(iter(self._waiters.items()))
+            future = waiting.popleft()
+            if waiting:
+                self._waiters.move_to_end(owner)
+            else:
+                del self._waiters[owner]
+            if future.done():
+                # Its request was cancelled and has not yet taken itself out of the line.
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    async def _acquire_slot(self, owner=None):
+        if not self._waiters and self.in_flight < int(self.concurrency_limit):
+            self.in_flight += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(owner, deque()).append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Granted a slot just as it was cancelled: hand it on.
+                    await self._release_slot()
+                else:
+                    waiting = self._waiters.get(owner)
+                    if waiting is not None and future in waiting:
+                        waiting.remove(future)
+                        if not waiting:
+                            del self._waiters[owner]
+                raise
+        gauge(self.status_queue, 'in_flight_requests', self.in_flight)
+
+    async def _release_slot(self):
+        self.in_flight -= 1
+        self._grant_slots()
+        gauge(self.status_queue, 'in_flight_requests', self.in_flight)
+
+    def _on_success(self):
+        # Additive increase: about +1 slot after a full window of successes.
+        self.concurrency_limit = min(self.max_in_flight, self.concurrency_limit + 1 / self.concurrency_limit)
+        gauge(self.status_queue, 'concurrency_limit', int(self.concurrency_limit))
+        self._grant_slots()
+
+    def _on_throttle(self):
+        # Multiplicative decrease, but only once per burst of simultaneous 429s.
+        now = time.monotonic()
+        if now - self._last_decrease > self.initial_wait:
+            self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit / 2)
+            self._last_decrease = now
+            gauge(self.status_queue, 'concurrency_limit', int(self.concurrency_limit))
+
+    async def _wait_for_capacity(self, estimated_tokens, owner=None):
+        """
+        Waits for a concurrency slot and then the RPM and TPM buckets, reporting where
+        the time went: a run that is quota-bound shows up in 'rate_limit_wait_seconds_total',
+        one that is concurrency-bound in 'concurrency_wait_seconds_total'.
+
+        The slot comes first so the owners' round-robin order carries through
+        the (first-come, first-served) buckets. The caller owns the slot once
+        this returns, and also if it is cancelled while waiting for the buckets.
+        """
+        started = time.monotonic()
+        await self._acquire_slot(owner)
+        after_slot = time.monotonic()
+        try:
+            await self.request_bucket.acquire(1)
+            after_requests = time.monotonic()
+            await self.token_bucket.acquire(estimated_tokens)
+        except asyncio.CancelledError:
+            await self._release_slot()
+            raise
+        after_tokens = time.monotonic()
+        count(self.status_queue, 'concurrency_wait_seconds_total', after_slot - started)
+        # Waits under a millisecond are just the bucket's bookkeeping, not throttling.
+        if after_requests - after_slot > 0.001:
+            count(self.status_queue, 'rate_limit_wait_seconds_total', after_requests - after_slot, bucket="requests")
+        if after_tokens - after_requests > 0.001:
+            count(self.status_queue, 'rate_limit_wait_seconds_total', after_tokens - after_requests, bucket="tokens")
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff: a random wait in [0, initial_wait * 2**attempt], capped."""
+        return random.uniform(0, min(self.max_wait, self.initial_wait * (2 ** attempt)))
+
+    def hedge_delay(self):
+        """Seconds after which a running attempt gets a duplicate, or None when hedging is off or unaffordable."""
+        if not self.hedge_percentile or len(self.latencies.samples) < self.hedge_min_samples:
+            return None
+        if self.concurrency_limit < self.max_in_flight:
+            return None
+        first_requests = self.stats['requests'] - self.stats['hedges']
+        if self.stats['hedges'] + 1 > self.hedge_budget * first_requests:
+            return None
+        return self.latencies.percentile(self.hedge_percentile)
+
+    async def _attempt(self, request_fn, estimated_tokens, started_event=None, hedge=False, owner=None):
+        """One request: waits for capacity, runs under the deadline and always gives its slot back."""
+        await self._wait_for_capacity(estimated_tokens, owner)
+        self.stats['requests'] += 1
+        if hedge:
+            # Counted only once it really goes out; a hedge cancelled while queued cost nothing.
+            self.stats['hedges'] += 1
+            count(self.status_queue, 'hedged_requests_total')
+        if started_event is not None:
+            started_event.set()
+        started = time.monotonic()
+        try:
+            if self.request_timeout:
+                result = await asyncio.wait_for(request_fn(), self.request_timeout)
+            else:
+                result = await request_fn()
+        except asyncio.CancelledError:
+            # The losing half of a hedged pair (or the whole run was stopped).
+            observe(self.status_queue, 'request_seconds', time.monotonic() - started, outcome="cancelled")
+            raise
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats['timeouts'] += 1
+            throttled = is_throttle_error(e)
+            if throttled:
+                self.stats['throttled'] += 1
+                self._on_throttle()
+            observe(self.status_queue, 'request_seconds', time.monotonic() - started,
+                    outcome="throttled" if throttled else "error")
+            raise
+        else:
+            elapsed = time.monotonic() - started
+            self.latencies.record(elapsed)
+            self.stats['successes'] += 1
+            self._on_success()
+            observe(self.status_queue, 'request_seconds', elapsed, outcome="success")
+            return result
+        finally:
+            await self._release_slot()
+
+    async def _hedged_attempt(self, request_fn, estimated_tokens, label, owner=None):
+        """
+        Runs one attempt and, if it straggles past hedge_delay(), races a duplicate against it.
+
+        Returns the first successful result; raises the last error if both fail.
+        """
+        started = asyncio.Event()
+        first = asyncio.ensure_future(self._attempt(request_fn, estimated_tokens, started, owner=owner))
+        pending = {first}
+        try:
+            if self.hedge_percentile:
+                # Time spent waiting for capacity is not latency; the hedge clock starts with the request.
+                starting = asyncio.ensure_future(started.wait())
+                await asyncio.wait({first, starting}, return_when=asyncio.FIRST_COMPLETED)
+                starting.cancel()
+                started_at = time.monotonic()
+                while not first.done():
+                    # Re-evaluated while waiting: the percentile and the budget move as other requests finish.
+                    delay = self.hedge_delay()
+                    remaining = HEDGE_RECHECK_SECONDS if delay is None else delay - (time.monotonic() - started_at)
+                    if remaining > 0:
+                        await asyncio.wait({first}, timeout=min(remaining, HEDGE_RECHECK_SECONDS))
+                        continue
+                    self._log(f"  - {label} is slower than {delay:.1f}s, sending a hedged duplicate...")
+                    pending.add(asyncio.ensure_future(self._attempt(request_fn, estimated_tokens, hedge=True,
+                                                                    owner=owner)))
+                    break
+
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.stats['hedge_wins'] += 1
+                            count(self.status_queue, 'hedge_wins_total')
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def run(self, request_fn, estimated_tokens=0, label="Request", owner=None):
+        """
+        Runs 'request_fn' (a zero-argument coroutine function) under the scheduler's limits.
+
+        Args:
+            request_fn (callable): Performs one attempt; raising an exception triggers a retry.
+                With hedging it may be called twice at once, so it must not share state between calls.
+            estimated_tokens (int): Prompt plus expected completion tokens, charged to the TPM bucket.
+            label (str): Used in log messages, e.g. "Batch 3".
+            owner (hashable, optional): Whose turn the request waits for; see share().
+
+        Returns:
+            The result of the first successful attempt, or None once every retry has failed.
+        """
+        for attempt in range(self.max_retries):
+            try:
+                return await self._hedged_attempt(request_fn, estimated_tokens, label, owner)
+            except Exception as e:
+                throttled = is_throttle_error(e)
+                # The reason for a retry: 'throttled', or the kind of failure (e.g. 'ValueError' for a bad reply).
+                retry_reason = "throttled" if throttled else type(e).__name__
+
+            if attempt < self.max_retries - 1:
+                self.stats['retries'] += 1
+                count(self.status_queue, 'retries_total', reason=retry_reason)
+                wait_time = self.backoff_delay(attempt)
+                reason = "rate limited" if throttled else "failed"
+                self._log(f"  - {label} {reason} (Attempt {attempt + 1}/{self.max_retries}). "
+                          f"Retrying in {wait_time:.1f}s...")
+                await asyncio.sleep(wait_time)
+
+        self.stats['failures'] += 1
+        count(self.status_queue, 'failed_requests_total')
+        self._log(f"  - ERROR: {label} failed after {self.max_retries} attempts. Skipping.")
+        return None
+
+
+class SchedulerShare:
+    """
+    One owner's handle on a shared RequestScheduler: 'run' tags every request
+    with the owner, everything else (limits, stats) is the scheduler's own.
+    """
+
+    def __init__(self, scheduler, owner):
+        self.scheduler = scheduler
+        self.owner = owner
+
+    async def run(self, request_fn, estimated_tokens=0, label="Request"):
+        return await self.scheduler.run(request_fn, estimated_tokens, label, owner=self.owner)
+
+    def __getattr__(self, name):
+        return getattr(self.scheduler, name)
+
+
+# This block lets us exercise the scheduler against the fake model without an API key
+if __name__ == '__main__':
+    from langchain_core.messages import HumanMessage
+    from fake_llm import FakeChatModel
+
+    async def demo(num_requests=60):
+        llm = FakeChatModel(latency=0.2, error_rate=0.05, rate_limit_rate=0.15)
+        scheduler = RequestScheduler(max_in_flight=8, requests_per_minute=600, initial_wait=0.2)
+
+        async def one_request(i):
+            async def attempt():
+                response = await llm.ainvoke([HumanMessage(content='{"0": "Hello %d"}' % i)])
+                return response.content
+            return await scheduler.run(attempt, estimated_tokens=20, label=f"Request {i}")
+
+        started = time.monotonic()
+        results = await asyncio.gather(*(one_request(i) for i in range(num_requests)))
+        elapsed = time.monotonic() - started
+        completed = sum(result is not None for result in results)
+        print(f"{completed}/{num_requests} requests completed in {elapsed:.2f}s "
+              f"({completed / elapsed:.1f} req/s), peak model concurrency {llm.peak_concurrency}.")
+        print("Scheduler stats:", scheduler.stats, f"final limit {scheduler.concurrency_limit:.1f}")
+
+    async def fairness_demo():
+        # A large job queues 100 requests; a small one arriving just after should not wait behind all of them.
+        llm = FakeChatModel(latency=0.05)
+        scheduler = RequestScheduler(max_in_flight=4)
+        finished_at = {}
+
+        async def job(owner, num_requests):
+            share = scheduler.share(owner)
+
+            async def attempt():
+                return (await llm.ainvoke([HumanMessage(content='{"0": "Hello"}')])).content
+            await asyncio.gather(*(share.run(attempt, label=f"{owner} {i}") for i in range(num_requests)))
+            finished_at[owner] = time.monotonic() - started
+
+        started = time.monotonic()
+        large = asyncio.ensure_future(job("large", 100))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(large, job("small", 5))
+        print(f"Fairness: small job done after {finished_at['small']:.2f}s, "
+              f"large job after {finished_at['large']:.2f}s.")
+
+    print("Testing scheduler.py directly...")
+    asyncio.run(demo())
+    asyncio.run(fairness_demo())
@@ -0,0 +1,189 @@
+import re
+import copy
+from lxml import etree
+from pptx_xml import A_R, A_BR, A_FLD, A_T, A_RPR, A_ENDPARARPR, run_text, run_is_bold, escape_ctrl_chars
+
+# Paragraph segmentation: instead of one translation unit per run, a whole
+# paragraph is sent as one string in which runs formatted differently from the
+# rest of the paragraph (bold words, links, colours) are wrapped in lightweight
+# tags naming the run whose formatting they carry, e.g.
+#
+#     "Revenue grew <r1>12%</r1> in Q3<br/>see the <r3>appendix</r3>"
+#
+# Runs sharing the paragraph's dominant formatting are plain text, so most
+# paragraphs carry no tags at all. The model may move tagged words around, as
+# word order changes between languages; the paragraph's runs are then rebuilt
+# from the translated string.
+
+# Text-map granularity: one element per run (the original behaviour) or per paragraph.
+SEGMENT_RUNS = "runs"
+SEGMENT_PARAGRAPHS = "paragraphs"
+
+RUN_TAG = re.compile(r"<r(\d+)>|</r(\d+)>|<br/>")
+OPEN_OR_CLOSE_TAG = re.compile(r"</?r\d+>")
+# rPr attributes that do not change how text looks (spell-check and language bookkeeping).
+NON_VISUAL_ATTRIBUTES = frozenset(("lang", "altLang", "dirty", "err", "noProof", "smtClean", "smtId", "bmk"))
+
+
+def _format_key(r):
+    """Two runs with the same key look the same, so they can share one stretch of text."""
+    r_pr = r.find(A_RPR)
+    if r_pr is None:
+        return ()
+    attributes = tuple(sorted((name, value) for name, value in r_pr.attrib.items()
+                              if name not in NON_VISUAL_ATTRIBUTES))
+    return attributes + tuple(etree.tostring(child) for child in r_pr)
+
+
+def _analyse(p):
+    """
+    Returns (runs, format keys, base run index), or None for paragraphs that cannot be segmented.
+
+    The base formatting is the one covering the most non-blank characters; it
+    is left untagged. Blank runs count as base text rather than getting a tag.
+    """
+    runs = []
+    for child in p:
+        if child.tag == A_FLD:
+            # Fields (slide numbers, dates) are generated by PowerPoint; such paragraphs stay per-run.
+            return None
+        if child.tag == A_R:
+            runs.append(child)
+    if not runs:
+        return None
+    keys = [_format_key(r) if run_text(r).strip() else None for r in runs]
+    characters = {}
+    for r, key in zip(runs, keys):
+        if key is not None:
+            characters[key] = characters.get(key, 0) + len(run_text(r).strip())
+    base_key = max(characters, key=characters.get) if characters else None
+    keys = [base_key if key is None else key for key in keys]
+    return runs, keys, keys.index(base_key)
+
+
+def segment_paragraph(p):
+    """
+    Turns an <a:p> into one tagged string.
+
+    Works on any lxml paragraph element, including python-pptx's paragraph._p,
+    so both extraction engines produce exactly the same text.
+
+    Returns:
+        tuple: (tagged_text, is_bold) where is_bold describes the base formatting,
+               or None if the paragraph has no runs or contains fields.
+    """
+    analysis = _analyse(p)
+    if analysis is None:
+        return None
+    runs, keys, base = analysis
+    run_positions = {id(r): i for i, r in enumerate(runs)}
+
+    # [run index (None for base text), format key, text]; text is None for a line break.
+    pieces = []
+    for child in p:
+        if child.tag == A_BR:
+            pieces.append([None, None, None])
+        elif child.tag == A_R:
+            i = run_positions[id(child)]
+            index = None if keys[i] == keys[base] else i
+            if pieces and pieces[-1][2] is not None and pieces[-1][1] == keys[i]:
+                # Consecutive runs formatted alike share one tag, named after the first of them.
+                pieces[-1][2] += run_text(child)
+            else:
+                pieces.append([index, keys[i], run_text(child)])
+
+    parts = []
+    for index, _, text in pieces:
+        if text is None:
+            parts.append("<br/>")
+        elif index is None:
+            parts.append(text)
+        else:
+            # Surrounding spaces stay outside the tag, so the tag wraps just the words.
+            core = text.strip()
+            leading, trailing = text[:len(text) - len(text.lstrip())], text[len(text.rstrip()):]
+            parts.append(f"{leading}<r{index}>{core}</r{index}>{trailing}")
+    return "".join(parts), run_is_bold(runs[base])
+
+
+def parse_tagged_text(text, run_count):
+    """
+    Splits a (translated) tagged string into pieces.
+
+    Returns:
+        list: (run_index, text) pieces, where run_index is None for plain text
+              and text is None for a line break; or None when the tags are
+              unbalanced, nested or name a run that does not exist.
+    """
+    pieces = []
+    position, open_index = 0, None
+    for match in RUN_TAG.finditer(text):
+        if match.start() > position:
+            pieces.append((open_index, text[position:match.start()]))
+        opening, closing = match.group(1), match.group(2)
+        if opening is not None:
+            if open_index is not None or int(opening) >= run_count:
+                return None
+            open_index = int(opening)
+        elif closing is not None:
+            if open_index != int(closing):
+                return None
+            open_index = None
+        else:
+            pieces.append((None, None))
+        position = match.end()
+    if open_index is not None:
+        return None
+    if position < len(text):
+        pieces.append((None, text[position:]))
+    return pieces
+
+
+def _new_run_like(template, text):
+    """A copy of 'template' (keeping its formatting and element class) holding 'text'."""
+    r = copy.deepcopy(template)
+    for child in list(r):
+        if child.tag not in (A_RPR, A_T):
+            r.remove(child)
+    t = r.find(A_T)
+    if t is None:
+        t = r.makeelement(A_T, {})
+        r.append(t)
+    t.text = escape_ctrl_chars(text)
+    return r
+
+
+def apply_paragraph_translation(p, translated_text):
+    """
+    Rebuilds the runs of an <a:p> from a translated tagged string.
+
+    Plain text takes the paragraph's base formatting and tagged text the
+    formatting of the run its tag names. If the model broke the tags, the
+    text is still written, in the base formatting, with the tags removed.
+    """
+    analysis = _analyse(p)
+    if analysis is None:
+        raise ValueError("paragraph cannot be segmented")
+    runs, _, base = analysis
+
+    pieces = parse_tagged_text(translated_text, len(runs))
+    if pieces is None:
+        pieces = parse_tagged_text(OPEN_OR_CLOSE_TAG.sub("", translated_text), len(runs))
+
+    break_template = p.find(A_BR)
+    end_para = p.find(A_ENDPARARPR)
+    for child in list(p):
+        if child.tag in (A_R, A_BR):
+            p.remove(child)
+
+    for run_index, text in pieces:
+        if text is None:
+            element = copy.deepcopy(break_template) if break_template is not None else p.makeelement(A_BR, {})
+        elif not text:
+            continue
+        else:
+            element = _new_run_like(runs[base if run_index is None else run_index], text)
+        if end_para is not None:
+            end_para.addprevious(element)
+        else:
+            p.append(element)
@@ -0,0 +1,495 @@
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import asyncio
+import argparse
+import itertools
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from workflow import translate_deck, open_telemetry
+from terminology import glossary_path_for
+from translator import create_default_scheduler, MAX_CONCURRENT_REQUESTS
+from translation_cache import TranslationMemory
+from app import ConsoleStatusQueue
+from urllib.parse import unquote
+from http_protocol import (HTTPError, read_request_head, read_body, iter_body, keep_alive, write_json, write_response,
+                           error_reply, start_chunked, write_chunk, end_chunked, content_disposition)
+import llm_provider
+
+# The translator as a long-running daemon for a team: decks are uploaded over HTTP and queued as jobs,
+# and every job shares one scheduler (rate limits), one translation memory and one pool of LLM clients.
+#
+#     python service.py --port 8780
+#     curl --data-binary @deck.pptx "http://127.0.0.1:8780/jobs?name=deck.pptx&languages=Japanese,Korean&priority=5"
+#     curl "http://127.0.0.1:8780/jobs/<id>/stream"           # live progress, one JSON event per line
+#     curl -O "http://127.0.0.1:8780/jobs/<id>/files/deck_Japanese.pptx"
+#
+# Endpoints:
+#     POST   /jobs                   upload a deck (the raw .pptx as the body); query: name, languages,
+#                                    priority (higher runs sooner), instructions, project (jobs of one
+#                                    project share a glossary of its terminology)
+#     GET    /jobs                   every job's status
+#     GET    /jobs/<id>              one job's status, progress, output files and recent log lines
+#     GET    /jobs/<id>/events       events after ?since=<seq>, for polling
+#     GET    /jobs/<id>/stream       the same events streamed (chunked NDJSON) until the job ends
+#     GET    /jobs/<id>/files/<name> download an output deck
+#     DELETE /jobs/<id>              cancel a job (a running one saves its partial decks)
+
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8780
+SERVICE_ROOT = os.path.join(os.path.expanduser("~"), ".ai_pptx_translator", "service")
+# Jobs translated at the same time. Their requests take turns for the scheduler's slots, so a large
+# deck does not hold up small ones; jobs beyond this wait in the queue by priority.
+MAX_CONCURRENT_JOBS = 4
+MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+# Events each job keeps for /events and /stream (older ones are dropped; the status stays complete).
+JOB_EVENT_HISTORY = 2000
+STATUS_LOG_LINES = 20
+# Project names become folder names under <root>/projects.
+PROJECT_NAME_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]{0,63}")
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+
+class Job:
+    """
+    One uploaded deck and its target languages.
+
+    A job is the status_queue of its own run: the workflow's messages are
+    kept as numbered events (log lines, progress, state changes) for the
+    status, polling and streaming endpoints, while metric events go on to the
+    service's telemetry labelled with the job. 'put' may be called from worker
+    threads; events are recorded on the event loop.
+    """
+
+    def __init__(self, job_id, name, input_path, output_folder, languages, priority, instructions, loop,
+                 telemetry=None, project=None):
+        self.id = job_id
+        self.name = name
+        self.input_path = input_path
+        self.output_folder = output_folder
+        self.languages = languages
+        self.priority = priority
+        self.instructions = instructions
+        self.project = project
+        self.state = QUEUED
+        self.progress = 0.0
+        self.language_progress = {language: 0.0 for language in languages}
+        self.outputs = []
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+        self.events = deque(maxlen=JOB_EVENT_HISTORY)
+        self._sequence = itertools.count(1)
+        self._listeners = set()
+        self._loop = loop
+        self._telemetry = telemetry
+
+    def put(self, message):
+        message_type, payload = message
+        if message_type == 'metric':
+            if self._telemetry is not None:
+                self._telemetry.put(('metric', dict(payload, labels=dict(payload['labels'], job=self.id))))
+            return
+        self._loop.call_soon_threadsafe(self._record, message_type, payload)
+
+    def _record(self, message_type, payload):
+        if message_type == 'progress':
+            self.progress = payload
+        elif message_type == 'language_progress':
+            language, percent = payload
+            self.language_progress[language] = percent
+        event = {'seq': next(self._sequence), 'time': time.time(), 'type': message_type, 'data': payload}
+        self.events.append(event)
+        for listener in self._listeners:
+            listener.put_nowait(event)
+
+    def set_state(self, state, error=None):
+        self.state = state
+        self.error = error
+        if state == RUNNING:
+            self.started_at = time.time()
+        elif state in FINAL_STATES:
+            self.finished_at = time.time()
+        self._record('state', {'state': state, 'error': error})
+
+    def list_outputs(self):
+        """The decks in the output folder, partial ones included. Blocking; run it in an executor."""
+        return sorted(name for name in os.listdir(self.output_folder) if name.endswith(".pptx"))
+
+    def events_since(self, sequence):
+        return [event for event in self.events if event['seq'] > sequence]
+
+    async def follow(self, sequence=0):
+        """Yields the events after 'sequence', then new ones as they happen, until the job has ended."""
+        listener = asyncio.Queue()
+        self._listeners.add(listener)
+        try:
+            for event in self.events_since(sequence):
+                yield event
+                sequence = event['seq']
+            while self.state not in FINAL_STATES or not listener.empty():
+                event = await listener.get()
+                if event['seq'] > sequence:
+                    yield event
+                    sequence = event['seq']
+        finally:
+            self._listeners.discard(listener)
+
+    def status(self, log_lines=STATUS_LOG_LINES):
+        log = [event['data'] for event in self.events if event['type'] == 'log']
+        return {
+            'id': self.id, 'name': self.name, 'state': self.state, 'error': self.error,
+            'priority': self.priority, 'languages': self.languages, 'project': self.project,
+            'progress': round(self.progress, 1),
+            'language_progress': {language: round(percent, 1) for language, percent in self.language_progress.items()},
+            'outputs': self.outputs,
+            'created_at': self.created_at, 'started_at': self.started_at, 'finished_at': self.finished_at,
+            'last_event': self.events[-1]['seq'] if self.events else 0,
+            'log': log[-log_lines:] if log_lines else [],
+        }
+
+
+class TranslationService:
+    """
+    Queues translation jobs and runs up to 'max_concurrent_jobs' of them at a time.
+
+    Everything expensive to build is built once and shared by every job: the
+    request scheduler (so all jobs together stay within the API limits, and
+    get slots round-robin per job), the translation memory, the process
+    pool for extraction and reconstruction, and the LLM clients (llm_provider
+    keeps one pool per event loop, and the whole service runs on one).
+    """
+
+    def __init__(self, root=SERVICE_ROOT, max_concurrent_jobs=MAX_CONCURRENT_JOBS, concurrency=None, workers=None,
+                 requests_per_minute=None, tokens_per_minute=None):
+        self.root = root
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.concurrency = concurrency
+        self.workers = workers
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.jobs = {}
+        self._queue = None
+        self._order = itertools.count()
+        self._runners = []
+        self._closing = False
+        self._executor = None
+        self._telemetry = None
+        self.scheduler = None
+        self.translation_memory = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, lambda: os.makedirs(self.root, exist_ok=True))
+        self._telemetry = open_telemetry(None, self.root, "service")
+        self.scheduler = create_default_scheduler(ConsoleStatusQueue("scheduler", self._telemetry),
+                                                  max_in_flight=self.concurrency,
+                                                  requests_per_minute=self.requests_per_minute,
+                                                  tokens_per_minute=self.tokens_per_minute)
+        self.translation_memory = await loop.run_in_executor(None, TranslationMemory)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._queue = asyncio.PriorityQueue()
+        self._runners = [asyncio.ensure_future(self._run_jobs()) for _ in range(self.max_concurrent_jobs)]
+
+    async def submit(self, name, chunks, languages, priority=0, instructions="", project=None):
+        """
+        Stores an uploaded deck and queues it.
+
+        Args:
+            name (str): The deck's file name; outputs are named after it.
+            chunks (async iterable): The deck's bytes.
+            languages (list): Target languages.
+            priority (int): Higher numbers leave the queue first; equal priorities go in order of arrival.
+            instructions (str): Additional instructions for the translator.
+            project (str, optional): Jobs of the same project share the glossary of its terminology;
+                without one, the job's glossary is its own.
+
+        Returns:
+            Job: The queued job.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job_folder = os.path.join(self.root, job_id)
+        output_folder = os.path.join(job_folder, "output")
+        input_path = os.path.join(job_folder, name)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, lambda: os.makedirs(output_folder, exist_ok=True))
+        with open(input_path, "wb") as f:
+            async for chunk in chunks:
+                await loop.run_in_executor(None, f.write, chunk)
+
+        job = Job(job_id, name, input_path, output_folder, languages, priority, instructions, loop, self._telemetry,
+                  project)
+        self.jobs[job_id] = job
+        job.set_state(QUEUED)
+        await self._queue.put((-priority, next(self._order), job))
+        print(f"[service] Queued job {job_id}: {name} -> {', '.join(languages)} (priority {priority})", flush=True)
+        return job
+
+    def cancel(self, job):
+        """Cancels a queued job outright, or stops a running one (which saves its partial decks)."""
+        if job.state == QUEUED:
+            job.set_state(CANCELLED)
+        elif job.state == RUNNING and job.task is not None:
+            job.task.cancel()
+
+    async def _run_jobs(self):
+        while True:
+            _, _, job = await self._queue.get()
+            if job.state != QUEUED:
+                # Cancelled while it was waiting.
+                continue
+            await self._run(job)
+
+    async def _run(self, job):
+        job.set_state(RUNNING)
+        print(f"[service] Started job {job.id}", flush=True)
+        # The job's own share of the scheduler, so its batches take turns with the other running jobs'.
+        glossary_path = None
+        if job.project:
+            glossary_path = glossary_path_for(os.path.join(self.root, "projects", job.project))
+        job.task = asyncio.ensure_future(translate_deck(job.input_path, job.output_folder, job.instructions, job,
+                                                        job.languages, self.scheduler.share(job.id),
+                                                        self.translation_memory, self._executor,
+                                                        glossary_path=glossary_path))
+        try:
+            written = await job.task
+        except asyncio.CancelledError:
+            # Cancelled by DELETE, or by close(); either way the job has saved its partial decks by now.
+            await self._finish(job, CANCELLED, "the service was stopped" if self._closing else None)
+            if self._closing:
+                raise
+        except Exception as e:
+            await self._finish(job, FAILED, str(e))
+        else:
+            if len(written) == len(job.languages):
+                await self._finish(job, DONE)
+            else:
+                await self._finish(job, FAILED, f"{len(written)}/{len(job.languages)} languages were translated")
+        print(f"[service] Job {job.id} {job.state}", flush=True)
+
+    async def _finish(self, job, state, error=None):
+        # The outputs are listed before the final state is announced, so a client seeing it can download them.
+        try:
+            job.outputs = await asyncio.get_running_loop().run_in_executor(None, job.list_outputs)
+        except OSError as e:
+            print(f"[service] Could not list the outputs of job {job.id}: {e}", flush=True)
+        job.set_state(state, error)
+
+    async def close(self):
+        self._closing = True
+        for runner in self._runners:
+            runner.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        await llm_provider.aclose_clients()
+        if self._executor is not None:
+            self._executor.shutdown()
+        if self.translation_memory is not None:
+            self.translation_memory.close()
+        if self._telemetry is not None:
+            self._telemetry.close()
+
+
+class ServiceHTTPServer:
+    """The HTTP front end of a TranslationService (see the endpoint list at the top of this module)."""
+
+    def __init__(self, service, host=SERVICE_HOST, port=SERVICE_PORT):
+        self.service = service
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await read_request_head(reader)
+                    if head is None:
+                        break
+                    method, path, query, headers = head
+                    keep_open = await self._route(method, path, query, headers, reader, writer)
+                except HTTPError as e:
+                    # The request body may not have been read, so the connection cannot be reused.
+                    write_json(writer, e.status, error_reply(str(e)), keep_alive=False)
+                    keep_open = False
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    # A bug in one request must still get an answer rather than a dropped connection.
+                    print(f"[service] Request failed: {e!r}", flush=True)
+                    write_json(writer, 500, error_reply(f"internal error: {e}", "server_error"), keep_alive=False)
+                    keep_open = False
+                await writer.drain()
+                if not (keep_open and keep_alive(headers)):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _job(self, job_id):
+        job = self.service.jobs.get(job_id)
+        if job is None:
+            raise HTTPError(404, f"no job '{job_id}'")
+        return job
+
+    async def _route(self, method, path, query, headers, reader, writer):
+        """Handles one request. Returns False when the connection must be closed afterwards."""
+        # Split before decoding, so an encoded '/' inside a file name stays part of that name.
+        parts = [unquote(part) for part in path.strip("/").split("/")]
+        if parts[0] != "jobs":
+            raise HTTPError(404, f"{path} not found")
+
+        if len(parts) == 1:
+            if method == "POST":
+                name, languages, priority, instructions, project = self._parse_upload(query)
+                job = await self.service.submit(name, iter_body(reader, headers, MAX_UPLOAD_BYTES), languages,
+                                                priority, instructions, project)
+                write_json(writer, 202, job.status(log_lines=0), keep_alive(headers))
+            elif method == "GET":
+                jobs = sorted(self.service.jobs.values(), key=lambda job: job.created_at)
+                write_json(writer, 200, {'jobs': [job.status(log_lines=0) for job in jobs]}, keep_alive(headers))
+            else:
+                raise HTTPError(405, f"{method} /jobs is not supported")
+            return True
+
+        if method == "POST":
+            # Anything else posts no body we read; don't leave it on the connection.
+            raise HTTPError(405, f"{method} {path} is not supported")
+        await read_body(reader, headers, 0)
+        job = self._job(parts[1])
+        if len(parts) == 2 and method == "GET":
+            write_json(writer, 200, job.status(), keep_alive(headers))
+        elif len(parts) == 2 and method == "DELETE":
+            self.service.cancel(job)
+            write_json(writer, 202, job.status(log_lines=0), keep_alive(headers))
+        elif len(parts) == 3 and parts[2] == "events" and method == "GET":
+            events = job.events_since(self._since(query))
+            write_json(writer, 200, {'state': job.state, 'events': events}, keep_alive(headers))
+        elif len(parts) == 3 and parts[2] == "stream" and method == "GET":
+            since = self._since(query)
+            start_chunked(writer)
+            events = job.follow(since)
+            try:
+                async for event in events:
+                    write_chunk(writer, json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n")
+                    await writer.drain()
+            finally:
+                # A client that hangs up mid-stream must not leave its listener behind.
+                await events.aclose()
+            end_chunked(writer)
+        elif len(parts) == 4 and parts[2] == "files" and method == "GET":
+            write_response(writer, 200, await self._read_output(job, parts[3]),
+                           content_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+                           keep_alive=keep_alive(headers),
+                           headers={"Content-Disposition": content_disposition(parts[3])})
+        else:
+            raise HTTPError(404, f"{method} {path} not found")
+        return True
+
+    @staticmethod
+    def _parse_upload(query):
+        name = os.path.basename(query.get("name", ["deck.pptx"])[0])
+        if not name.lower().endswith(".pptx") or name.startswith("~$"):
+            raise HTTPError(400, "'name' must be a .pptx file name")
+        languages = [language.strip() for value in query.get("languages", [])
+                     for language in value.split(",") if language.strip()]
+        if not languages:
+            raise HTTPError(400, "'languages' is required, e.g. languages=Japanese,Korean")
+        try:
+            priority = int(query.get("priority", ["0"])[0])
+        except ValueError:
+            raise HTTPError(400, "'priority' must be an integer")
+        project = query.get("project", [None])[0]
+        if project is not None and not PROJECT_NAME_PATTERN.fullmatch(project):
+            raise HTTPError(400, "'project' may only contain letters, digits, '.', '_' and '-'")
+        return name, languages, priority, query.get("instructions", [""])[0], project
+
+    @staticmethod
+    def _since(query):
+        try:
+            return int(query.get("since", ["0"])[0])
+        except ValueError:
+            raise HTTPError(400, "'since' must be an event number")
+
+    @staticmethod
+    async def _read_output(job, name):
+        # Only files the job actually wrote; this also rules out paths like '../..'.
+        if name not in job.outputs:
+            raise HTTPError(404, f"job {job.id} has no output '{name}'")
+
+        def read():
+            with open(os.path.join(job.output_folder, name), "rb") as f:
+                return f.read()
+        return await asyncio.get_running_loop().run_in_executor(None, read)
+
+
+async def serve(args):
+    service = TranslationService(args.root, max_concurrent_jobs=args.jobs, concurrency=args.concurrency,
+                                 workers=args.workers, requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    server = ServiceHTTPServer(service, args.host, args.port)
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopped.set)
+    await service.start()
+    try:
+        await server.start()
+        print(f"--- Translation service listening on http://{server.host}:{server.port}/jobs "
+              f"({args.jobs} jobs at a time, {service.scheduler.max_in_flight} requests in flight) ---", flush=True)
+        await stopped.wait()
+        print("--- Stopping: running jobs save their partial decks... ---", flush=True)
+    finally:
+        await server.stop()
+        await service.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the translator as an HTTP service with a job queue.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--root", default=SERVICE_ROOT, help="Folder for uploaded decks and their outputs.")
+    parser.add_argument("-j", "--jobs", type=int, default=MAX_CONCURRENT_JOBS,
+                        help=f"Jobs translated at the same time (default {MAX_CONCURRENT_JOBS}).")
+    parser.add_argument("-c", "--concurrency", type=int, default=MAX_CONCURRENT_REQUESTS,
+                        help=f"Maximum in-flight LLM requests across all jobs (default {MAX_CONCURRENT_REQUESTS}).")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes used for extraction and reconstruction (default: CPU count).")
+    parser.add_argument("--rpm", type=int, default=None, help="Override the requests-per-minute limit.")
+    parser.add_argument("--tpm", type=int, default=None, help="Override the tokens-per-minute limit.")
+    parser.add_argument("--provider", choices=sorted(llm_provider.BACKENDS), default=llm_provider.PROVIDER,
+                        help=f"LLM backend (default {llm_provider.PROVIDER}).")
+    parser.add_argument("--base-url", default=None, help="Server URL for --provider openai.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    llm_provider.use_provider(args.provider, base_url=args.base_url)
+    missing = llm_provider.missing_credentials()
+    if missing:
+        print(f"FATAL ERROR: {missing}")
+        return 1
+    asyncio.run(serve(args))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import os
+import io
+import random
+import argparse
+from pptx import Presentation
+from pptx.util import Inches, Pt
+
+# Deterministic filler vocabulary, so generated decks are reproducible for a given seed.
+WORDS = ("revenue growth market strategy customer platform digital quarterly target pipeline "
+         "partner launch roadmap margin synergy retention onboarding pricing forecast segment "
+         "analytics cloud enterprise brand campaign region portfolio investment delivery").split()
+
+
+def _sentence(rng, min_words=3, max_words=10):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return " ".join(words).capitalize()
+
+
+def _noise_png(rng, size_kb):
+    """A PNG of random pixels; noise does not compress, so the file is roughly 'size_kb' large."""
+    from PIL import Image
+    side = max(8, int((size_kb * 1024 / 3) ** 0.5))
+    pixels = rng.randbytes(side * side * 3)
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (side, side), pixels).save(buffer, format="PNG")
+    buffer.seek(0)
+    return buffer
+
+
+def build_synthetic_deck(path, num_slides=100, paragraphs_per_shape=4, runs_per_paragraph=3, table_every=5,
+                         table_rows=5, table_cols=4, image_kb=0, repeated_footer="Confidential", seed=0):
+    """
+    Writes a synthetic .pptx for benchmarking.
+
+    Every slide has a title, a body text box of 'paragraphs_per_shape' paragraphs
+    with 'runs_per_paragraph' runs each (alternating bold, like real decks), a
+    small grouped shape and a repeated footer. Every 'table_every'-th slide also
+    gets a table, and 'image_kb' > 0 adds a unique, incompressible picture per
+    slide to make the package media-heavy.
+
+    Returns:
+        str: The path that was written.
+    """
+    rng = random.Random(seed)
+    prs = Presentation()
+    title_layout = prs.slide_layouts[5]  # "Title Only"
+
+    for slide_number in range(num_slides):
+        slide = prs.slides.add_slide(title_layout)
+        slide.shapes.title.text = f"{_sentence(rng, 2, 5)} ({slide_number + 1})"
+
+        body = slide.shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(5), Inches(3)).text_frame
+        for p_idx in range(paragraphs_per_shape):
+            paragraph = body.paragraphs[0] if p_idx == 0 else body.add_paragraph()
+            for r_idx in range(runs_per_paragraph):
+                run = paragraph.add_run()
+                run.text = _sentence(rng) + " "
+                run.font.bold = (r_idx % 2 == 1)
+
+        group = slide.shapes.add_group_shape()
+        group.shapes.add_textbox(Inches(6), Inches(1.5), Inches(3), Inches(0.5)).text_frame.text = _sentence(rng)
+
+        if table_every and slide_number % table_every == 0:
+            table = slide.shapes.add_table(table_rows, table_cols, Inches(0.5), Inches(4.6),
+                                           Inches(9), Inches(2)).table
+            for row in range(table_rows):
+                for col in range(table_cols):
+                    table.cell(row, col).text = _sentence(rng, 1, 3)
+
+        if image_kb:
+            slide.shapes.add_picture(_noise_png(rng, image_kb), Inches(6), Inches(2.2), Inches(3), Inches(2))
+
+        if repeated_footer:
+            footer = slide.shapes.add_textbox(Inches(0.5), Inches(7), Inches(4), Inches(0.4)).text_frame
+            footer.text = repeated_footer
+            footer.paragraphs[0].runs[0].font.size = Pt(10)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    prs.save(path)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic .pptx for benchmarking.")
+    parser.add_argument("path")
+    parser.add_argument("--slides", type=int, default=100)
+    parser.add_argument("--paragraphs", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--table-every", type=int, default=5)
+    parser.add_argument("--table-rows", type=int, default=5)
+    parser.add_argument("--table-cols", type=int, default=4)
+    parser.add_argument("--image-kb", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    build_synthetic_deck(args.path, num_slides=args.slides, paragraphs_per_shape=args.paragraphs,
+                         runs_per_paragraph=args.runs, table_every=args.table_every, table_rows=args.table_rows,
+                         table_cols=args.table_cols, image_kb=args.image_kb, seed=args.seed)
+    print(f"Wrote {args.path} ({os.path.getsize(args.path) / 1e6:.1f} MB)")
@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# Prometheus names get this prefix, e.g. 'batch_seconds' -> 'pptx_translator_batch_seconds'.
+METRIC_PREFIX = "pptx_translator_"
+# Upper bounds (seconds) of the histogram buckets in the Prometheus export.
+HISTOGRAM_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# The Prometheus file is rewritten at most this often while a run is going (and once at the end).
+PROMETHEUS_WRITE_INTERVAL = 5.0
+
+# Metric events travel on the status_queue next to 'log' and 'progress' as
+# ('metric', {'kind': 'counter' | 'gauge' | 'histogram', 'name': ..., 'value': ..., 'labels': {...}, 'time': ...}).
+
+
+def _emit(status_queue, kind, name, value, labels):
+    if status_queue is None:
+        return
+    status_queue.put(('metric', {'kind': kind, 'name': name, 'value': value, 'labels': labels, 'time': time.time()}))
+
+
+def count(status_queue, name, value=1, **labels):
+    """Adds 'value' to a counter, e.g. count(q, 'retries_total', reason='throttled')."""
+    _emit(status_queue, 'counter', name, value, labels)
+
+
+def gauge(status_queue, name, value, **labels):
+    """Sets a gauge to its current value, e.g. the number of requests in flight."""
+    _emit(status_queue, 'gauge', name, value, labels)
+
+
+def observe(status_queue, name, value, **labels):
+    """Records one observation of a distribution, e.g. a batch's latency in seconds."""
+    _emit(status_queue, 'histogram', name, value, labels)
+
+
+@contextmanager
+def phase_timer(status_queue, phase, **labels):
+    """Reports how long the enclosed block took as 'phase_seconds{phase=...}'."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(status_queue, 'phase_seconds', time.perf_counter() - started, phase=phase, **labels)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+class TelemetryRecorder:
+    """
+    Sits in front of a status_queue: 'metric' events are appended to a JSON-lines
+    file and aggregated into a Prometheus text-format file, then everything is
+    passed on unchanged, so the GUI can still show live throughput from them.
+    """
+
+    def __init__(self, status_queue, jsonl_path=None, prometheus_path=None):
+        self.status_queue = status_queue
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.counters = {}
+        self.gauges = {}
+        # (name, label key) -> [bucket counts..., sum, count]
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._last_prometheus_write = 0.0
+        self._jsonl = None
+        if jsonl_path:
+            os.makedirs(os.path.dirname(os.path.abspath(jsonl_path)), exist_ok=True)
+            self._jsonl = open(jsonl_path, "a", encoding="utf-8")
+
+    def put(self, message):
+        message_type, payload = message
+        if message_type == 'metric':
+            self.record(payload)
+        if self.status_queue is not None:
+            self.status_queue.put(message)
+
+    def record(self, event):
+        key = (event['name'], _label_key(event['labels']))
+        with self._lock:
+            if event['kind'] == 'counter':
+                self.counters[key] = self.counters.get(key, 0) + event['value']
+            elif event['kind'] == 'gauge':
+                self.gauges[key] = event['value']
+            else:
+                histogram = self.histograms.setdefault(key, [0] * len(HISTOGRAM_BUCKETS) + [0.0, 0])
+                for i, upper_bound in enumerate(HISTOGRAM_BUCKETS):
+                    if event['value'] <= upper_bound:
+                        histogram[i] += 1
+                histogram[-2] += event['value']
+                histogram[-1] += 1
+            if self._jsonl is not None:
+                self._jsonl.write(json.dumps(event, ensure_ascii=False) + "\n")
+            write_now = time.monotonic() - self._last_prometheus_write >= PROMETHEUS_WRITE_INTERVAL
+        if write_now:
+            self.write_prometheus()
+
+    def prometheus_text(self):
+        """The current aggregates in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for kind, series in (('counter', self.counters), ('gauge', self.gauges)):
+                for name in sorted({name for name, _ in series}):
+                    lines.append(f"# TYPE {METRIC_PREFIX}{name} {kind}")
+                    for (series_name, label_key), value in sorted(series.items()):
+                        if series_name == name:
+                            lines.append(f"{METRIC_PREFIX}{name}{_format_labels(label_key)} {value}")
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} histogram")
+                for (series_name, label_key), histogram in sorted(self.histograms.items()):
+                    if series_name != name:
+                        continue
+                    for upper_bound, bucket_count in zip(HISTOGRAM_BUCKETS, histogram):
+                        lines.append(f"{METRIC_PREFIX}{name}_bucket"
+                                     f"{_format_labels(label_key, [('le', upper_bound)])} {bucket_count}")
+                    lines.append(f"{METRIC_PREFIX}{name}_bucket{_format_labels(label_key, [('le', '+Inf')])} "
+                                 f"{histogram[-1]}")
+                    lines.append(f"{METRIC_PREFIX}{name}_sum{_format_labels(label_key)} {histogram[-2]}")
+                    lines.append(f"{METRIC_PREFIX}{name}_count{_format_labels(label_key)} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self):
+        self._last_prometheus_write = time.monotonic()
+        if self._jsonl is not None:
+            self._jsonl.flush()
+        if not self.prometheus_path:
+            return
+        # Written to a temporary file and renamed, so a scraper never reads half a file.
+        temp_path = self.prometheus_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(temp_path, self.prometheus_path)
+
+    def close(self):
+        self.write_prometheus()
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+
+
+class ThroughputTracker:
+    """
+    Turns the metric stream into the numbers a person watching a run cares
+    about: elements translated per second and the estimated time remaining.
+    """
+
+    def __init__(self):
+        self.started_at = None
+        self.elements_total = {}
+        self.elements_done = 0
+
+    def update(self, event):
+        if event['name'] == 'elements_to_translate':
+            # One gauge per language (and per deck in the CLI), so they are summed.
+            self.elements_total[_label_key(event['labels'])] = event['value']
+            if self.started_at is None:
+                self.started_at = event['time']
+        elif event['name'] == 'elements_translated_total':
+            self.elements_done += event['value']
+
+    def throughput(self, now=None):
+        if self.started_at is None:
+            return 0.0
+        elapsed = (now or time.time()) - self.started_at
+        return self.elements_done / elapsed if elapsed > 0 else 0.0
+
+    def eta_seconds(self, now=None):
+        """Seconds left at the current throughput, or None while there is nothing to extrapolate from."""
+        rate = self.throughput(now)
+        if not rate:
+            return None
+        return max(0.0, (sum(self.elements_total.values()) - self.elements_done) / rate)
@@ -0,0 +1,425 @@
+import os
+import re
+import json
+import threading
+from collections import Counter, deque
+from tokenizer import estimate_tokens
+from response_parser import parse_batch_response
+from segmentation import RUN_TAG
+from telemetry import count
+from translation_cache import hash_context
+import llm_provider
+
+# A project's glossary is kept in its output folder, so every deck translated into it shares the terms.
+GLOSSARY_FILE_NAME = "terminology.json"
+# Bump when the layout of the glossary file changes; older files are then ignored.
+GLOSSARY_VERSION = 1
+# A word sequence becomes a term once it appears in at least this many text elements of a deck ...
+MIN_TERM_OCCURRENCES = 2
+# ... and a deck adds at most this many new terms, the most frequent first.
+MAX_NEW_TERMS_PER_DECK = 300
+MAX_TERM_WORDS = 4
+# Terms sent per glossary translation request.
+GLOSSARY_BATCH_TERMS = 100
+
+_WORD_PATTERN = re.compile(r"\w[\w&+'’.-]*\w|\w")
+_SENTENCE_END_PATTERN = re.compile(r"[.!?:;]\s*$")
+_QUOTED_PATTERN = re.compile(r'"([^"\n]{2,80})"|“([^”\n]{2,80})”')
+# "Term -> translation" lines in the user's instructions pin a term's translation for every language.
+_PINNED_PATTERN = re.compile(r'^\s*[-*•]?\s*"?([^"\n]+?)"?\s*(?:->|=>|→)\s*"?([^"\n]+?)"?\s*$', re.MULTILINE)
+# Capitalized words that start sentences and headings without being names.
+_STOPWORDS = frozenset("""a an and are as at be by for from has have how in is it its of on or our that the their
+    this to we what when where which who why will with you your all new more not no next key""".split())
+
+
+def _plain_text(text):
+    """Drops segmentation's inline run tags (a <br/> becomes a space) so terms spanning runs are found."""
+    return RUN_TAG.sub(lambda match: " " if match.group(0) == "<br/>" else "", text)
+
+
+def _is_distinctive(word):
+    """Acronyms, CamelCase and alphanumeric codes name something wherever they appear: KPI, iPhone, X200."""
+    letters = [c for c in word if c.isalpha()]
+    if not letters:
+        return False
+    if len(letters) >= 2 and all(c.isupper() for c in letters):
+        return True
+    if any(c.isupper() for c in word[1:]):
+        return True
+    return any(c.isdigit() for c in word)
+
+
+def _candidate_terms(text):
+    """
+    Yields the candidate terms of one text: runs of up to MAX_TERM_WORDS capitalized
+    or distinctive words, without leading or trailing stopwords. A lone capitalized
+    word at the start of a sentence ("Revenue grew ...") is not a candidate, nor is
+    a longer run of capitalized words (a Title Case heading rather than a name).
+    """
+    text = _plain_text(text)
+    run, sentence_start = [], True
+
+    def flush():
+        words = list(run)
+        while words and words[0][0].lower() in _STOPWORDS:
+            words.pop(0)
+        while words and words[-1][0].lower() in _STOPWORDS:
+            words.pop()
+        if not words or len(words) > MAX_TERM_WORDS:
+            return None
+        if len(words) == 1:
+            word, at_sentence_start = words[0]
+            if not _is_distinctive(word) and at_sentence_start:
+                return None
+        return " ".join(word for word, _ in words)
+
+    position = 0
+    for match in _WORD_PATTERN.finditer(text):
+        word = match.group(0)
+        gap = text[position:match.start()]
+        position = match.end()
+        # Punctuation between two words ends a term: "ACME, Globex" are two names.
+        if run and gap.strip():
+            term = flush()
+            if term:
+                yield term
+            run = []
+        if word[0].isupper() or _is_distinctive(word):
+            run.append((word, sentence_start))
+        else:
+            term = flush()
+            if term:
+                yield term
+            run = []
+        sentence_start = bool(_SENTENCE_END_PATTERN.search(text[match.end():match.end() + 2]))
+    term = flush()
+    if term:
+        yield term
+
+
+def mine_terms(texts, user_instructions=""):
+    """
+    Finds the recurring names and jargon of a deck.
+
+    Args:
+        texts (list): The source text of every element (repeats count as separate occurrences).
+        user_instructions (str): The user's instructions; terms they mention (quoted, or names and
+            acronyms such as "Keep ACME") are kept whenever they occur in the deck at all.
+
+    Returns:
+        Counter: Maps each term to the number of elements it appears in.
+    """
+    occurrences = Counter()
+    for text in texts:
+        occurrences.update(set(_candidate_terms(text)))
+    terms = Counter({term: n for term, n in occurrences.most_common(MAX_NEW_TERMS_PER_DECK)
+                     if n >= MIN_TERM_OCCURRENCES})
+
+    requested = set(_candidate_terms(user_instructions or ""))
+    requested.update(quoted for match in _QUOTED_PATTERN.finditer(user_instructions or "")
+                     for quoted in match.groups() if quoted)
+    requested.update(pinned_terms(user_instructions))
+    requested -= set(terms)
+    if requested:
+        matcher = TermMatcher(requested)
+        for text in texts:
+            terms.update(matcher.find(_plain_text(text)))
+    return terms
+
+
+def pinned_terms(user_instructions):
+    """The "Term -> translation" lines of the user's instructions, as {term: translation}."""
+    return {term.strip(): translation.strip()
+            for term, translation in _PINNED_PATTERN.findall(user_instructions or "")}
+
+
+class TermMatcher:
+    """
+    Finds which of many terms occur in a text in a single pass (an Aho-Corasick
+    automaton), so looking a batch up costs the same for 10 terms or 10,000.
+
+    Matches are case-sensitive and must start and end on word boundaries, so
+    "AI" is found in "AI-driven" but not in "AIM".
+    """
+
+    def __init__(self, terms):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        for term in terms:
+            if term:
+                self._add(term)
+        self._link()
+
+    def _add(self, term):
+        state = 0
+        for char in term:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        self._output[state] += (term,)
+
+    def _link(self):
+        # Breadth first, so each state's failure link points to a state that is already complete.
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                # A state also reports every shorter term ending where it ends.
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def find(self, text):
+        """Returns the set of terms occurring in 'text'."""
+        found = set()
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for end, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for term in output[state]:
+                start = end - len(term) + 1
+                if ((start == 0 or not _is_word_char(text[start - 1]) or not _is_word_char(term[0]))
+                        and (end + 1 == len(text) or not _is_word_char(text[end + 1]) or not _is_word_char(term[-1]))):
+                    found.add(term)
+        return found
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+class TermIndex:
+    """One language's glossary, ready to be matched against batches."""
+
+    def __init__(self, translations):
+        self.translations = translations
+        self._matcher = TermMatcher(translations)
+
+    def __len__(self):
+        return len(self.translations)
+
+    def fingerprint(self, texts):
+        """
+        A hash of the entries of the terms occurring in 'texts' ("" when there are none).
+
+        A translation depends only on the entries of the terms in its own text, so
+        this is what goes into its translation memory, journal and manifest keys:
+        correcting a term retranslates only the texts containing it, and terms
+        other decks add to the project leave everything else reusable.
+        """
+        entries = self.lookup(texts)
+        if not entries:
+            return ""
+        return hash_context("\n".join(f"{term}\0{translation}" for term, translation in entries.items()))
+
+    def lookup(self, texts):
+        """Returns {term: translation} for the glossary terms occurring in any of 'texts'."""
+        found = set()
+        for text in texts:
+            found |= self._matcher.find(_plain_text(text))
+        return {term: self.translations[term] for term in sorted(found)}
+
+    def prompt_block(self, texts):
+        """
+        The glossary lines to put in front of a batch's payload (see translator's
+        directive 6), listing only the terms that occur in 'texts'; "" if there are none.
+        """
+        entries = self.lookup(texts)
+        if not entries:
+            return ""
+        return "Glossary:\n" + "\n".join(f"{term} => {translation}" for term, translation in entries.items()) + "\n\n"
+
+
+_save_locks = {}
+_save_locks_lock = threading.Lock()
+
+
+class Glossary:
+    """
+    A project's terminology: every term mined from its decks and each term's
+    translation per language, stored as JSON at 'path'.
+
+    Translations are made once and then reused by every later deck and run,
+    so a term reads the same everywhere. The file can be edited by hand to
+    correct a translation; pinned terms (from the user's instructions) are
+    applied on top and never saved.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.terms = {}
+        self.translations = {}
+        self.pinned = {}
+
+    @classmethod
+    def load(cls, path):
+        """Reads the glossary at 'path'; a missing or unreadable file gives an empty glossary."""
+        glossary = cls(path)
+        data = _read_glossary_file(path)
+        if data is not None:
+            glossary.terms = dict(data['terms'])
+            glossary.translations = {language: dict(entries) for language, entries in data['translations'].items()}
+        return glossary
+
+    def add_terms(self, occurrences):
+        """Adds a deck's mined terms. Returns the number of terms new to the project."""
+        new = 0
+        for term, n in occurrences.items():
+            if term not in self.terms:
+                new += 1
+            self.terms[term] = self.terms.get(term, 0) + n
+        return new
+
+    def untranslated(self, language, terms):
+        known = self.translations.get(language, {})
+        return [term for term in terms if term not in known and term not in self.pinned]
+
+    def index(self, language, terms=None, untranslated=False):
+        """
+        Builds the TermIndex of a language from every translated term of the project
+        (or only 'terms'), pinned translations taking precedence.
+
+        With 'untranslated', terms without a translation yet are included with an empty
+        one, so fingerprints taken before translate_glossary already single out the
+        texts that are about to get a new glossary entry.
+        """
+        translations = dict(self.translations.get(language, {}))
+        translations.update(self.pinned)
+        if untranslated:
+            translations.update((term, "") for term in self.untranslated(language, terms or self.terms))
+        if terms is not None:
+            wanted = set(terms)
+            translations = {term: text for term, text in translations.items() if term in wanted}
+        return TermIndex(translations)
+
+    def save(self):
+        """
+        Writes the glossary back to its file, merged with what is there now, so
+        runs sharing a project (e.g. jobs of the translation service) keep each
+        other's terms. Entries already in the file win.
+        """
+        if not self.path:
+            return
+        # Runs in a worker thread while other languages may still add translations on the event loop,
+        # so it works on copies (copying a dict is atomic).
+        terms = dict(self.terms)
+        translations = {language: dict(entries) for language, entries in list(self.translations.items())}
+        with _save_lock(self.path):
+            data = _read_glossary_file(self.path) or {'terms': {}, 'translations': {}}
+            for term, n in terms.items():
+                data['terms'][term] = max(n, data['terms'].get(term, 0))
+            for language, entries in translations.items():
+                stored = data['translations'].setdefault(language, {})
+                for term, translation in entries.items():
+                    stored.setdefault(term, translation)
+            data['version'] = GLOSSARY_VERSION
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Written to a temporary file first, so a crash never leaves a half-written glossary behind.
+            temp_path = f"{self.path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(temp_path, self.path)
+
+
+def _save_lock(path):
+    with _save_locks_lock:
+        return _save_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+def _read_glossary_file(path):
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"  - Warning: Ignoring unreadable glossary {path}: {e}")
+        return None
+    if not isinstance(data, dict) or data.get('version') != GLOSSARY_VERSION:
+        return None
+    return data
+
+
+def glossary_path_for(output_folder):
+    return os.path.join(output_folder, GLOSSARY_FILE_NAME)
+
+
+def prepare_glossary(texts, user_instructions, path):
+    """
+    Loads the project's glossary and adds the terms mined from a deck.
+
+    Args:
+        texts (list): The source text of every element of the deck.
+        user_instructions (str): The user's instructions (mentioned and pinned terms).
+        path (str): The project's glossary file.
+
+    Returns:
+        tuple: (glossary, deck_terms, new_terms) where 'deck_terms' lists every term of
+               the project's glossary that occurs in this deck.
+    """
+    glossary = Glossary.load(path)
+    glossary.pinned = pinned_terms(user_instructions)
+    new_terms = glossary.add_terms(mine_terms(texts, user_instructions))
+    # Terms an earlier deck established count here too, even where this deck uses them only once.
+    matcher = TermMatcher(set(glossary.terms) | set(glossary.pinned))
+    deck_terms = set()
+    for text in texts:
+        deck_terms |= matcher.find(_plain_text(text))
+    return glossary, sorted(deck_terms), new_terms
+
+
+def _glossary_prompt(context_briefing, target_language):
+    return f"""You are building the translation glossary for a presentation that is being translated into {target_language}.
+Translate each term of the JSON object below the way it should appear everywhere in the presentation.
+Keep brand names, product names and globally recognized acronyms in their original form unless a common, accepted {target_language} equivalent exists.
+You MUST return ONLY a single, valid JSON object with the exact same keys as the input, where the values are the translated terms.
+{context_briefing}"""
+
+
+async def translate_glossary(glossary, terms, context_briefing, target_language, scheduler, status_queue):
+    """
+    Translates the terms of 'terms' the glossary has no translation for yet, once
+    for the whole deck, before any batch is sent. Terms that fail are left out
+    (batches then translate them as they come).
+
+    Returns:
+        int: The number of terms translated.
+    """
+    from langchain_core.messages import SystemMessage, HumanMessage
+    pending = glossary.untranslated(target_language, terms)
+    if not pending:
+        return 0
+    status_queue.put(('log', f"Translating the glossary: {len(pending)} new terms..."))
+    llm = llm_provider.get_chat_model("translation")
+    instructions = _glossary_prompt(context_briefing, target_language)
+    translated = 0
+    for start in range(0, len(pending), GLOSSARY_BATCH_TERMS):
+        chunk = pending[start:start + GLOSSARY_BATCH_TERMS]
+        payload = json.dumps({str(i): term for i, term in enumerate(chunk)}, ensure_ascii=False, separators=(",", ":"))
+
+        async def attempt(payload=payload, expected_keys=[str(i) for i in range(len(chunk))]):
+            ai_response = await llm.ainvoke([SystemMessage(content=instructions), HumanMessage(content=payload)])
+            valid, _ = parse_batch_response(ai_response.content, expected_keys)
+            if not valid:
+                raise ValueError("Response contained no usable translations.")
+            return valid
+
+        result = await scheduler.run(attempt, estimated_tokens=estimate_tokens(instructions) + 2 * estimate_tokens(payload),
+                                     label="Glossary")
+        entries = glossary.translations.setdefault(target_language, {})
+        for key, translation in (result or {}).items():
+            entries[chunk[int(key)]] = translation
+            translated += 1
+    count(status_queue, 'glossary_terms_translated_total', translated, language=target_language)
+    return translated
@@ -0,0 +1,106 @@
+import time
+import asyncio
+import unittest
+
+from langchain_core.messages import HumanMessage
+
+from fake_llm import FakeChatModel
+from scheduler import RequestScheduler
+
+# Drives the scheduler against the fake model, so the limits and the failure handling can be checked offline:
+#     python -m pytest test_scheduler.py    (or: python -m unittest test_scheduler)
+
+
+def fake_request(llm, text="Hello"):
+    """A request_fn for RequestScheduler.run that sends one translation prompt to 'llm'."""
+    async def attempt():
+        response = await llm.ainvoke([HumanMessage(content='{"0": "%s"}' % text)])
+        return response.content
+    return attempt
+
+
+class RateLimitTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_requests_per_minute(self):
+        # 600 RPM allows a burst of 100 requests, then 10 per second.
+        llm = FakeChatModel(latency=0)
+        scheduler = RequestScheduler(max_in_flight=200, requests_per_minute=600)
+        started = time.monotonic()
+        results = await asyncio.gather(*(scheduler.run(fake_request(llm)) for _ in range(105)))
+        elapsed = time.monotonic() - started
+        self.assertTrue(all(results))
+        self.assertEqual(llm.calls, 105)
+        # The 5 requests past the burst wait for 5 / 10 seconds of refill.
+        self.assertGreaterEqual(elapsed, 0.45)
+        self.assertLess(elapsed, 2)
+
+    async def test_tokens_per_minute(self):
+        # 60000 TPM allows a burst of 10000 tokens, then 1000 per second.
+        llm = FakeChatModel(latency=0)
+        scheduler = RequestScheduler(max_in_flight=20, tokens_per_minute=60000)
+        started = time.monotonic()
+        await asyncio.gather(*(scheduler.run(fake_request(llm), estimated_tokens=1000) for _ in range(11)))
+        elapsed = time.monotonic() - started
+        self.assertEqual(llm.calls, 11)
+        # Ten requests fit in the burst; the eleventh waits a second for its 1000 tokens.
+        self.assertGreaterEqual(elapsed, 0.95)
+        self.assertLess(elapsed, 2.5)
+
+    def test_scheduler_reused_across_event_loops(self):
+        # benchmark.py runs the briefing and the translation in separate asyncio.run calls on one scheduler.
+        # 120 RPM is a burst of 20, so in both loops several requests queue on the bucket's lock at once.
+        llm = FakeChatModel(latency=0)
+        scheduler = RequestScheduler(max_in_flight=8, requests_per_minute=120)
+
+        async def burst(count):
+            return await asyncio.gather(*(scheduler.run(fake_request(llm)) for _ in range(count)))
+
+        self.assertTrue(all(asyncio.run(burst(22))))
+        self.assertTrue(all(asyncio.run(burst(3))))
+        self.assertEqual(scheduler.stats['retries'], 0)
+
+
+class FailureTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_backs_off_on_429_and_recovers(self):
+        llm = FakeChatModel(latency=0.01, rate_limit_rate=1.0)
+        scheduler = RequestScheduler(max_in_flight=8, max_retries=1, initial_wait=0.01)
+        results = await asyncio.gather(*(scheduler.run(fake_request(llm)) for _ in range(8)))
+        self.assertEqual(results, [None] * 8)
+        self.assertEqual(scheduler.stats['throttled'], 8)
+        # A burst of simultaneous 429s halves the limit once, not once per request.
+        self.assertEqual(scheduler.concurrency_limit, 4)
+
+        llm.rate_limit_rate = 0.0
+        llm.peak_concurrency = 0
+        results = await asyncio.gather(*(scheduler.run(fake_request(llm)) for _ in range(40)))
+        self.assertTrue(all(results))
+        self.assertGreater(scheduler.concurrency_limit, 4)
+        self.assertLessEqual(scheduler.concurrency_limit, 8)
+        self.assertLessEqual(llm.peak_concurrency, 8)
+
+    async def test_concurrency_never_exceeds_the_limit(self):
+        llm = FakeChatModel(latency=0.02, rate_limit_rate=0.2, seed=1)
+        scheduler = RequestScheduler(max_in_flight=4, initial_wait=0.01, max_wait=0.05)
+        await asyncio.gather(*(scheduler.run(fake_request(llm)) for _ in range(40)))
+        self.assertLessEqual(llm.peak_concurrency, 4)
+        self.assertEqual(scheduler.in_flight, 0)
+
+    async def test_gives_up_after_the_attempt_deadline(self):
+        # Every call stalls far past the deadline, so each attempt times out and is retried.
+        llm = FakeChatModel(stall_rate=1.0, stall_seconds=30)
+        scheduler = RequestScheduler(max_in_flight=2, max_retries=3, initial_wait=0.01, max_wait=0.05,
+                                     request_timeout=0.1)
+        started = time.monotonic()
+        result = await scheduler.run(fake_request(llm))
+        self.assertIsNone(result)
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(llm.calls, 3)
+        self.assertEqual(scheduler.stats['timeouts'], 3)
+        self.assertEqual(scheduler.stats['retries'], 2)
+        self.assertEqual(scheduler.stats['failures'], 1)
+        self.assertEqual(scheduler.in_flight, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import sys
+
+TABLE_CELL = 'table_cell'
+TEXT_RUN = 'text_run'
+PARAGRAPH = 'paragraph'
+
+
+class TextElement:
+    """
+    One translatable piece of a deck: a table cell, a text run or (with
+    paragraph segmentation) a whole paragraph.
+
+    The text map used to be a list of dicts with a nested 'location' dict and
+    the same string keys repeated in every one of them. With __slots__, the two
+    location indices stored as plain ints and the source text interned (decks
+    repeat the same footer and header on every slide), an element costs a
+    fraction of the memory, which matters once thousands of decks share a process.
+
+    For a table cell the location is (row, col); for a text run it is (paragraph, run);
+    for a paragraph it is (paragraph, 0).
+    """
+
+    __slots__ = ('type', 'slide_index', 'slide_id', 'shape_index', 'shape_id', 'location_major', 'location_minor',
+                 'original_text', 'is_bold', 'is_title', 'translated_text')
+
+    def __init__(self, type, slide_index, shape_index, location_major, location_minor, original_text,
+                 is_bold=False, is_title=False, slide_id=None, shape_id=None, translated_text=None):
+        self.type = type
+        self.slide_index = slide_index
+        self.slide_id = slide_id
+        self.shape_index = shape_index
+        self.shape_id = shape_id
+        self.location_major = location_major
+        self.location_minor = location_minor
+        self.original_text = sys.intern(original_text)
+        self.is_bold = is_bold
+        self.is_title = is_title
+        self.translated_text = translated_text
+
+    @property
+    def location(self):
+        """The location in the old dict form, e.g. {'paragraph': 0, 'run': 2}."""
+        if self.type == TABLE_CELL:
+            return {'row': self.location_major, 'col': self.location_minor}
+        if self.type == PARAGRAPH:
+            return {'paragraph': self.location_major}
+        return {'paragraph': self.location_major, 'run': self.location_minor}
+
+    def copy(self):
+        """A shallow copy, e.g. so each target language can hold its own translation."""
+        clone = TextElement.__new__(TextElement)
+        for name in TextElement.__slots__:
+            setattr(clone, name, getattr(self, name))
+        return clone
+
+    def with_translation(self, translated_text):
+        clone = self.copy()
+        clone.translated_text = translated_text
+        return clone
+
+    def to_dict(self):
+        """The element in the dict form the extractor used to emit (plus 'translated_text' once it has one)."""
+        element = {
+            'type': self.type,
+            'slide_index': self.slide_index,
+            'slide_id': self.slide_id,
+            'shape_index': self.shape_index,
+            'shape_id': self.shape_id,
+            'location': self.location,
+            'original_text': self.original_text,
+            'is_bold': self.is_bold,
+        }
+        if self.type != TABLE_CELL:
+            element['is_title'] = self.is_title
+        if self.translated_text is not None:
+            element['translated_text'] = self.translated_text
+        return element
+
+    @classmethod
+    def from_dict(cls, element):
+        """Builds an element from the dict form; the inverse of to_dict."""
+        location = element['location']
+        if element['type'] == TABLE_CELL:
+            major, minor = location['row'], location['col']
+        elif element['type'] == PARAGRAPH:
+            major, minor = location['paragraph'], 0
+        else:
+            major, minor = location['paragraph'], location['run']
+        return cls(element['type'], element['slide_index'], element['shape_index'], major, minor,
+                   element['original_text'], is_bold=element.get('is_bold', False),
+                   is_title=element.get('is_title', False), slide_id=element.get('slide_id'),
+                   shape_id=element.get('shape_id'), translated_text=element.get('translated_text'))
+
+    def __eq__(self, other):
+        if not isinstance(other, TextElement):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in TextElement.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"TextElement({self.to_dict()!r})"
+
+
+def as_text_element(element):
+    """Accepts either form, so callers still holding dict text maps keep working."""
+    if isinstance(element, TextElement):
+        return element
+    return TextElement.from_dict(element)
+
+
+def text_map_to_dicts(text_map):
+    return [element.to_dict() for element in text_map]
+
+
+def text_map_from_dicts(text_map):
+    return [as_text_element(element) for element in text_map]
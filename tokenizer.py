@@ -0,0 +1,26 @@
+import re
+
+# Characters from scripts that most LLM tokenizers encode at roughly one token each
+# (CJK ideographs, kana, hangul). Everything else averages about four characters per token.
+_WIDE_CHAR_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """
+    Cheap, dependency-free token estimate for a piece of text.
+
+    It is intentionally rough: good enough for budgeting and reporting,
+    never used for anything that must be exact.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The estimated number of tokens (at least 1 for non-empty text).
+    """
+    if not text:
+        return 0
+    wide_chars = len(_WIDE_CHAR_PATTERN.findall(text))
+    narrow_chars = len(text) - wide_chars
+    return max(1, wide_chars + -(-narrow_chars // CHARS_PER_TOKEN))
@@ -0,0 +1,117 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".ai_pptx_translator", "translation_memory.sqlite3")
+DEFAULT_MAX_ENTRIES = 200000
+
+
+def normalize_source_text(text):
+    """Collapses whitespace so trivially different copies of a string share a cache entry."""
+    return " ".join(text.split())
+
+
+def hash_context(context_text):
+    """Returns a short, stable fingerprint of the context (briefing or glossary) a translation depends on."""
+    return hashlib.sha256((context_text or "").encode("utf-8")).hexdigest()[:16]
+
+
+class TranslationMemory:
+    """
+    A disk-backed translation memory (SQLite) with a least-recently-used size cap.
+
+    Entries are keyed on the normalized source text, the target language and a
+    hash of the translation context, so a different glossary never reuses stale output.
+    The same database also caches each deck's AI context analysis, keyed by a hash of the deck text.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # The connection can be shared by the worker thread the GUI spawns for each run.
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS translations (
+                    source_text TEXT NOT NULL,
+                    target_language TEXT NOT NULL,
+                    context_hash TEXT NOT NULL,
+                    translated_text TEXT NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (source_text, target_language, context_hash)
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS briefings (
+                    deck_hash TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    created REAL NOT NULL
+                )""")
+
+    def lookup_many(self, source_texts, target_language, context_hash):
+        """
+        Looks up a collection of source strings in one go.
+
+        Returns:
+            dict: Maps each source text that was found to its cached translation.
+        """
+        found = {}
+        now = time.time()
+        with self._lock, self._conn:
+            for text in set(source_texts):
+                row = self._conn.execute(
+                    "SELECT translated_text FROM translations "
+                    "WHERE source_text = ? AND target_language = ? AND context_hash = ?",
+                    (normalize_source_text(text), target_language, context_hash)).fetchone()
+                if row:
+                    found[text] = row[0]
+            if found:
+                # Touch the hits so the LRU eviction keeps them around.
+                self._conn.executemany(
+                    "UPDATE translations SET last_used = ? "
+                    "WHERE source_text = ? AND target_language = ? AND context_hash = ?",
+                    [(now, normalize_source_text(text), target_language, context_hash) for text in found])
+        return found
+
+    def store_many(self, translations, target_language, context_hash):
+        """
+        Saves new translations and evicts the least recently used entries beyond the size cap.
+
+        Args:
+            translations (dict): Maps source text to its accepted translation.
+        """
+        if not translations:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translations "
+                "(source_text, target_language, context_hash, translated_text, last_used) VALUES (?, ?, ?, ?, ?)",
+                [(normalize_source_text(source), target_language, context_hash, translated, now)
+                 for source, translated in translations.items()])
+            count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM translations WHERE rowid IN "
+                    "(SELECT rowid FROM translations ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,))
+
+    def get_briefing(self, deck_hash):
+        """Returns the cached AI analysis for a deck (keyed by a hash of its text), or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT summary FROM briefings WHERE deck_hash = ?", (deck_hash,)).fetchone()
+        return row[0] if row else None
+
+    def store_briefing(self, deck_hash, summary):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO briefings (deck_hash, summary, created) VALUES (?, ?, ?)",
+                               (deck_hash, summary, time.time()))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
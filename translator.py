@@ -1,105 +1,418 @@
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage
 import json
-import math
+import time
 import asyncio
+from tokenizer import estimate_tokens
+from translation_cache import hash_context
+from scheduler import RequestScheduler
+from response_parser import parse_batch_response
+from journal import batch_key
+from telemetry import count, gauge, observe
+from prompt_cache import PromptPrefix, GeminiContextCache, LocalContextCache
+import llm_provider
 
 BATCH_SIZE = 25
+# "tokens" packs batches toward the token budgets below; "count" uses BATCH_SIZE elements per batch.
+BATCHING_MODE = "tokens"
+INPUT_TOKEN_BUDGET = 1500
+OUTPUT_TOKEN_BUDGET = 3000
 MAX_RETRIES = 5
 INITIAL_WAIT_TIME = 2
+# Follow-up requests for keys that came back missing or empty before they are marked as errors.
+MAX_SALVAGE_ROUNDS = 2
+MAX_CONCURRENT_REQUESTS = 8
+REQUESTS_PER_MINUTE = 60
+TOKENS_PER_MINUTE = 1000000
+# Seconds a single request may take before it is abandoned and retried.
+REQUEST_TIMEOUT = 180
+# A request slower than this percentile of recent latencies gets a duplicate (None disables hedging) ...
+HEDGE_PERCENTILE = 0.95
+# ... but at most this many duplicates per request sent.
+HEDGE_BUDGET = 0.1
+# Where the prompt prefix (directives plus briefing) is kept: "gemini" uses Gemini's context caching,
+# "local" an in-process stand-in understood only by fake_llm (offline benchmarks and tests), and
+# "off" sends the prefix with every request. A cache the provider cannot read counts as "off".
+# A typical prefix is about 500 tokens, under Gemini's caching minimum (prompt_cache.MIN_CACHED_PREFIX_TOKENS),
+# so "gemini" only pays off with long instructions or briefings.
+# The models themselves are chosen per phase in llm_provider.PHASE_MODELS.
+PROMPT_CACHE = "off"
 
 
-async def translate_single_batch(llm, batch_prompt, batch_num, max_retries, initial_wait, status_queue):
-    """An async helper function to translate and handle retries for one batch."""
-    for attempt in range(max_retries):
-        try:
-            ai_response = await llm.ainvoke([HumanMessage(content=batch_prompt)])
-            response_content = ai_response.content.strip()
-            if response_content.startswith("```json"):
-                response_content = response_content[7:-4].strip()
-            return json.loads(response_content)
-        except Exception as e:
-            if attempt < max_retries - 1:
-                wait_time = initial_wait * (2 ** attempt)
-                status_queue.put(('log',
-                                  f"  - Batch {batch_num} failed (Attempt {attempt + 1}/{max_retries}). Retrying in {wait_time}s..."))
-                await asyncio.sleep(wait_time)
+def create_default_scheduler(status_queue, max_in_flight=None, requests_per_minute=None, tokens_per_minute=None):
+    """Builds a request scheduler from the module settings; any argument given overrides its setting."""
+    return RequestScheduler(max_in_flight=max_in_flight or MAX_CONCURRENT_REQUESTS,
+                            requests_per_minute=requests_per_minute or REQUESTS_PER_MINUTE,
+                            tokens_per_minute=tokens_per_minute or TOKENS_PER_MINUTE,
+                            max_retries=MAX_RETRIES,
+                            initial_wait=INITIAL_WAIT_TIME,
+                            status_queue=status_queue,
+                            request_timeout=REQUEST_TIMEOUT,
+                            hedge_percentile=HEDGE_PERCENTILE,
+                            hedge_budget=HEDGE_BUDGET)
+
+
+def build_translation_prefix(context_briefing, target_language):
+    """
+    Builds the part of the translation prompt shared by every batch of a language.
+
+    It must not vary from batch to batch (no counts, no batch numbers), or it
+    could not be cached as one prefix.
+    """
+    return f"""You are a native-speaking marketing and business localization expert for {target_language}.
+Your task is to translate JSON objects of English text snippets into {target_language}.
+Your Core Directives:
+1. Prioritize Natural Phrasing: The translation must sound like it was written by a native-speaking business professional. Avoid stiff, overly literal, or robotic language. Use natural, idiomatic expressions where appropriate.
+2. Understand the Context: Use the context briefing below to understand the document's goal, audience, and tone. The translation's tone must match.
+3. Handle Jargon Intelligently: If a term is a globally recognized acronym (e.g., "KPI", "ROI", "B2B") or a specific brand/project name mentioned in the user's instructions, preserve it in its original English form unless a common, accepted {target_language} equivalent exists.
+4. Strict JSON I/O: Every message is a JSON object. You MUST return ONLY a single, valid JSON object with the exact same keys as the input, where the values are the translated text. Do not add any extra text, explanations, or markdown like ```json.
+5. Keep Inline Tags: Some values contain tags such as <r2>...</r2> and <br/>. They mark formatting (bold words, links, line breaks). Keep every tag exactly as written, wrap the translation of the same words in it (moving it where {target_language} word order needs it), and never add, drop or rename tags.
+6. Follow the Glossary: A message may start with a "Glossary:" list of "term => translation" lines for terms that occur in its text snippets, followed by the JSON object. Always render those terms exactly as listed, so they read the same across the whole document. Translate only the JSON object.
+{context_briefing}"""
+
+
+def build_translation_payload(batch_dict_to_translate, term_index=None):
+    """
+    The per-batch part of the prompt: the {key: source text} object as compact JSON,
+    after the glossary entries of the terms it contains when a terminology.TermIndex is given.
+    """
+    payload = json.dumps(batch_dict_to_translate, ensure_ascii=False, separators=(",", ":"))
+    if term_index is None:
+        return payload
+    return term_index.prompt_block(batch_dict_to_translate.values()) + payload
+
+
+def create_prompt_prefix(context_briefing, target_language, phase="translation"):
+    """Builds the language's PromptPrefix for a phase's model, backed by the context cache PROMPT_CACHE selects."""
+    cache = None
+    if PROMPT_CACHE == llm_provider.context_cache_kind():
+        # Only a cache the provider's models can read; anything else would drop the prefix from the prompt.
+        cache = {"gemini": GeminiContextCache, "local": LocalContextCache}[PROMPT_CACHE]
+    return PromptPrefix(build_translation_prefix(context_briefing, target_language),
+                        cache=cache() if cache else None, model=llm_provider.model_for(phase))
+
+
+async def translate_single_batch(llm, batch_dict_to_translate, prompt_prefix, target_language, batch_num,
+                                 scheduler, status_queue, term_index=None):
+    """
+    Translates one batch; retries and pacing are left to the scheduler.
+
+    Replies are parsed tolerantly. When only some keys come back missing or
+    empty, just those keys are re-requested in a smaller follow-up prompt
+    instead of resending the whole batch. Each request carries only the
+    glossary entries (from 'term_index') of the terms in the texts it sends.
+
+    Returns:
+        dict: The translations that were obtained (possibly partial), or None if nothing came back.
+    """
+    # LangChain is imported on first use rather than with the module; it dominates start-up time.
+    from langchain_core.messages import HumanMessage
+    translations = {}
+    pending = dict(batch_dict_to_translate)
+
+    for salvage_round in range(MAX_SALVAGE_ROUNDS + 1):
+        payload = build_translation_payload(pending, term_index)
+
+        async def attempt(payload=payload, expected_keys=list(pending)):
+            messages = prompt_prefix.messages + [HumanMessage(content=payload)]
+            ai_response = await llm.ainvoke(messages, **prompt_prefix.invoke_kwargs)
+            # Every attempt is paid for, including the ones whose reply is rejected below.
+            count(status_queue, 'prompt_tokens_total',
+                  estimate_tokens(payload) + prompt_prefix.tokens - prompt_prefix.cached_tokens,
+                  language=target_language)
+            if prompt_prefix.cached_tokens:
+                count(status_queue, 'cached_prompt_tokens_total', prompt_prefix.cached_tokens,
+                      language=target_language)
+            count(status_queue, 'response_tokens_total', estimate_tokens(ai_response.content),
+                  language=target_language)
+            valid, _ = parse_batch_response(ai_response.content, expected_keys)
+            if not valid:
+                raise ValueError("Response contained no usable translations.")
+            return valid
+
+        # The TPM budget is charged for the whole prompt (cached tokens still count toward the quota)
+        # plus a completion about as long as the payload.
+        estimated_tokens = (prompt_prefix.tokens + estimate_tokens(payload)
+                            + sum(estimate_tokens(text) for text in pending.values()))
+        label = f"Batch {batch_num}" if salvage_round == 0 else f"Batch {batch_num} (follow-up {salvage_round})"
+        result = await scheduler.run(attempt, estimated_tokens=estimated_tokens, label=label)
+        if result is None:
+            break
+
+        translations.update(result)
+        pending = {key: text for key, text in pending.items() if key not in result}
+        if not pending:
+            break
+        if salvage_round < MAX_SALVAGE_ROUNDS:
+            status_queue.put(('log', f"  - Batch {batch_num}: re-requesting {len(pending)} missing or invalid keys..."))
+
+    return translations or None
+
+
+def glossary_context_hash(context_text, texts, term_index=None):
+    """
+    The context hash keying the translations of 'texts': the hash of 'context_text', plus
+    the glossary entries of the terms the texts contain when there are any. Texts without
+    glossary terms keep the plain hash, whatever the rest of the glossary holds.
+    """
+    glossary_fingerprint = term_index.fingerprint(texts) if term_index is not None else ""
+    if not glossary_fingerprint:
+        return hash_context(context_text)
+    return hash_context(f"{context_text}\0glossary:{glossary_fingerprint}")
+
+
+def group_by_context_hash(texts, context_hashes):
+    """Groups 'texts' as {context hash: [text, ...]}, so each group is one cache query."""
+    groups = {}
+    for text in texts:
+        groups.setdefault(context_hashes[text], []).append(text)
+    return groups
+
+
+def fill_from_translation_memory(smart_batches, translation_memory, target_language, context_hashes, status_queue):
+    """
+    Fills in every element the translation memory already knows and works out
+    what still needs to go to the model.
+
+    Args:
+        smart_batches (list): The batches created by the batcher.
+        translation_memory (TranslationMemory): The cache to consult.
+        target_language (str): The language being translated into.
+        context_hashes (dict): Maps each source text to the fingerprint of the context its
+            translation depends on (see glossary_context_hash).
+        status_queue (queue.Queue): Where the hit/miss report is sent.
+
+    Returns:
+        list: For each batch, the elements that were not in the cache (an empty list when fully cached).
+    """
+    all_texts = [item.original_text for batch in smart_batches for item in batch]
+    cached = {}
+    for context_hash, texts in group_by_context_hash(all_texts, context_hashes).items():
+        cached.update(translation_memory.lookup_many(texts, target_language, context_hash))
+
+    hits, tokens_saved = 0, 0
+    pending_per_batch = []
+    for batch in smart_batches:
+        pending = []
+        for item in batch:
+            if item.original_text in cached:
+                item.translated_text = cached[item.original_text]
+                hits += 1
+                tokens_saved += estimate_tokens(item.original_text) + estimate_tokens(item.translated_text)
+            else:
+                pending.append(item)
+        pending_per_batch.append(pending)
+
+    misses = len(all_texts) - hits
+    count(status_queue, 'cache_hits_total', hits, language=target_language)
+    count(status_queue, 'cache_misses_total', misses, language=target_language)
+    hit_ratio = (hits / len(all_texts)) if all_texts else 0
+    status_queue.put(('log', f"Translation memory: {hits} hits / {misses} misses "
+                             f"({hit_ratio:.0%} hit rate), ~{tokens_saved} tokens saved."))
+    return pending_per_batch
+
+
+def store_in_translation_memory(translation_memory, translations, target_language, context_hashes):
+    """Saves {source text: translation} under each text's own context hash (see glossary_context_hash)."""
+    for context_hash, texts in group_by_context_hash(translations, context_hashes).items():
+        translation_memory.store_many({text: translations[text] for text in texts}, target_language, context_hash)
+
+
+def fill_from_journal(smart_batches, journal, batch_keys, status_queue):
+    """
+    Fills in the elements of every batch an interrupted run already completed.
+
+    Returns:
+        list: For each batch, the elements the journal did not cover.
+    """
+    resumed_batches = 0
+    pending_per_batch = []
+    for batch, key in zip(smart_batches, batch_keys):
+        translations = journal.completed.get(key, {})
+        if translations:
+            resumed_batches += 1
+        pending = []
+        for item in batch:
+            if item.original_text in translations:
+                item.translated_text = translations[item.original_text]
+            else:
+                pending.append(item)
+        pending_per_batch.append(pending)
+
+    if journal.completed:
+        count(status_queue, 'journal_restored_batches_total', resumed_batches)
+        status_queue.put(('log', f"Resuming: {resumed_batches} of {len(smart_batches)} batches "
+                                 f"restored from the checkpoint journal."))
+    return pending_per_batch
+
+
+def apply_batch_result(batch, translated_dict):
+    """Writes a batch's translations (keyed by position in the batch) into its elements."""
+    if translated_dict:
+        # Reconstruct the batch with the new translated text
+        for i, item in enumerate(batch):
+            # Use the item's index within the batch as the key
+            translated_text = translated_dict.get(str(i))
+            if translated_text:
+                item.translated_text = translated_text
             else:
-                status_queue.put(
-                    ('log', f"  - ERROR: Batch {batch_num} failed after {max_retries} attempts. Skipping."))
-                return None
+                item.translated_text = "ERROR: Key not in response."
+    else:
+        # Mark the entire failed batch with an error
+        for item in batch:
+            item.translated_text = "ERROR: API Call Failed After Retries."
+
+
+async def translate_batches_as_completed(smart_batches, context_briefing, target_language, status_queue,
+                                         translation_memory=None, cache_context=None, scheduler=None, journal=None,
+                                         term_index=None):
+    """
+    Translates the batches concurrently and yields each one, with 'translated_text'
+    written into every element, as soon as it is finished. Batches served entirely
+    by the translation memory are yielded first.
+
+    Args:
+        smart_batches (list): The batches created by the batcher.
+        context_briefing (str): The briefing, part of the prompt prefix shared by every batch.
+        target_language (str): The language to translate into.
+        status_queue (queue.Queue): Receives ('log', ...) and ('progress', ...) messages.
+        translation_memory (TranslationMemory, optional): Cache consulted before any prompt is built.
+        cache_context (str, optional): The text whose hash keys the cache. Defaults to the briefing.
+            Each text's key also covers the glossary entries of the terms it contains.
+        scheduler (RequestScheduler, optional): Shared concurrency/rate limiter. A default one is built if omitted.
+        journal (CheckpointJournal, optional): Batches it already holds are restored instead of translated,
+            and every finished batch is appended to it.
+        term_index (terminology.TermIndex, optional): The language's glossary; each batch is sent with
+            the entries of the terms it contains.
 
+    Yields:
+        list: Each completed batch.
 
-async def translate_text_elements_in_batch(smart_batches, context_briefing, target_language, status_queue):
+    Raises:
+        RuntimeError: If the AI model cannot be initialized.
+    """
     status_queue.put(('log', f"--- Starting Phase 3 (Async): Translating to {target_language} ---"))
 
+    context_text = context_briefing if cache_context is None else cache_context
+    context_hashes = {item.original_text: glossary_context_hash(context_text, [item.original_text], term_index)
+                      for batch in smart_batches for item in batch}
+    batch_keys = []
+    for batch in smart_batches:
+        texts = [item.original_text for item in batch]
+        batch_keys.append(batch_key(texts, target_language, glossary_context_hash(context_text, texts, term_index)))
+
+    # Journal and cache hits are filled in right away; only the misses are sent to the model.
+    pending_per_batch = list(smart_batches)
+    if journal is not None:
+        pending_per_batch = fill_from_journal(smart_batches, journal, batch_keys, status_queue)
+    loop = asyncio.get_running_loop()
+    if translation_memory is not None:
+        # SQLite work runs in a worker thread so it never stalls the requests in flight.
+        pending_per_batch = await loop.run_in_executor(
+            None, fill_from_translation_memory, pending_per_batch, translation_memory, target_language,
+            context_hashes, status_queue)
+
     try:
-        llm = ChatGoogleGenerativeAI(model="gemini-2.5-pro-preview-06-05")
+        # Short batches (table cells, labels) may go to a faster model; see llm_provider.PHASE_MODELS.
+        models = {phase: llm_provider.get_chat_model(phase) for phase in ("translation", "translation_short")}
     except Exception as e:
         status_queue.put(('log', f"ERROR: Error initializing AI model: {e}"))
-        return None
+        raise RuntimeError(f"Error initializing AI model: {e}")
 
-    # THE FIX: Create a simple list of coroutines, not tuples.
-    task_coroutines = []
-
-    for i, batch in enumerate(smart_batches):
-        # We need a unique way to map results back. An index is robust.
-        # The key in the JSON will now be the item's original index in the flat text_map.
-        batch_dict_to_translate = {
-            str(original_index): item['original_text']
-            for original_index, item in enumerate(batch)
-        }
-
-        json_input_string = json.dumps(batch_dict_to_translate, indent=2, ensure_ascii=False)
-
-        translator_prompt = f"""
-        You are a native-speaking marketing and business localization expert for {target_language}. 
-        Your task is to translate a JSON object of English text snippets into {target_language}.
-        Your Core Directives:
-        1.  Prioritize Natural Phrasing: The translation must sound like it was written by a native-speaking business professional. Avoid stiff, overly literal, or robotic language. Use natural, idiomatic expressions where appropriate.
-        2.  Understand the Context: Use the provided context briefing to understand the document's goal, audience, and tone. The translation's tone must match.
-        3.  Handle Jargon Intelligently: If a term is a globally recognized acronym (e.g., "KPI", "ROI", "B2B") or a specific brand/project name mentioned in the user's instructions, preserve it in its original English form unless a common, accepted {target_language} equivalent exists.
-        4.  Strict JSON I/O: You will be given a JSON object. You MUST return ONLY a single, valid JSON object with the exact same keys as the input, where the values are the translated text. Do not add any extra text, explanations, or markdown like ```json.
-        {context_briefing}
-        Translate the values in the following JSON object into {target_language}:
-        ---
-        {json_input_string}
-        ---
-        """
-
-        task = translate_single_batch(llm, translator_prompt, i + 1, MAX_RETRIES, INITIAL_WAIT_TIME, status_queue)
-        # THE FIX: Append only the coroutine object to the list.
-        task_coroutines.append(task)
-
-    status_queue.put(('log', f"Sending {len(task_coroutines)} batches for translation concurrently..."))
-
-    # THE FIX: 'gather' now receives a clean list of coroutines to run.
-    results = await asyncio.gather(*task_coroutines)
-
-    final_text_map = []
+    if scheduler is None:
+        scheduler = create_default_scheduler(status_queue)
+
+    total_batches = len(smart_batches)
     total_processed_batches = 0
-    # THE FIX: Use zip to cleanly pair the original batches with their results.
-    for original_batch, translated_dict in zip(smart_batches, results):
-        if translated_dict:
-            # Reconstruct the batch with the new translated text
-            for i, item in enumerate(original_batch):
-                # Use the item's index within the batch as the key
-                translated_text = translated_dict.get(str(i))
-                if translated_text:
-                    item['translated_text'] = translated_text
-                else:
-                    item['translated_text'] = "ERROR: Key not in response."
-        else:
-            # Mark the entire failed batch with an error
-            for item in original_batch:
-                item['translated_text'] = "ERROR: API Call Failed After Retries."
-
-        final_text_map.extend(original_batch)
-
-        total_processed_batches += 1
-        progress_percent = (total_processed_batches / len(smart_batches)) * 100
-        status_queue.put(('progress', progress_percent))
+    running = {}
+    # One prefix per model in use, each created (and cached) only once a batch needs it.
+    prompt_prefixes = {}
+    # Throughput and ETA are derived from these two (see telemetry.ThroughputTracker).
+    gauge(status_queue, 'elements_to_translate', sum(len(batch) for batch in smart_batches), language=target_language)
+
+    try:
+        for i, (batch, pending) in enumerate(zip(smart_batches, pending_per_batch)):
+            if not pending:
+                total_processed_batches += 1
+                count(status_queue, 'elements_translated_total', len(batch), language=target_language)
+                status_queue.put(('progress', (total_processed_batches / total_batches) * 100))
+                yield batch
+                continue
+
+            # We need a unique way to map results back. An index is robust.
+            # The key in the JSON is the item's index within the batch's pending elements.
+            batch_dict_to_translate = {
+                str(original_index): item.original_text
+                for original_index, item in enumerate(pending)
+            }
+            phase = llm_provider.translation_phase(list(batch_dict_to_translate.values()))
+            if phase not in prompt_prefixes:
+                # Only once something actually needs the model, so fully cached runs create no cache.
+                prompt_prefixes[phase] = create_prompt_prefix(context_briefing, target_language, phase)
+                await prompt_prefixes[phase].open(status_queue)
+            task = asyncio.ensure_future(translate_single_batch(
+                models[phase], batch_dict_to_translate, prompt_prefixes[phase], target_language, i + 1,
+                scheduler, status_queue, term_index))
+            running[task] = (i, batch, pending, time.monotonic())
+
+        status_queue.put(('log', f"Sending {len(running)} batches for translation "
+                                 f"(up to {scheduler.max_in_flight} at a time)..."))
+
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                i, batch, pending, started = running.pop(task)
+                apply_batch_result(pending, task.result())
+                # From submission to completion, so time spent queued in the scheduler is included.
+                observe(status_queue, 'batch_seconds', time.monotonic() - started, language=target_language)
+                failed = sum(1 for item in pending if item.translated_text.startswith("ERROR:"))
+                if failed:
+                    count(status_queue, 'failed_elements_total', failed, language=target_language)
+
+                if translation_memory is not None:
+                    new_translations = {
+                        item.original_text: item.translated_text
+                        for item in pending if not item.translated_text.startswith("ERROR:")
+                    }
+                    await loop.run_in_executor(None, store_in_translation_memory, translation_memory,
+                                               new_translations, target_language, context_hashes)
+                if journal is not None:
+                    # Awaited, so a batch is on disk before it is yielded; the fsync happens off the loop.
+                    await loop.run_in_executor(None, journal.record, batch_keys[i], {
+                        item.original_text: item.translated_text
+                        for item in batch if not item.translated_text.startswith("ERROR:")
+                    })
+
+                total_processed_batches += 1
+                count(status_queue, 'elements_translated_total', len(batch), language=target_language)
+                status_queue.put(('progress', (total_processed_batches / total_batches) * 100))
+                yield batch
+    finally:
+        # If the consumer stops early, don't leave requests running in the background.
+        for task in running:
+            task.cancel()
+        for prompt_prefix in prompt_prefixes.values():
+            await prompt_prefix.close()
+
+
+async def translate_text_elements_in_batch(smart_batches, context_briefing, target_language, status_queue,
+                                           translation_memory=None, cache_context=None, scheduler=None,
+                                           journal=None, term_index=None):
+    """
+    Translates the batches concurrently and writes 'translated_text' into every element.
+
+    Takes the same arguments as translate_batches_as_completed.
+
+    Returns:
+        list: The flat list of translated elements, in batch order, or None if the model could not be initialized.
+    """
+    try:
+        async for _ in translate_batches_as_completed(smart_batches, context_briefing, target_language,
+                                                      status_queue, translation_memory, cache_context, scheduler,
+                                                      journal, term_index):
+            pass
+    except RuntimeError:
+        return None
 
     status_queue.put(('log', "Async translation complete."))
-    return final_text_map
\ No newline at end of file
+    # Every element was translated (or filled from the cache) in place.
+    return [item for batch in smart_batches for item in batch]
@@ -1,60 +1,550 @@
 import os
 import asyncio
-from extractor import extract_text_from_ppt_advanced
-from context_generator import generate_context_briefing
-from batcher import create_smart_batches  # <-- Import our new module
-from translator import translate_text_elements_in_batch
-from reconstructor import reconstruct_presentation
+import threading
+from functools import partial
+from itertools import groupby
+from fast_extractor import extract_text_fast, iter_slide_text_elements_fast
+from context_generator import agenerate_context_briefing
+from batcher import SmartBatchPacker, TokenBudgetBatchPacker  # <-- Import our new module
+from dedup import Deduplicator
+from translator import translate_batches_as_completed, create_default_scheduler
+from fast_reconstructor import PartPatchingWriter, reconstruct_presentation_fast
+from translation_cache import TranslationMemory
+from journal import CheckpointJournal, journal_path_for
+from telemetry import TelemetryRecorder, phase_timer
+import llm_provider
+from segmentation import SEGMENT_PARAGRAPHS
+from terminology import prepare_glossary, translate_glossary, glossary_path_for
+from manifest import element_id, manifest_path_for, load_manifest, build_manifest, save_manifest, reuse_from_manifest
 
+# How many parsed slides may wait for the batcher before extraction pauses.
+SLIDE_QUEUE_SIZE = 16
+# "lxml" reads only the slide XML parts from the zip; "python-pptx" loads the full object model.
+EXTRACTION_ENGINE = "lxml"
+# "lxml" patches only the edited slide parts and copies the rest of the zip verbatim;
+# "python-pptx" re-saves the whole package.
+RECONSTRUCTION_ENGINE = "lxml"
+# "paragraphs" sends each paragraph as one element, with inline tags marking runs that are
+# formatted differently (segmentation.py); "runs" sends every run on its own, which costs
+# several times the elements and tokens and translates sentence fragments out of context.
+SEGMENTATION_MODE = SEGMENT_PARAGRAPHS
+# Reuse the translations recorded in the manifest next to a previous output, so
+# a revised deck only sends its new or changed elements to the model.
+REUSE_MANIFESTS = True
+# Save the run's metric events as '<deck>.metrics.jsonl' and '<deck>.metrics.prom' in the output folder.
+WRITE_METRICS = True
+# Mine the deck's recurring terms into the project glossary ('terminology.json' in the output folder),
+# translate the new ones once per language, and send each batch the entries of the terms it contains.
+USE_TERMINOLOGY = True
 
-async def run_translation_workflow(input_path, output_folder, user_instructions, status_queue, target_language):
+
+class LanguageStatusQueue:
     """
-    The main ASYNCHRONOUS engine, now using the Smart Batching strategy.
+    Wraps the GUI's status_queue for one target language when several run at once.
+
+    Log lines are prefixed with the language, and each language's progress is
+    reported as ('language_progress', (language, percent)) alongside an overall
+    ('progress', percent) averaged across every language of the run.
     """
-    output_path = ""
+
+    def __init__(self, status_queue, language, progress_by_language):
+        self.status_queue = status_queue
+        self.language = language
+        self.progress_by_language = progress_by_language
+
+    def put(self, message):
+        message_type, payload = message
+        if message_type == 'log':
+            self.status_queue.put(('log', f"[{self.language}] {payload}"))
+        elif message_type == 'progress':
+            self.progress_by_language[self.language] = payload
+            self.status_queue.put(('language_progress', (self.language, payload)))
+            overall = sum(self.progress_by_language.values()) / len(self.progress_by_language)
+            self.status_queue.put(('progress', overall))
+        else:
+            self.status_queue.put(message)
+
+
+def create_batch_packer():
+    """Builds the incremental batch packer configured in the translator module."""
+    from translator import BATCH_SIZE, BATCHING_MODE, INPUT_TOKEN_BUDGET, OUTPUT_TOKEN_BUDGET
+    if BATCHING_MODE == "tokens":
+        return TokenBudgetBatchPacker(INPUT_TOKEN_BUDGET, OUTPUT_TOKEN_BUDGET)
+    return SmartBatchPacker(BATCH_SIZE)
+
+
+async def stream_slides(input_path, executor=None):
+    """
+    Async generator yielding each slide's text elements as soon as it has been parsed.
+
+    Parsing runs in a worker thread feeding a bounded queue, so batching starts
+    while later slides are still being read. A process pool cannot stream back
+    to the event loop, so with one the deck is extracted in one piece there and
+    then replayed slide by slide.
+    """
+    loop = asyncio.get_running_loop()
+    if EXTRACTION_ENGINE == "lxml":
+        extract_all, iter_slides = extract_text_fast, iter_slide_text_elements_fast
+    else:
+        # python-pptx is only imported when its engine is chosen; it is slow to import.
+        from extractor import extract_text_from_ppt_advanced, iter_slide_text_elements
+        extract_all, iter_slides = extract_text_from_ppt_advanced, iter_slide_text_elements
+
+    if executor is not None:
+        text_map = await loop.run_in_executor(executor, partial(extract_all, segmentation=SEGMENTATION_MODE),
+                                              input_path)
+        for _, slide_group in groupby(text_map, lambda x: x.slide_index):
+            yield list(slide_group)
+        return
+
+    slide_queue = asyncio.Queue(maxsize=SLIDE_QUEUE_SIZE)
+    end_of_deck = object()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for slide_elements in iter_slides(input_path, SEGMENTATION_MODE):
+                if stop.is_set():
+                    break
+                asyncio.run_coroutine_threadsafe(slide_queue.put(slide_elements), loop).result()
+        finally:
+            asyncio.run_coroutine_threadsafe(slide_queue.put(end_of_deck), loop).result()
+
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            slide_elements = await slide_queue.get()
+            if slide_elements is end_of_deck:
+                break
+            yield slide_elements
+        # Re-raises anything the extractor raised.
+        await producer
+    finally:
+        if not producer.done():
+            # The consumer gave up early: unblock the producer so its thread can finish.
+            stop.set()
+            while not slide_queue.empty():
+                slide_queue.get_nowait()
+
+
+class ThreadedDeckWriter:
+    """
+    Holds the output presentation open in a worker thread and applies each
+    translated batch as soon as it arrives, so only the final save is left
+    once the last batch is back. Loading starts as soon as the writer is created.
+    """
+
+    def __init__(self, input_path):
+        if RECONSTRUCTION_ENGINE == "lxml":
+            writer_class = PartPatchingWriter
+        else:
+            from reconstructor import PresentationWriter as writer_class
+        self._writer = asyncio.get_running_loop().run_in_executor(None, writer_class, input_path)
+        self._applying = None
+
+    async def apply(self, edits):
+        # Shielded: cancelling the caller cannot stop a worker thread, so the load and the batch
+        # run to completion either way, and save() waits for them instead of writing a half-patched tree.
+        writer = await asyncio.shield(self._writer)
+        self._applying = asyncio.get_running_loop().run_in_executor(None, writer.apply, edits)
+        await asyncio.shield(self._applying)
+
+    async def save(self, output_path):
+        writer = await asyncio.shield(self._writer)
+        if self._applying is not None:
+            try:
+                await self._applying
+            except Exception:
+                # Already reported to the caller of apply(); the edits applied before it are still saved.
+                pass
+        return await asyncio.get_running_loop().run_in_executor(None, writer.save, output_path)
+
+
+class PooledDeckWriter:
+    """
+    Process pools cannot keep a presentation open between calls, so edits are
+    collected as batches arrive and the deck is rebuilt in one worker process at the end.
+    """
+
+    def __init__(self, input_path, executor):
+        self.input_path = input_path
+        self.executor = executor
+        self.text_map = []
+
+    async def apply(self, edits):
+        self.text_map.extend(item.with_translation(translated_text) for item, translated_text in edits)
+
+    async def save(self, output_path):
+        if RECONSTRUCTION_ENGINE == "lxml":
+            reconstruct = reconstruct_presentation_fast
+        else:
+            from reconstructor import reconstruct_presentation as reconstruct
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, reconstruct, self.text_map, self.input_path, output_path)
+
+
+def open_deck_writer(input_path, executor=None):
+    if executor is None:
+        return ThreadedDeckWriter(input_path)
+    return PooledDeckWriter(input_path, executor)
+
+
+def open_telemetry(status_queue, output_folder, run_name):
+    """
+    Wraps a status_queue so its metric events are also written to
+    '<run_name>.metrics.jsonl' (every event) and '<run_name>.metrics.prom'
+    (Prometheus text format, for scraping) in the output folder.
+
+    Returns:
+        TelemetryRecorder: The wrapped queue, or None when metrics are disabled.
+    """
+    if not WRITE_METRICS:
+        return None
+    return TelemetryRecorder(status_queue,
+                             jsonl_path=os.path.join(output_folder, f"{run_name}.metrics.jsonl"),
+                             prometheus_path=os.path.join(output_folder, f"{run_name}.metrics.prom"))
+
+
+def build_output_path(input_path, output_folder, target_language):
+    base_name = os.path.basename(input_path)
+    file_name_no_ext, _ = os.path.splitext(base_name)
+    output_file_name = f"{file_name_no_ext}_{target_language}.pptx"
+    return os.path.join(output_folder, output_file_name)
+
+
+def glossary_fingerprinter(term_index):
+    """
+    Maps a source text to the fingerprint of the glossary entries it contains (see
+    TermIndex.fingerprint), for the manifest; None when there is no glossary.
+    """
+    if term_index is None or not len(term_index):
+        return None
+    return lambda text: term_index.fingerprint([text])
+
+
+def load_reusable_translations(text_map, input_path, output_folder, target_language, status_queue, term_index=None):
+    """
+    Looks for the manifest of a previous run next to this language's output.
+    Elements containing a term whose entry in 'term_index' (the language's glossary)
+    changed since then are not reused.
+
+    Returns:
+        dict: Maps element IDs to the translations that can be reused; empty when there is no manifest.
+    """
+    if not REUSE_MANIFESTS:
+        return {}
+    manifest = load_manifest(manifest_path_for(build_output_path(input_path, output_folder, target_language)))
+    if manifest is None:
+        return {}
+    reused, pending = reuse_from_manifest(text_map, manifest, glossary_fingerprinter(term_index))
+    status_queue.put(('log', f"Manifest ({target_language}): reusing {len(reused)} of {len(text_map)} elements "
+                             f"from the previous version, {len(pending)} new or changed."))
+    return reused
+
+
+def partial_output_path(output_path):
+    """Where a cancelled run leaves what it had: 'deck_French.pptx' -> 'deck_French.partial.pptx'."""
+    return os.path.splitext(output_path)[0] + ".partial.pptx"
+
+
+async def save_partial_output(writer, output_path, translated_count, status_queue):
+    """
+    Saves a cancelled language's deck with the translations that had already
+    arrived (everything else keeps its source text). Its checkpoint journal
+    is left in place, so resuming the run sends only what is missing.
+    """
+    partial_path = partial_output_path(output_path)
+    status_queue.put(('log', f"Cancelled: saving the {translated_count} translated elements to {partial_path}..."))
+    if await writer.save(partial_path):
+        status_queue.put(('log', "Partial deck saved. Tick 'Resume interrupted run' (or pass --resume) "
+                                 "to finish it later without re-translating these."))
+
+
+async def prepare_term_index(glossary, deck_terms, context_summary, target_language, scheduler, status_queue):
+    """
+    Translates the deck's terms the project glossary does not know yet (one
+    request per GLOSSARY_BATCH_TERMS terms, before any batch) and saves the glossary.
+
+    Returns:
+        TermIndex: The language's entries for the deck's terms, or None when there are none.
+    """
+    try:
+        await translate_glossary(glossary, deck_terms, context_summary, target_language, scheduler, status_queue)
+        await asyncio.get_running_loop().run_in_executor(None, glossary.save)
+    except Exception as e:
+        status_queue.put(('log', f"Warning: The glossary could not be updated, translating without its new terms: {e}"))
+    term_index = glossary.index(target_language, deck_terms)
+    if not len(term_index):
+        return None
+    status_queue.put(('log', f"Glossary: {len(term_index)} terms will be kept consistent across batches."))
+    return term_index
+
+
+async def translate_and_write_language(smart_batches, occurrences, context_summary, user_instructions, input_path,
+                                       output_folder, target_language, status_queue, scheduler, translation_memory,
+                                       writer, reused=None, resume=False, glossary=None, deck_terms=()):
+    """
+    Phases 3 and 4 for one target language. Each batch is applied to the output
+    deck the moment its translation comes back, so writing overlaps translating.
+
+    Works on its own copy of the translation units so several languages can share one extraction.
+    Elements found in 'reused' (element ID -> translation, from the previous
+    run's manifest) are written straight away; only units with at least one
+    new or changed occurrence are sent to the model. A manifest of every
+    accepted translation is saved next to the output.
+
+    Finished batches are checkpointed to a journal next to the output until it
+    has been saved; with 'resume' the journal of an interrupted run is picked up
+    instead of being started afresh.
+
+    With a project 'glossary', the 'deck_terms' it holds are translated first
+    and every batch is sent the entries of the terms it contains. Each text's
+    own entries are part of its translation memory, journal and manifest keys,
+    so a text is not reused once the entry of a term it contains has changed.
+
+    Returns:
+        str: The output path, or None if translation failed.
+    """
+    reused = reused or {}
+    accepted = []
+    if reused:
+        reused_edits = [(item, reused[element_id(item)])
+                        for items in occurrences.values() for item in items if element_id(item) in reused]
+        accepted.extend(reused_edits)
+        await writer.apply(reused_edits)
+
+    language_batches = []
+    for batch in smart_batches:
+        language_batch = [unit.copy() for unit in batch
+                          if any(element_id(item) not in reused for item in occurrences[unit.original_text])]
+        if language_batch:
+            language_batches.append(language_batch)
+
+    output_path = build_output_path(input_path, output_folder, target_language)
+    loop = asyncio.get_running_loop()
+    journal = None
+    term_index = None
+    if language_batches:
+        if glossary is not None and deck_terms:
+            term_index = await prepare_term_index(glossary, deck_terms, context_summary, target_language, scheduler,
+                                                  status_queue)
+        journal = await loop.run_in_executor(None, CheckpointJournal, journal_path_for(output_path), resume)
+        try:
+            with phase_timer(status_queue, "translation", language=target_language):
+                async for batch in translate_batches_as_completed(language_batches, context_summary, target_language,
+                                                                  status_queue,
+                                                                  translation_memory=translation_memory,
+                                                                  cache_context=user_instructions,
+                                                                  scheduler=scheduler,
+                                                                  journal=journal,
+                                                                  term_index=term_index):
+                    # Fan each unit's translation out to every occurrence of its text.
+                    edits = [(occurrence, unit.translated_text)
+                             for unit in batch for occurrence in occurrences[unit.original_text]
+                             if element_id(occurrence) not in reused]
+                    # Failed elements stay out of the manifest, so the next run retries them.
+                    accepted.extend(edit for edit in edits if not edit[1].startswith("ERROR:"))
+                    await writer.apply(edits)
+        except RuntimeError:
+            status_queue.put(('log', "ERROR: Translation failed."))
+            return None
+        except asyncio.CancelledError:
+            # Requests in flight and pending retries are already cancelled; keep what came back.
+            await save_partial_output(writer, output_path, len(accepted), status_queue)
+            raise
+        finally:
+            journal.close()
+        status_queue.put(('log', "Async translation complete."))
+    else:
+        if glossary is not None and deck_terms:
+            term_index = glossary.index(target_language, deck_terms)
+        status_queue.put(('log', "Nothing changed since the previous version; every translation was reused."))
+        status_queue.put(('progress', 100))
+
+    status_queue.put(('log', "Phase 4: Saving translated presentation..."))
+    with phase_timer(status_queue, "reconstruction", language=target_language):
+        saved = await writer.save(output_path)
+    if not saved:
+        status_queue.put(('log', "ERROR: The translated presentation could not be saved."))
+        return None
     try:
-        status_queue.put(('log', f"Target Language set to: {target_language}"))
+        manifest = build_manifest(input_path, target_language, accepted, glossary_fingerprinter(term_index))
+        await loop.run_in_executor(None, save_manifest, manifest, manifest_path_for(output_path))
+    except OSError as e:
+        status_queue.put(('log', f"Warning: Could not write the translation manifest: {e}"))
+    if journal is not None:
+        # The output is complete, so there is nothing left to resume.
+        journal.discard()
+    if os.path.exists(partial_output_path(output_path)):
+        os.remove(partial_output_path(output_path))
+    status_queue.put(('log', f"🎉 Success! Your translated presentation is ready:"))
+    status_queue.put(('log', f"{output_path}"))
+    return output_path
+
 
-        status_queue.put(('log', "Phase 1: Extracting text from presentation..."))
-        extracted_data = extract_text_from_ppt_advanced(input_path)
-        if not extracted_data:
-            # ... (error handling) ...
-            return
-        status_queue.put(('log', f"Extraction complete. Found {len(extracted_data)} text elements."))
+async def translate_deck(input_path, output_folder, user_instructions, status_queue, target_languages,
+                         scheduler, translation_memory, executor=None, resume=False, glossary_path=None):
+    """
+    Runs every phase for one deck and writes one output file per target language.
 
+    The phases are streamed: slides flow from the extractor into dedup and
+    batching while later slides are still being parsed, the output decks load
+    while the briefing is generated, and each translated batch is applied to
+    the output as soon as it arrives.
+
+    The scheduler and translation memory are passed in so several decks can
+    share them; extraction and reconstruction run on 'executor' (worker threads
+    when None, a process pool for the CLI). With 'resume', batches recorded
+    in the checkpoint journals of an interrupted run are not translated again.
+
+    The deck's terminology is added to the project glossary at 'glossary_path'
+    (by default 'terminology.json' in the output folder), so later decks of the
+    project reuse its translations.
+
+    Returns:
+        list: The output paths that were written successfully.
+    """
+    status_queue.put(('log', f"Target Language set to: {', '.join(target_languages)}"))
+
+    status_queue.put(('log', "Phase 1: Extracting text from presentation..."))
+    # --- STREAMING: every unique string is batched as soon as its slide is parsed ---
+    deduplicator = Deduplicator()
+    packer = create_batch_packer()
+    extracted_data, smart_batches = [], []
+    with phase_timer(status_queue, "extraction"):
+        async for slide_elements in stream_slides(input_path, executor):
+            extracted_data.extend(slide_elements)
+            new_units = deduplicator.add(slide_elements)
+            if new_units:
+                smart_batches.extend(packer.add_slide(new_units))
+        smart_batches.extend(packer.finish())
+
+    if not extracted_data:
+        status_queue.put(('log', "ERROR: No text could be extracted from the presentation."))
+        return []
+    status_queue.put(('log', f"Extraction complete. Found {len(extracted_data)} text elements."))
+    status_queue.put(('log', f"Deduplicated {len(extracted_data)} text elements into "
+                             f"{len(deduplicator.occurrences)} unique translation units."))
+    status_queue.put(('log', f"Created {len(smart_batches)} context-aware batches."))
+
+    # The output decks load in the background while the briefing is generated.
+    writers = {language: open_deck_writer(input_path, executor) for language in target_languages}
+
+    loop = asyncio.get_running_loop()
+    # The glossary comes first: a previous run's translation of an element is only reused
+    # if the glossary entries of the terms it contains have not changed since.
+    glossary, deck_terms = None, []
+    term_indexes = {language: None for language in target_languages}
+    if USE_TERMINOLOGY:
+        glossary, deck_terms, new_terms = await loop.run_in_executor(
+            None, prepare_glossary, [item.original_text for item in extracted_data], user_instructions,
+            glossary_path or glossary_path_for(output_folder))
+        status_queue.put(('log', f"Terminology: {len(deck_terms)} glossary terms occur in this deck "
+                                 f"({new_terms} new to the project)."))
+        # Terms still to be translated count as changed entries, so the elements containing them are retranslated.
+        term_indexes = {language: glossary.index(language, deck_terms, untranslated=True)
+                        for language in target_languages}
+
+    reused_by_language = {}
+    for language in target_languages:
+        reused_by_language[language] = await loop.run_in_executor(
+            None, load_reusable_translations, extracted_data, input_path, output_folder, language, status_queue,
+            term_indexes[language])
+
+    if all(element_id(item) in reused for reused in reused_by_language.values() for item in extracted_data):
+        # Every element is covered by the previous run's manifests: no prompt will be sent.
+        context_summary = ""
+    else:
         status_queue.put(('log', "Phase 2: Generating context with AI..."))
-        context_summary = generate_context_briefing(extracted_data, user_instructions)
+
+        # Large decks are summarized map-reduce style; the calls share the request pool with the batches,
+        # and an unchanged deck reuses its cached analysis without any AI call.
+        with phase_timer(status_queue, "briefing"):
+            context_summary = await agenerate_context_briefing(extracted_data, user_instructions,
+                                                               scheduler=scheduler,
+                                                               translation_memory=translation_memory,
+                                                               status_queue=status_queue)
         if not context_summary:
-            # ... (error handling) ...
-            return
+            status_queue.put(('log', "ERROR: Context generation failed."))
+            return []
         status_queue.put(('log', "Context generation complete."))
 
-        # --- NEW STEP: SMART BATCHING ---
-        status_queue.put(('log', "Creating smart batches for translation..."))
-        # The ideal batch size is defined in the translator module
-        from translator import BATCH_SIZE
-        smart_batches = create_smart_batches(extracted_data, BATCH_SIZE)
-        status_queue.put(('log', f"Created {len(smart_batches)} context-aware batches."))
-
-        # Pass the pre-made batches to the translator
-        translated_data = await translate_text_elements_in_batch(smart_batches, context_summary, target_language,
-                                                                 status_queue)
-        if not translated_data:
-            # ... (error handling) ...
-            return
-
-        status_queue.put(('log', "Phase 4: Reconstructing translated presentation..."))
-        base_name = os.path.basename(input_path)
-        file_name_no_ext, _ = os.path.splitext(base_name)
-        output_file_name = f"{file_name_no_ext}_{target_language}.pptx"
-        output_path = os.path.join(output_folder, output_file_name)
-
-        # The final text_map is returned by the translator
-        reconstruct_presentation(translated_data, input_path, output_path)
-        status_queue.put(('log', f"🎉 Success! Your translated presentation is ready:"))
-        status_queue.put(('log', f"{output_path}"))
+    progress_by_language = {language: 0 for language in target_languages}
+    language_tasks = []
+    for language in target_languages:
+        language_queue = status_queue
+        if len(target_languages) > 1:
+            language_queue = LanguageStatusQueue(status_queue, language, progress_by_language)
+        language_tasks.append(asyncio.ensure_future(translate_and_write_language(
+            smart_batches, deduplicator.occurrences, context_summary, user_instructions, input_path,
+            output_folder, language, language_queue, scheduler, translation_memory, writers[language],
+            reused_by_language[language], resume, glossary, deck_terms)))
+
+    try:
+        output_paths = await asyncio.gather(*language_tasks)
+    except asyncio.CancelledError:
+        # gather gives up as soon as the first language is cancelled; the others are still saving
+        # their partial decks and must finish before the run (and the translation memory) is closed.
+        await asyncio.wait(language_tasks)
+        raise
+    written = [path for path in output_paths if path]
+    if len(target_languages) > 1:
+        status_queue.put(('log', f"Finished {len(written)}/{len(target_languages)} languages."))
+    return written
+
+
+async def run_translation_workflow(input_path, output_folder, user_instructions, status_queue, target_language,
+                                   resume=False):
+    """
+    The main ASYNCHRONOUS engine, now using the Smart Batching strategy.
+
+    'target_language' may be a single language or a list of languages. The deck
+    is extracted and briefed once, and every language's batches then share one
+    request scheduler while their output files are written in parallel.
+
+    With 'resume', an interrupted run into the same output folder continues
+    from its checkpoint journal instead of re-translating finished batches.
+
+    Cancelling the task running this coroutine stops every request and retry
+    straight away; each language that had started translating saves what it
+    had as '<deck>_<language>.partial.pptx' and keeps its journal for a resume.
+    """
+    output_path = ""
+    translation_memory = None
+    telemetry = None
+    if isinstance(target_language, str):
+        target_languages = [target_language]
+    else:
+        target_languages = list(target_language)
+    try:
+        # Metric events are recorded to the output folder on their way to the GUI.
+        telemetry = open_telemetry(status_queue, output_folder, os.path.splitext(os.path.basename(input_path))[0])
+        if telemetry is not None:
+            status_queue = telemetry
+
+        # The AI briefing is regenerated on every run, so the cache is keyed on the user's instructions
+        # and each string's own glossary entries (see translator.glossary_context_hash), letting hits
+        # carry across runs and decks for as long as neither changes.
+        translation_memory = await asyncio.get_running_loop().run_in_executor(None, TranslationMemory)
+        # One pool for every language, so adding languages never multiplies the request rate.
+        scheduler = create_default_scheduler(status_queue)
+
+        written = await translate_deck(input_path, output_folder, user_instructions, status_queue,
+                                       target_languages, scheduler, translation_memory, resume=resume)
+        if written:
+            output_path = written[0]
 
+    except asyncio.CancelledError:
+        # The GUI's cancel button (or Ctrl+C) cancels this task. It is the outermost coroutine of the
+        # run, so the cancellation ends here and the caller still gets its 'finished' message.
+        status_queue.put(('log', "Translation cancelled."))
     except Exception as e:
         status_queue.put(('log', f"An unexpected error occurred: {e}"))
     finally:
-        status_queue.put(('finished', output_path))
\ No newline at end of file
+        # The model clients' connection pools belong to this run's event loop.
+        await llm_provider.aclose_clients()
+        if translation_memory is not None:
+            translation_memory.close()
+        if telemetry is not None:
+            telemetry.close()
+        status_queue.put(('finished', output_path))